@@ -0,0 +1,252 @@
+# benchmark.py
+"""
+Banc d'essai des chemins critiques de l'application (sans affichage).
+
+Pour chaque taille demandée (par défaut 1 000, 100 000 et 1 000 000 lots), une base
+synthétique est générée dans un dossier temporaire, puis sont mesurés :
+    - get_all_lots
+    - le chargement des onglets "Calcul Volume Test" et "Calcul Test" (QT_QPA_PLATFORM=offscreen)
+    - dynamic_search sur l'onglet des lots
+    - calculate_averages (mode "moyenne" des exportations)
+    - export_to_excel et export_to_pdf, sur un échantillon des lignes (--export-rows) :
+      une exportation coûte environ 1 ms par ligne
+
+Les temps (min / moyenne / max) et le pic mémoire Python (tracemalloc) sont enregistrés
+dans un fichier JSON afin de comparer deux versions :
+    python benchmark.py --sizes 1000 100000 --output avant.json
+    python benchmark.py --sizes 1000 100000 --output apres.json --compare avant.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from database import ReactifsDatabase
+from export import calculate_averages, export_to_excel, export_to_pdf
+from cli import LOTS_HEADERS, lots_to_rows
+from data_generator import generate_database
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+DB_FILENAME = "reactifs_database.db"  # Nom attendu par les onglets
+SEARCH_TERM = "tsh"
+EXPORT_ROWS = 10_000  # Échantillon par défaut des exportations
+EXPORT_MEMORY_ROWS = 1_000  # Échantillon du pic mémoire des exportations
+
+
+def measure(operation, repeat=3, memory_operation=None):
+    """
+    Exécute `operation` `repeat` fois et renvoie les temps ainsi que le pic mémoire Python
+    (mesuré sous tracemalloc, pour ne pas fausser les temps, sur une exécution supplémentaire
+    de `memory_operation`, par défaut `operation` elle-même).
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        (memory_operation or operation)()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "min_s": min(timings),
+        "mean_s": sum(timings) / len(timings),
+        "max_s": max(timings),
+        "peak_mib": peak / (1024 * 1024)
+    }
+
+
+def silence_message_boxes():
+    """
+    Les onglets affichent une boîte modale à la fin du chargement : on la neutralise
+    pour que le banc d'essai ne reste pas bloqué.
+    """
+    from PySide6.QtWidgets import QMessageBox
+
+    def answer(*args, **kwargs):
+        return QMessageBox.Ok
+
+    for name in ("information", "warning", "critical", "question"):
+        setattr(QMessageBox, name, staticmethod(answer))
+
+
+def load_tab(tab_class, expected_rows, timeout=3600):
+    """
+    Construit un onglet et attend la fin de son chargement (table remplie).
+    """
+    from PySide6.QtWidgets import QApplication
+
+    tab = tab_class()
+    deadline = time.perf_counter() + timeout
+    while tab.table.rowCount() < expected_rows:
+        QApplication.processEvents()
+        if time.perf_counter() > deadline:
+            raise TimeoutError(f"Chargement de {tab_class.__name__} trop long")
+    QApplication.processEvents()
+    return tab
+
+
+def dispose_tab(tab):
+    tab.scheduler.shutdown()
+    tab.database.close()
+    tab.deleteLater()
+
+
+def run_size(lot_count, repeat, max_gui_rows, export_rows, seed):
+    """
+    Génère une base de `lot_count` lots et exécute toutes les mesures.
+    """
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="bench_cma_")
+    previous_dir = os.getcwd()
+    try:
+        os.chdir(workdir)
+        start = time.perf_counter()
+        generate_database(DB_FILENAME, lot_count, seed)
+        results["generate_database"] = {"min_s": time.perf_counter() - start}
+
+        database = ReactifsDatabase(DB_FILENAME)
+        try:
+            results["get_all_lots"] = measure(database.get_all_lots, repeat)
+            rows = lots_to_rows(database.get_all_lots())
+        finally:
+            database.close()
+
+        results["calculate_averages"] = measure(lambda: calculate_averages(LOTS_HEADERS, rows), repeat)
+
+        if export_rows > 0:
+            sample = rows[:export_rows]
+            memory_sample = sample[:EXPORT_MEMORY_ROWS]
+            for name, export, path in (("export_to_excel", export_to_excel, "bench.xlsx"),
+                                       ("export_to_pdf", export_to_pdf, "bench.pdf")):
+                results[name] = measure(
+                    lambda: export(path, LOTS_HEADERS, sample), repeat,
+                    memory_operation=lambda: export(path, LOTS_HEADERS, memory_sample)
+                )
+                results[name].update(rows=len(sample), peak_rows=len(memory_sample))
+        else:
+            results["export_to_excel"] = results["export_to_pdf"] = {"skipped": "--export-rows 0"}
+
+        if lot_count <= max_gui_rows:
+            from PySide6.QtWidgets import QApplication
+            from tab_volume_par_test import TabVolumeParTest
+            from tab_tests_estimes import TabTests
+
+            QApplication.instance() or QApplication(sys.argv)
+            silence_message_boxes()
+
+            results["tab_volume_load"] = measure(lambda: dispose_tab(load_tab(TabVolumeParTest, lot_count)), repeat)
+            results["tab_tests_load"] = measure(lambda: dispose_tab(load_tab(TabTests, lot_count)), repeat)
+
+            tab = load_tab(TabVolumeParTest, lot_count)
+            try:
+                tab.txt_search.blockSignals(True)
+                tab.txt_search.setText(SEARCH_TERM)
+                tab.txt_search.blockSignals(False)
+                results["dynamic_search"] = measure(tab.dynamic_search, repeat)
+            finally:
+                dispose_tab(tab)
+        else:
+            skipped = {"skipped": f"> {max_gui_rows} lignes"}
+            results["tab_volume_load"] = results["tab_tests_load"] = results["dynamic_search"] = skipped
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(current, previous, threshold):
+    """
+    Affiche le rapport entre deux exécutions et renvoie la liste des régressions.
+    """
+    regressions = []
+    for size, benches in current["results"].items():
+        for name, values in benches.items():
+            old = previous.get("results", {}).get(size, {}).get(name, {})
+            if "min_s" not in values or not old.get("min_s"):
+                continue
+            ratio = values["min_s"] / old["min_s"]
+            flag = "  <-- régression" if ratio > threshold else ""
+            print(f"{size:>9} {name:<20} {old['min_s']:10.4f}s -> {values['min_s']:10.4f}s  x{ratio:5.2f}{flag}")
+            if ratio > threshold:
+                regressions.append((size, name, ratio))
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Banc d'essai des chemins critiques.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Nombres de lots à générer")
+    parser.add_argument("--repeat", type=int, default=3, help="Répétitions par mesure")
+    parser.add_argument("--seed", type=int, default=0, help="Graine du générateur de données")
+    parser.add_argument("--max-gui-rows", type=int, default=100_000,
+                        help="Taille maximale pour les mesures des onglets")
+    parser.add_argument("--export-rows", type=int, default=EXPORT_ROWS,
+                        help="Lignes exportées en Excel/PDF à chaque mesure (0 : pas d'exportation)")
+    parser.add_argument("--output", default="benchmark_results.json", help="Fichier JSON des résultats")
+    parser.add_argument("--compare", default=None, help="Fichier JSON d'une exécution précédente")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="Rapport de temps au-delà duquel une mesure est une régression")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    report = {
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": {}
+    }
+
+    for size in args.sizes:
+        print(f"--- {size} lots ---")
+        results = run_size(size, args.repeat, args.max_gui_rows, args.export_rows, args.seed)
+        report["results"][str(size)] = results
+        for name, values in results.items():
+            if "skipped" in values:
+                print(f"{name:<20} ignoré ({values['skipped']})")
+            elif "mean_s" in values:
+                sample = f"  ({values['rows']} lignes, pic sur {values['peak_rows']})" if "rows" in values else ""
+                print(f"{name:<20} min {values['min_s']:9.4f}s  moy {values['mean_s']:9.4f}s  "
+                      f"pic {values['peak_mib']:8.2f} Mio{sample}")
+            else:
+                print(f"{name:<20} {values['min_s']:9.4f}s")
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
+    print(f"Résultats enregistrés dans '{args.output}'.")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            previous = json.load(file)
+        if compare_results(report, previous, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+# calc_core.py
+"""
+Cœur de calcul du formulaire "Gestion des Réactifs" : fonctions pures, sans effet de bord.
+
+Le formulaire recalcule consommation, calibration, pertes et confirmation à chaque frappe ;
+les résultats sont mémorisés (LRU borné à CALC_CACHE_SIZE entrées par calcul) et indexés par
+les entrées normalisées (nombres arrondis, unités sans espaces superflus) : revenir à
+une combinaison déjà saisie ne refait aucun calcul. Ces calculs prennent quelques
+microsecondes et s'exécutent directement dans le thread de l'interface ; seuls les calculs
+en lot (balayages) passent par le pool partagé de calc_pool.py.
+
+Les erreurs (conversion impossible, division par zéro) sont levées en ValueError.
+"""
+from datetime import date
+from functools import lru_cache
+
+from logic_calc import ConsumptionCalculator, UNIT_REGISTRY, normalize_fields, qac_chain
+from periods import CALENDAR
+
+CALC_CACHE_SIZE = 1024
+
+PACKAGING_UNITS = ("boîte", "kit", "sachet", "flacon", "tube", "coffret")
+
+_CALCULATOR = ConsumptionCalculator()
+
+
+def _number(value) -> float:
+    return round(float(value), 9)
+
+
+def _unit(unit) -> str:
+    return str(unit).strip()
+
+
+def _convert(value, from_unit, to_unit):
+    if from_unit == to_unit:
+        return value
+    return _CALCULATOR.convert_value(value, from_unit, to_unit)
+
+
+@lru_cache(maxsize=CALC_CACHE_SIZE)
+def _consumption(nbr_tests, qty_per_test, qty_unit, target_unit):
+    if qty_unit in ("test", "pcs"):
+        return nbr_tests, False
+    if qty_unit in PACKAGING_UNITS:
+        if not qty_per_test:
+            raise ValueError("Le nombre de tests par unité doit être supérieur à zéro")
+        return nbr_tests / qty_per_test, False
+    consumption = nbr_tests * qty_per_test
+    if target_unit != qty_unit and UNIT_REGISTRY.is_physical(target_unit) and UNIT_REGISTRY.is_physical(qty_unit):
+        return _convert(consumption, qty_unit, target_unit), True
+    return consumption, False
+
+
+def consumption(nbr_tests, qty_per_test, qty_unit, target_unit):
+    """
+    Consommation sur la période : tests, unités conditionnées ou quantité physique.
+    :return: (consommation, vrai si elle est exprimée dans `target_unit` plutôt que `qty_unit`)
+    """
+    return _consumption(_number(nbr_tests), _number(qty_per_test), _unit(qty_unit), _unit(target_unit))
+
+
+@lru_cache(maxsize=CALC_CACHE_SIZE)
+def _calibration(start, time_value, time_unit, frequency, calibration_period, volume, unit, display_unit):
+    total_calibrations = CALENDAR.events(start, time_value, time_unit, frequency, calibration_period)
+    return total_calibrations, _convert(total_calibrations * volume, unit, display_unit)
+
+
+def calibration(time_value, time_unit, frequency, calibration_period, volume, unit, display_unit, start=None):
+    """
+    Nombre de calibrations sur la période commençant à `start` (aujourd'hui par défaut)
+    et quantité totale de calibration (dans `display_unit`).
+    """
+    return _calibration(start or date.today().isoformat(), int(time_value), time_unit, int(frequency),
+                        calibration_period, _number(volume), _unit(unit), _unit(display_unit))
+
+
+@lru_cache(maxsize=CALC_CACHE_SIZE)
+def _loss(total_qty, loss_percent, unit, target_unit):
+    return _convert(total_qty * loss_percent / 100, unit, target_unit)
+
+
+def loss(total_qty, loss_percent, unit, target_unit):
+    """
+    Quantité perdue : `loss_percent` % de la quantité totale par conditionnement, dans `target_unit`.
+    """
+    return _loss(_number(total_qty), _number(loss_percent), _unit(unit), _unit(target_unit))
+
+
+@lru_cache(maxsize=CALC_CACHE_SIZE)
+def _confirmation(nbr_tests, confirmation_percent, qty_per_test, unit, display_unit):
+    total = nbr_tests * (confirmation_percent / 100) * qty_per_test
+    if unit != display_unit and not _CALCULATOR.are_units_compatible(unit, display_unit):
+        raise ValueError(f"Conversion impossible entre {unit} et {display_unit}")
+    return _convert(total, unit, display_unit)
+
+
+def confirmation(nbr_tests, confirmation_percent, qty_per_test, unit, display_unit):
+    """
+    Quantité consommée par les tests refaits en confirmation, dans `display_unit`.
+    """
+    return _confirmation(_number(nbr_tests), _number(confirmation_percent), _number(qty_per_test),
+                         _unit(unit), _unit(display_unit))
+
+
+def fields_key(fields) -> tuple:
+    """
+    Clé normalisée des champs de la chaîne QAC (voir GestionReactifs.collect_fields).
+    """
+    return tuple(sorted(
+        (name, tuple(sorted((key, _unit(value) if key == "unit" else
+                             _number(value) if isinstance(value, (int, float)) else value)
+                            for key, value in data.items())))
+        for name, data in fields.items()
+    ))
+
+
+@lru_cache(maxsize=CALC_CACHE_SIZE)
+def _qac(key):
+    fields = {name: dict(data) for name, data in key}
+    for field in ("consommation", "calibration", "pertes", "confirmation", "stock_actuel", "conditionnement",
+                  "livraison"):
+        if field not in fields:
+            raise ValueError(f"Le champ requis '{field}' est manquant")
+    converted = normalize_fields(fields, _CALCULATOR)
+    conditionnement = fields['conditionnement']['value']
+    period = fields['consommation']['period']
+    if not period or not conditionnement:
+        raise ValueError("La période et le conditionnement doivent être supérieurs à zéro")
+    chain = qac_chain(converted['consommation'], converted['calibration'], converted['pertes'],
+                      converted['confirmation'], converted['stock_actuel'], conditionnement,
+                      fields['livraison']['value'], period)
+    return {key: float(value) for key, value in chain.items()}
+
+
+def qac(fields) -> dict:
+    """
+    Chaîne CMA → CMJ → ROP → QAC d'un formulaire.
+    :return: dictionnaire 'cma', 'cmj', 'stock_securite', 'rop', 'qac' (dans l'unité du conditionnement)
+    """
+    return dict(_qac(fields_key(fields)))
+
+
+def cache_info() -> dict:
+    """
+    Statistiques des mémos (succès, échecs, taille) de chaque calcul.
+    """
+    return {function.__name__.lstrip("_"): function.cache_info()
+            for function in (_consumption, _calibration, _loss, _confirmation, _qac)}
+
+
+def clear_caches():
+    for function in (_consumption, _calibration, _loss, _confirmation, _qac):
+        function.cache_clear()
@@ -0,0 +1,66 @@
+# calc_pool.py
+"""
+Pool partagé des calculs en lot de l'interface (balayages de paramètres).
+
+Les calculs unitaires du formulaire restent dans le thread de l'interface (calc_core) ;
+seuls les calculs en lot, qui peuvent durer plusieurs centaines de millisecondes, passent
+par ce pool au lieu de créer un QThread à chaque clic. Le résultat est livré dans le
+thread de l'interface, comme pour le service de base de données.
+
+    get_calculation_pool().submit(qac_sweep, base, ranges, callback=self.display_results)
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from database import CallbackBridge
+
+# Un calcul long n'empêche pas d'en lancer un second (autre dialogue de balayage)
+CALC_POOL_WORKERS = 2
+
+
+class CalculationPool:
+    """
+    Exécute des fonctions pures dans des threads partagés.
+    Le pool doit être créé depuis le thread de l'interface.
+    """
+    def __init__(self, max_workers: int = CALC_POOL_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="CalculationPool")
+        self.bridge = CallbackBridge()
+
+    def submit(self, function, *args, callback=None, error_callback=None, **kwargs) -> Future:
+        """
+        Exécute function(*args, **kwargs) dans le pool ; `callback` / `error_callback`
+        sont exécutés dans le thread de l'interface une fois le résultat prêt.
+        """
+        future = self.executor.submit(function, *args, **kwargs)
+        if callback or error_callback:
+            future.add_done_callback(lambda done: self.bridge.delivered.emit(done, callback, error_callback))
+        return future
+
+    def shutdown(self):
+        """
+        Abandonne les calculs en attente et attend la fin de ceux en cours.
+        """
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+_pool = None
+
+
+def get_calculation_pool() -> CalculationPool:
+    """
+    Renvoie le pool partagé (créé au premier appel).
+    """
+    global _pool
+    if _pool is None:
+        _pool = CalculationPool()
+    return _pool
+
+
+def shutdown_calculation_pool():
+    """
+    Arrête le pool partagé (à la fermeture de l'application).
+    """
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
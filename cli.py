@@ -0,0 +1,347 @@
+# cli.py
+"""
+Interface en ligne de commande (sans interface graphique) pour les calculs,
+les exportations et la maintenance de la base de données.
+
+Aucun module QtWidgets n'est importé : l'outil démarre rapidement et fonctionne
+sur un serveur sans affichage (tâches planifiées, cron, etc.).
+
+Exemples :
+    python -m cli export lots --format xlsx --output lots.xlsx
+    python -m cli export tests --format csv --output tests.csv --mode average
+    python -m cli export lots --format csv --output lots_2024.csv --debut 2024-01-01 --fin 2024-12-31
+    python -m cli plan --horizon 30 --livraison 7
+    python -m cli forecast --horizon 30 --mesure tests
+    python -m cli waste --pertes
+    python -m cli scenarios --recalculer
+    python -m cli export waste --format xlsx --output pertes_prevues.xlsx
+    python -m cli stats --analyte TSH
+    python -m cli consumption import consommations.csv
+    python -m cli consumption windows --jours 7 30 90
+    python -m cli packs add TSH "Coffret 100" 100 --mort 2 --stabilite 28
+    python -m cli packs list
+    python -m cli controls add TSH controle 2 jours 0.1 ml --ouvres
+    python -m cli controls add TSH calibration 1 lot 0.5 ml
+    python -m cli schedule --periode "1 mois"
+    python -m cli maintenance --vacuum
+    python -m cli bench --repeat 5
+"""
+import argparse
+import csv
+import sys
+import time
+
+from database import ReactifsDatabase
+from export import export_to_csv, export_to_excel, export_to_pdf
+import control_schedule
+import fefo
+import forecasting
+import planning
+import scenarios
+from row_store import LOTS_HEADERS, TESTS_HEADERS, LotStore, TestStore
+
+EXPORT_FORMATS = {
+    "xlsx": export_to_excel,
+    "pdf": export_to_pdf,
+    "csv": export_to_csv
+}
+
+def lots_to_rows(lots):
+    """
+    Met en forme les lots (résultat de get_all_lots) comme dans l'onglet "Calcul Volume Test".
+    """
+    return LotStore(lots).display_rows()
+
+
+def tests_to_rows(tests):
+    """
+    Met en forme les tests (résultat de get_all_tests) comme dans l'onglet "Calcul Test".
+    """
+    # get_all_tests renvoie aussi l'unité, absente de l'onglet
+    return TestStore((test[0], test[1], *test[3:]) for test in tests).display_rows()
+
+
+def cmd_export(args, database):
+    period = (args.debut or "0001-01-01", args.fin or "9999-12-31")
+    filtered = args.debut or args.fin
+    if args.table == "lots":
+        lots = database.get_lots_in_period(*period) if filtered else database.get_all_lots()
+        headers, data = LOTS_HEADERS, lots_to_rows(lots)
+    elif args.table == "tests":
+        tests = database.get_tests_in_period(*period) if filtered else database.get_all_tests()
+        headers, data = TESTS_HEADERS, tests_to_rows(tests)
+    elif args.table == "scenarios":
+        headers, data = scenarios.SCENARIO_HEADERS, scenarios.scenarios_to_rows(database.get_scenarios())
+    elif args.table == "waste":
+        projection = fefo.FefoAllocator(database).project(args.date)
+        headers, data = fefo.WASTE_HEADERS, fefo.waste_to_rows(projection)
+    else:
+        try:
+            horizon = planning.resolve_horizon(args.horizon, args.periode)
+        except ValueError as e:
+            print(e)
+            return 1
+        plan = planning.OrderPlanner(database).build_plan(horizon, args.livraison)
+        headers, data = planning.PLAN_HEADERS, planning.plan_to_rows(plan)
+
+    EXPORT_FORMATS[args.format](args.output, headers, data, args.mode)
+    print(f"{len(data)} lignes exportées vers '{args.output}'.")
+    return 0
+
+
+def cmd_plan(args, database):
+    return planning.run(args)
+
+
+def cmd_forecast(args, database):
+    return forecasting.run(args)
+
+
+def cmd_waste(args, database):
+    return fefo.run(args)
+
+
+def cmd_scenarios(args, database):
+    return scenarios.run(args)
+
+
+def cmd_stats(args, database):
+    analytes = [args.analyte] if args.analyte else database.get_all_analytes()
+    print("\t".join(["Nom analyte", "Vol. Total moy.", "Vol./Test moy.", "Durée moy. (jours)",
+                     "Tests Estimés moy.", "Tests Réalisés moy.", "Perte (%) moy."]))
+    for name in analytes:
+        lots = database.calculate_average_lots(name)
+        tests = database.calculate_average_tests(name)
+        if not lots and not tests:
+            continue
+        print("\t".join([
+            name,
+            f"{lots.get('avg_total_volume', 0):.2f}",
+            f"{lots.get('avg_volume_per_test', 0):.2f}",
+            f"{lots.get('avg_duration_days', 0):.2f}",
+            f"{tests.get('avg_estimated_tests', 0):.2f}",
+            f"{tests.get('avg_performed_tests', 0):.2f}",
+            f"{tests.get('avg_loss_percentage', 0):.2f}"
+        ]))
+    return 0
+
+
+def read_consumption_file(filename, database):
+    """
+    Lit un fichier CSV de consommations (séparateur ';', en-tête facultatif) :
+    numéro de lot ; date ; volume ; tests ; opérateur.
+    :return: (événements pour record_consumptions, lignes ignorées)
+    """
+    database.cursor.execute("SELECT lot_number, id FROM Lots")
+    lot_ids = dict(database.cursor.fetchall())
+    events, skipped = [], []
+    with open(filename, newline="", encoding="utf-8-sig") as file:
+        for line_number, row in enumerate(csv.reader(file, delimiter=";"), start=1):
+            if not row or (line_number == 1 and row[0] not in lot_ids):
+                continue  # Ligne vide ou en-tête
+            try:
+                lot_number, consumed_at, volume = row[0], row[1], float(row[2].replace(",", "."))
+                tests = int(row[3]) if len(row) > 3 and row[3] else 0
+                operator = row[4] if len(row) > 4 and row[4] else None
+                events.append((lot_ids[lot_number], consumed_at, volume, tests, operator))
+            except (IndexError, KeyError, ValueError):
+                skipped.append(line_number)
+    return events, skipped
+
+
+def cmd_consumption(args, database):
+    if args.action == "import":
+        events, skipped = read_consumption_file(args.file, database)
+        if skipped:
+            print(f"Lignes ignorées (lot inconnu ou valeur invalide) : {', '.join(map(str, skipped))}")
+        count = database.record_consumptions(events)
+        print(f"{count} consommations enregistrées.")
+        return 0 if count == len(events) else 1
+
+    windows = database.get_consumption_windows(args.jours, args.date)
+    print("\t".join(["Nom analyte", "Unité"] + [f"{days} j (vol. / tests)" for days in args.jours]))
+    for _analyte_id, name, unit, totals in windows:
+        print("\t".join([name, unit] + [f"{volume:.2f} / {tests}" for volume, tests in totals]))
+    return 0
+
+
+def cmd_packs(args, database):
+    if args.action == "add":
+        if args.quantite is None:
+            print("Usage : packs add ANALYTE LIBELLÉ QUANTITÉ [--mort X] [--stabilite JOURS]")
+            return 1
+        analyte_id = database.get_analyte_id(args.analyte)
+        if analyte_id is None:
+            print(f"Analyte inconnu : {args.analyte}")
+            return 1
+        saved = database.save_pack_option(analyte_id, args.label, args.quantite, args.mort, args.stabilite)
+        return 0 if saved else 1
+
+    database.cursor.execute("SELECT id, name FROM Analytes")
+    analytes = dict(database.cursor.fetchall())
+    print("\t".join(["Nom analyte", "Conditionnement", "Quantité", "Volume mort", "Stabilité (jours)"]))
+    for analyte_id, label, quantity, dead_volume, stability_days in database.get_pack_options():
+        print("\t".join([analytes.get(analyte_id, str(analyte_id)), label, f"{quantity:g}", f"{dead_volume:g}",
+                         str(stability_days or "")]))
+    return 0
+
+
+def cmd_controls(args, database):
+    if args.action == "add":
+        if args.unite is None:
+            print("Usage : controls add ANALYTE TYPE FRÉQUENCE PÉRIODE QUANTITÉ UNITÉ [--ouvres]")
+            return 1
+        analyte_id = database.get_analyte_id(args.analyte)
+        if analyte_id is None:
+            print(f"Analyte inconnu : {args.analyte}")
+            return 1
+        rule_id = database.save_control_rule(analyte_id, args.type, args.frequence, args.periode, args.quantite,
+                                             args.unite, args.ouvres)
+        return 0 if rule_id else 1
+    if args.action == "delete":
+        if args.analyte is None or not args.analyte.isdigit():
+            print("Usage : controls delete ID")
+            return 1
+        return 0 if database.delete_control_rule(int(args.analyte)) else 1
+
+    print("\t".join(["ID", "Nom analyte", "Type", "Règle", "Quantité", "Unité"]))
+    for rule_id, _analyte_id, name, _analyte_unit, kind, frequency, period, working_days, quantity, unit \
+            in database.get_control_rules():
+        print("\t".join([str(rule_id), name, control_schedule.CONTROL_KINDS[kind],
+                         control_schedule.rule_label(frequency, period, working_days), f"{quantity:g}", unit]))
+    return 0
+
+
+def cmd_schedule(args, database):
+    return control_schedule.run(args)
+
+
+def cmd_maintenance(args, database):
+    results = database.run_maintenance(
+        integrity_check=not args.skip_integrity,
+        analyze=not args.skip_analyze,
+        vacuum=args.vacuum
+    )
+    for operation, result in results.items():
+        print(f"{operation} : {result}")
+    return 1 if "error" in results else 0
+
+
+def cmd_bench(args, database):
+    """
+    Mesure rapide des requêtes principales sur la base indiquée.
+    """
+    planner = planning.OrderPlanner(database)
+    operations = [
+        ("get_all_lots", database.get_all_lots),
+        ("get_all_tests", database.get_all_tests),
+        ("get_consumption_history", database.get_consumption_history),
+        ("build_plan", planner.build_plan)
+    ]
+    for name, operation in operations:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            operation()
+            timings.append(time.perf_counter() - start)
+        print(f"{name:<26} min {min(timings) * 1000:9.2f} ms   moy {sum(timings) / len(timings) * 1000:9.2f} ms")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Gestion Stock CMA en ligne de commande.")
+    parser.add_argument("--db", default="reactifs_database.db", help="Fichier de la base de données")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Exporter les lots, les tests, le plan de commande, les pertes prévues ou les scénarios")
+    export_parser.add_argument("table", choices=["lots", "tests", "plan", "waste", "scenarios"])
+    export_parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="xlsx")
+    export_parser.add_argument("--output", required=True, help="Fichier de sortie")
+    export_parser.add_argument("--mode", choices=["individual", "average"], default="individual")
+    export_parser.add_argument("--debut", default=None, help="Lots/tests utilisés à partir de cette date (yyyy-MM-dd)")
+    export_parser.add_argument("--fin", default=None, help="Lots/tests utilisés jusqu'à cette date (yyyy-MM-dd)")
+    export_parser.add_argument("--horizon", type=int, default=30, help="Jours couverts (plan)")
+    export_parser.add_argument("--periode", default=None, help="Période couverte sur le calendrier (plan, '2 mois')")
+    export_parser.add_argument("--livraison", type=int, default=7, help="Délai de livraison en jours (plan)")
+    export_parser.add_argument("--date", default=None, help="Date de référence (waste, yyyy-MM-dd)")
+    export_parser.set_defaults(handler=cmd_export)
+
+    plan_parser = subparsers.add_parser("plan", help="Calculer le plan de commande de tous les analytes")
+    planning.build_parser(plan_parser)
+    plan_parser.set_defaults(handler=cmd_plan, uses_own_database=True)
+
+    forecast_parser = subparsers.add_parser("forecast", help="Prévoir la consommation de tous les analytes")
+    forecasting.build_parser(forecast_parser)
+    forecast_parser.set_defaults(handler=cmd_forecast, uses_own_database=True)
+
+    waste_parser = subparsers.add_parser("waste", help="Projeter la consommation FEFO et les pertes des lots ouverts")
+    fefo.build_parser(waste_parser)
+    waste_parser.set_defaults(handler=cmd_waste, uses_own_database=True)
+
+    scenarios_parser = subparsers.add_parser("scenarios", help="Afficher et recalculer les scénarios enregistrés")
+    scenarios.build_parser(scenarios_parser)
+    scenarios_parser.set_defaults(handler=cmd_scenarios, uses_own_database=True)
+
+    stats_parser = subparsers.add_parser("stats", help="Afficher les moyennes par analyte")
+    stats_parser.add_argument("--analyte", default=None, help="Limiter à un analyte")
+    stats_parser.set_defaults(handler=cmd_stats)
+
+    consumption_parser = subparsers.add_parser("consumption", help="Registre des consommations")
+    consumption_parser.add_argument("action", choices=["import", "windows"])
+    consumption_parser.add_argument("file", nargs="?", help="Fichier CSV à importer (import)")
+    consumption_parser.add_argument("--jours", type=int, nargs="+", default=[7, 30, 90], help="Fenêtres en jours")
+    consumption_parser.add_argument("--date", default=None, help="Date de référence (yyyy-MM-dd)")
+    consumption_parser.set_defaults(handler=cmd_consumption)
+
+    packs_parser = subparsers.add_parser("packs", help="Conditionnements disponibles par analyte")
+    packs_parser.add_argument("action", choices=["add", "list"])
+    packs_parser.add_argument("analyte", nargs="?", help="Nom de l'analyte (add)")
+    packs_parser.add_argument("label", nargs="?", help="Libellé du conditionnement (add)")
+    packs_parser.add_argument("quantite", nargs="?", type=float, help="Quantité par conditionnement (add)")
+    packs_parser.add_argument("--mort", type=float, default=0.0, help="Volume mort par conditionnement")
+    packs_parser.add_argument("--stabilite", type=int, default=None, help="Stabilité après ouverture (jours)")
+    packs_parser.set_defaults(handler=cmd_packs)
+
+    controls_parser = subparsers.add_parser("controls", help="Règles de calibration et de contrôle qualité par analyte")
+    controls_parser.add_argument("action", choices=["add", "list", "delete"])
+    controls_parser.add_argument("analyte", nargs="?", help="Nom de l'analyte (add) ou ID de la règle (delete)")
+    controls_parser.add_argument("type", nargs="?", choices=sorted(control_schedule.CONTROL_KINDS), help="Type (add)")
+    controls_parser.add_argument("frequence", nargs="?", type=float, help="Nombre d'événements par période (add)")
+    controls_parser.add_argument("periode", nargs="?", choices=list(control_schedule.RULE_PERIODS),
+                                 help="Période de la règle ; 'lot' : après chaque nouveau lot (add)")
+    controls_parser.add_argument("quantite", nargs="?", type=float, help="Quantité de réactif par événement (add)")
+    controls_parser.add_argument("unite", nargs="?", help="Unité de la quantité (add)")
+    controls_parser.add_argument("--ouvres", action="store_true", help="Règle par jour : jours ouvrés seulement")
+    controls_parser.set_defaults(handler=cmd_controls)
+
+    schedule_parser = subparsers.add_parser("schedule", help="Planifier les calibrations et contrôles de tous les analytes")
+    control_schedule.build_parser(schedule_parser)
+    schedule_parser.set_defaults(handler=cmd_schedule, uses_own_database=True)
+
+    maintenance_parser = subparsers.add_parser("maintenance", help="Vérifier et optimiser la base de données")
+    maintenance_parser.add_argument("--vacuum", action="store_true", help="Compacter le fichier (VACUUM)")
+    maintenance_parser.add_argument("--skip-integrity", action="store_true", help="Ne pas vérifier l'intégrité")
+    maintenance_parser.add_argument("--skip-analyze", action="store_true", help="Ne pas exécuter ANALYZE")
+    maintenance_parser.set_defaults(handler=cmd_maintenance)
+
+    bench_parser = subparsers.add_parser("bench", help="Mesurer les temps des requêtes principales")
+    bench_parser.add_argument("--repeat", type=int, default=5, help="Nombre de répétitions")
+    bench_parser.set_defaults(handler=cmd_bench)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, "uses_own_database", False):
+        return args.handler(args, None)
+
+    database = ReactifsDatabase(args.db)
+    try:
+        return args.handler(args, database)
+    finally:
+        database.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+# control_schedule.py
+"""
+Planning des calibrations et des contrôles qualité (sans interface graphique).
+
+Chaque analyte peut avoir des règles (table ControlRules) : « 2 contrôles par jour ouvré »,
+« 1 calibration par semaine », « 1 calibration après chaque nouveau lot ». Sur un horizon
+donné (période du calendrier, voir periods.py), les règles de tous les analytes sont
+développées en une passe : nombre d'événements (ConsumptionCalculator.control_counts) puis
+quantité de réactif consommée, dans l'unité de l'analyte (en tests pour les analytes comptés
+en tests). Ces quantités s'ajoutent à la consommation prévue du plan de commande
+(planning.py --controles) et au volume de calibration du formulaire "Gestion des Réactifs".
+
+Pour les règles « après chaque nouveau lot », le nombre de lots ouverts sur l'horizon est
+estimé à partir de la consommation journalière passée et de la taille moyenne des lots.
+
+Utilisation en ligne de commande :
+    python control_schedule.py --periode "1 mois"
+    python control_schedule.py --periode "20 jours ouvrés" --analyte HBA1C
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from database import ReactifsDatabase
+from logic_calc import ConsumptionCalculator, UNIT_REGISTRY, DIM_COUNT
+from periods import parse_period
+
+SCHEDULE_HEADERS = ["Nom analyte", "Type", "Règle", "Événements", "Quantité", "Unité"]
+
+CONTROL_KINDS = {'calibration': "Calibration", 'controle': "Contrôle qualité"}
+
+# Périodes des règles -> libellé ('lot' : après chaque nouveau lot)
+RULE_PERIODS = {'jours': "jour", 'semaine': "semaine", 'mois': "mois", 'lot': "nouveau lot"}
+
+
+def rule_label(frequency: float, period: str, working_days: bool) -> str:
+    """
+    Libellé d'une règle : '2 × par jour ouvré', '1 × par nouveau lot'.
+    """
+    label = RULE_PERIODS[period] + (" ouvré" if working_days and period == 'jours' else "")
+    return f"{frequency:g} × par {label}"
+
+
+class ControlScheduler:
+    """
+    Développe les règles de calibration et de contrôle de tous les analytes sur un horizon.
+    """
+    def __init__(self, database: ReactifsDatabase, calculator: ConsumptionCalculator = None):
+        self.database = database
+        self.calculator = calculator or ConsumptionCalculator()
+
+    def lot_openings(self, horizon_days: int, as_of: str = None) -> dict:
+        """
+        Nombre de lots attendus sur l'horizon, par analyte : consommation journalière passée
+        × jours / taille moyenne d'un lot (tests pour les analytes comptés en tests).
+        """
+        history = self.database.get_consumption_history(as_of)
+        if not history:
+            return {}
+        columns = np.array([row[3:] for row in history], dtype=float).reshape(len(history), 8)
+        (consumed_volume, volume_days, avg_lot_volume, _stock_volume,
+         performed_tests, test_days, avg_lot_tests, _stock_tests) = columns.T
+        counted = np.array([UNIT_REGISTRY.dimension(row[2]) == DIM_COUNT for row in history], dtype=bool)
+        daily = np.where(counted, performed_tests, consumed_volume) / np.maximum(
+            np.where(counted, test_days, volume_days), 1)
+        lot_size = np.where(counted, avg_lot_tests, avg_lot_volume)
+        openings = np.where(lot_size > 0, daily * horizon_days / np.where(lot_size > 0, lot_size, 1), 0.0)
+        return {row[0]: float(value) for row, value in zip(history, openings)}
+
+    def expand(self, time_value: int, time_unit: str, as_of: str = None, working_days: bool = False,
+               analyte_ids=None) -> list:
+        """
+        Événements et quantités de réactif de chaque règle sur l'horizon de `time_value` `time_unit`
+        commençant à `as_of` (aujourd'hui par défaut).
+        :return: liste de dictionnaires, un par règle ; 'erreur' si la quantité n'est pas convertible
+        """
+        rules = self.database.get_control_rules(analyte_ids)
+        if not rules:
+            return []
+        _rule_ids, rule_analytes, _names, _units, _kinds, frequencies, periods, rule_working_days, _quantities, \
+            _rule_units = zip(*rules)
+        frequencies = np.array(frequencies, dtype=float)
+        periods = np.array(periods)
+        rule_working_days = np.array(rule_working_days, dtype=bool)
+
+        # Horizon ramené en jours du calendrier, puis un calcul de période par (période, jours ouvrés)
+        # appliqué à toutes les règles concernées
+        horizon_days = self.calculator.periods.days(as_of, time_value, time_unit, working_days)
+        events = np.zeros(len(rules))
+        openings = None
+        for period in np.unique(periods):
+            for working in (False, True):
+                mask = (periods == period) & (rule_working_days == working)
+                if not mask.any():
+                    continue
+                if period == 'lot':
+                    openings = openings if openings is not None else self.lot_openings(horizon_days, as_of)
+                    events[mask] = frequencies[mask] * np.array(
+                        [openings.get(analyte_id, 0.0) for analyte_id in np.array(rule_analytes)[mask]])
+                else:
+                    events[mask] = self.calculator.control_counts(
+                        frequencies[mask], period, horizon_days, 'jours', as_of, working)
+
+        schedule = []
+        for index, (rule_id, analyte_id, name, analyte_unit, kind, frequency, period, working, quantity, unit) \
+                in enumerate(rules):
+            target_unit = "test" if UNIT_REGISTRY.dimension(analyte_unit) == DIM_COUNT else analyte_unit
+            entry = {
+                'rule_id': rule_id,
+                'analyte_id': analyte_id,
+                'nom_analyte': name,
+                'kind': kind,
+                'rule': rule_label(frequency, period, working),
+                'events': float(events[index]),
+                'unite': target_unit
+            }
+            try:
+                entry['quantity'] = float(events[index] * quantity * UNIT_REGISTRY.factor(unit, target_unit))
+            except ValueError as e:
+                entry['erreur'] = str(e)
+            schedule.append(entry)
+        return schedule
+
+
+def schedule_totals(schedule: list, kinds=tuple(CONTROL_KINDS)) -> dict:
+    """
+    Quantité de réactif des règles par analyte (unité de l'analyte), pour les types indiqués.
+    """
+    totals = {}
+    for entry in schedule:
+        if entry['kind'] in kinds and 'erreur' not in entry:
+            totals[entry['analyte_id']] = totals.get(entry['analyte_id'], 0.0) + entry['quantity']
+    return totals
+
+
+def analyte_schedule(database, analyte_name: str, time_value: int, time_unit: str) -> list:
+    """
+    Planning des règles d'un analyte nommé, pour le service de base de données.
+    """
+    analyte_id = database.get_analyte_id(analyte_name)
+    if analyte_id is None:
+        return []
+    return ControlScheduler(database).expand(time_value, time_unit, analyte_ids=[analyte_id])
+
+
+def schedule_to_rows(schedule: list) -> list:
+    """
+    Convertit un planning en lignes de texte alignées sur SCHEDULE_HEADERS.
+    """
+    return [
+        [
+            entry['nom_analyte'],
+            CONTROL_KINDS[entry['kind']],
+            entry['rule'],
+            f"{entry['events']:.1f}",
+            entry.get('erreur') or f"{entry['quantity']:.2f}",
+            entry['unite']
+        ]
+        for entry in schedule
+    ]
+
+
+def build_parser(parser: argparse.ArgumentParser = None) -> argparse.ArgumentParser:
+    # Sous-commande de cli.py : l'option --db générale n'est pas écrasée par celle-ci
+    database_default = "reactifs_database.db" if parser is None else argparse.SUPPRESS
+    parser = parser or argparse.ArgumentParser(description="Planning des calibrations et des contrôles.")
+    parser.add_argument("--db", default=database_default, help="Fichier de la base de données")
+    parser.add_argument("--periode", default="1 mois", help="Horizon ('1 mois', '6 semaines', '20 jours ouvrés')")
+    parser.add_argument("--date", default=None, help="Début de l'horizon (yyyy-MM-dd)")
+    parser.add_argument("--analyte", default=None, help="Limiter à un analyte")
+    return parser
+
+
+def run(args) -> int:
+    try:
+        value, unit, working_days = parse_period(args.periode)
+    except ValueError as e:
+        print(e)
+        return 1
+    database = ReactifsDatabase(args.db)
+    try:
+        analyte_ids = None
+        if args.analyte:
+            analyte_id = database.get_analyte_id(args.analyte)
+            if analyte_id is None:
+                print(f"Analyte inconnu : {args.analyte}")
+                return 1
+            analyte_ids = [analyte_id]
+        schedule = ControlScheduler(database).expand(value, unit, args.date, working_days, analyte_ids)
+        print("\t".join(SCHEDULE_HEADERS))
+        for row in schedule_to_rows(schedule):
+            print("\t".join(row))
+        return 0
+    finally:
+        database.close()
+
+
+def main(argv=None) -> int:
+    return run(build_parser().parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+# data_generator.py
+"""
+Générateur reproductible de données synthétiques (Analytes, Lots, Tests).
+
+Remplace l'ancien script 'Fichiers de Tests/testdatabase.py' : les données sont écrites
+dans un fichier cible (jamais la base de production par défaut), par blocs avec
+executemany dans de grandes transactions, ce qui permet de générer des dizaines de
+millions de lignes.
+
+Modèle :
+    - les analytes du laboratoire, chacun avec une unité, un conditionnement (tests par
+      coffret), un volume par test, une durée moyenne d'utilisation d'un lot et une
+      stabilité après ouverture
+    - consommation saisonnière (creux estival, pic hivernal) et tendance annuelle,
+      avec un bruit gamma sur la durée de chaque lot
+    - un lot dont la durée dépasse sa stabilité est périmé : il est clôturé à la date de
+      péremption avec un volume restant perdu
+    - plusieurs lots d'un même analyte peuvent être ouverts en parallèle (plusieurs
+      automates) pour que l'historique tienne sur la période demandée
+    - aucune date ne dépasse la fin de la période ni aujourd'hui : les derniers lots sont
+      encore ouverts, partiellement consommés
+    - une même graine donne les mêmes données quelle que soit la taille des blocs (--batch)
+
+Utilisation :
+    python data_generator.py synthetic.db --lots 1000000 --seed 42
+"""
+import argparse
+import math
+import os
+import sqlite3
+import sys
+import time
+from datetime import date
+
+import numpy as np
+
+from database import (
+    ReactifsDatabase, backfill_consumption, create_daily_usage_triggers, drop_daily_usage_triggers,
+    rebuild_daily_usage
+)
+
+ANALYTE_NAMES = [
+    "FSH", "PRL", "170H", "ACHBS", "ACTH", "AGHBS",
+    "ALAT", "ALB", "AMH", "AMYL", "ASAT", "ASLO",
+    "ATG", "ATPO", "AU", "BHCG", "BILL", "BL",
+    "CA125", "CA153", "CA199", "CAL", "CHOL", "CORT 8",
+    "CPK", "CREAT", "CRP", "DE LTA4", "E2", "FER",
+    "FERRI", "FIB", "FNS", "FR", "FT3", "FT4",
+    "GGT", "GLY", "GPP", "GS", "GSC", "HAV",
+    "HBA1C", "HBS", "HCV", "HDLC", "HGPO", "HGPO GSS",
+    "HIVD", "IONO", "LDH", "LH", "LIPA", "MAG",
+    "malb24", "P24", "PAL", "PHOS", "PRG", "PSA TOTAL",
+    "PSAL", "PSATL", "PTH", "RUBG", "RUBM", "SDHEA",
+    "TCK", "TESTO", "TOXG", "TOXM", "TP", "TP INR",
+    "TPHA", "TRIG", "TROP", "TSH", "UREE", "VDRL",
+    "VITB12", "VITB9", "VITD", "VS", "ACR"
+]
+
+OPERATORS = ["Khaled", "Amina", "Sofiane", "Nadia", "Yacine", "Samira", "Karim", "Leïla"]
+OPERATOR_WEIGHTS = [0.22, 0.18, 0.15, 0.12, 0.11, 0.10, 0.07, 0.05]
+
+UNITS = ["ml", "test", "µl"]
+UNIT_WEIGHTS = [0.7, 0.2, 0.1]
+
+PACK_SIZES = [50, 100, 200, 250, 500]
+STABILITY_DAYS = [14, 28, 30, 60, 90]
+
+
+class SyntheticDataGenerator:
+    """
+    Génère un historique cohérent de lots et de tests pour un ensemble d'analytes.
+    """
+    def __init__(self, seed: int = 0, start_date: str = "2015-01-01", years: float = 5.0,
+                 analyte_count: int = len(ANALYTE_NAMES)):
+        self.seed = seed
+        self.start = np.datetime64(start_date, "D")
+        self.span_days = max(1, int(years * 365))
+        # Dernier jour de l'historique (décalage depuis start) : fin de la période, sans dépasser aujourd'hui
+        today = int((np.datetime64(date.today(), "D") - self.start).astype(int))
+        self.last_day = self.span_days - 1 if today < 0 else min(self.span_days - 1, today)
+        # Jour de la semaine (lundi = 0) et jour de l'année de start, pour la saisonnalité du calendrier réel
+        self.start_weekday = int((self.start.astype(int) + 3) % 7)  # 1970-01-01 était un jeudi
+        self.start_day_of_year = int((self.start - self.start.astype("datetime64[Y]")).astype(int))
+        self.rng = np.random.default_rng(seed)
+        self.analytes = self._build_analytes(analyte_count)
+
+    def _build_analytes(self, count: int) -> list:
+        """
+        Tire les caractéristiques de chaque analyte.
+        """
+        names = [ANALYTE_NAMES[i % len(ANALYTE_NAMES)] + (f" {i // len(ANALYTE_NAMES)}" if i >= len(ANALYTE_NAMES) else "")
+                 for i in range(count)]
+        units = self.rng.choice(UNITS, size=count, p=UNIT_WEIGHTS)
+        analytes = []
+        for index, name in enumerate(names):
+            unit = str(units[index])
+            pack = int(self.rng.choice(PACK_SIZES))
+            volume_per_test = {"ml": float(self.rng.choice([0.05, 0.1, 0.2, 0.5, 1.0])),
+                               "µl": float(self.rng.choice([5, 10, 20, 50])),
+                               "test": 1.0}[unit]
+            analytes.append({
+                "id": index + 1,
+                "name": name,
+                "unit": unit,
+                "pack_tests": pack,
+                "volume_per_test": volume_per_test,
+                # Durée moyenne d'utilisation d'un lot (jours), très variable d'un analyte à l'autre
+                "mean_duration": float(np.clip(self.rng.lognormal(math.log(20), 0.6), 3, 120)),
+                "stability_days": int(self.rng.choice(STABILITY_DAYS)),
+                "dead_volume": float(self.rng.uniform(0.02, 0.08)),
+                "weight": float(self.rng.lognormal(0, 0.8))
+            })
+        return analytes
+
+    def split_lots(self, lot_count: int) -> np.ndarray:
+        """
+        Répartit le nombre total de lots entre les analytes (les plus consommés en ont davantage).
+        """
+        weights = np.array([analyte["weight"] for analyte in self.analytes])
+        return self.rng.multinomial(lot_count, weights / weights.sum())
+
+    def seasonal_factor(self, days: np.ndarray) -> np.ndarray:
+        """
+        Facteur multiplicatif de la consommation : pic en hiver, creux en été,
+        moins d'activité le week-end et une hausse de 5 % par an.
+        """
+        day_of_year = ((days + self.start_day_of_year) % 365.25) / 365.25
+        season = 1.0 + 0.25 * np.cos(2 * np.pi * day_of_year)
+        weekday = np.where(((days + self.start_weekday) % 7) >= 5, 0.6, 1.08)
+        trend = 1.0 + 0.05 * days / 365.0
+        return season * weekday * trend
+
+    def generate_analyte(self, analyte: dict, lot_count: int, first_index: int, batch_size: int = None):
+        """
+        Génère les lignes Lots et Tests d'un analyte, par blocs de `batch_size` lots.
+        Chaque analyte a son propre générateur aléatoire (graine, id de l'analyte) et tout son
+        historique est tiré en une fois : le résultat ne dépend pas de la taille des blocs.
+        :return: itérateur de (lignes Lots, lignes Tests) prêtes pour executemany
+        """
+        if lot_count == 0:
+            return
+        rng = np.random.default_rng([self.seed, analyte["id"]])
+        mean_duration = analyte["mean_duration"]
+        lanes = max(1, math.ceil(lot_count * mean_duration / self.span_days))
+        lane = np.arange(lot_count) % lanes
+
+        # Durées de base, puis dates de début approximatives pour appliquer la saisonnalité
+        noise = rng.gamma(8.0, 1.0 / 8.0, size=lot_count)
+        durations = mean_duration * noise
+        starts = self._lane_starts(durations, lane, lanes)
+        durations = np.maximum(1.0, durations / self.seasonal_factor(starts))
+        starts = self._lane_starts(durations, lane, lanes)
+
+        pack = analyte["pack_tests"]
+        dead_volume = analyte["dead_volume"]
+        expired = durations > analyte["stability_days"]
+        used_days = np.where(expired, analyte["stability_days"], durations)
+        # L'historique s'arrête au dernier jour : un lot encore ouvert n'a consommé que les jours écoulés
+        starts = np.minimum(starts, self.last_day)
+        used_days = np.minimum(used_days, self.last_day - starts)
+        # Un lot périmé ou encore ouvert n'a consommé qu'une partie de ses tests
+        usable_tests = pack * (1 - dead_volume)
+        performed = np.floor(usable_tests * used_days / durations * rng.uniform(0.9, 1.0, size=lot_count)).astype(int)
+        performed = np.maximum(performed, 1)
+
+        total_volume = pack * analyte["volume_per_test"] if analyte["unit"] != "test" else float(pack)
+        consumed = performed * (analyte["volume_per_test"] if analyte["unit"] != "test" else 1.0)
+        remaining = np.maximum(0.0, total_volume - consumed * (1 + dead_volume))
+        loss_percentage = np.round((pack - performed) / pack * 100, 2)
+        usage_factor = np.round(performed / pack, 2)
+
+        start_dates = (self.start + starts.astype(int)).astype(str)
+        end_dates = (self.start + (starts + used_days).astype(int)).astype(str)
+        operators = rng.choice(OPERATORS, size=lot_count, p=OPERATOR_WEIGHTS)
+        lot_numbers = [f"{analyte['id']:03d}-{first_index + i:09d}" for i in range(lot_count)]
+
+        analyte_id = analyte["id"]
+        remaining = np.round(remaining, 2).tolist()
+        performed = performed.tolist()
+        loss_percentage = loss_percentage.tolist()
+        start_dates = start_dates.tolist()
+        end_dates = end_dates.tolist()
+        operators = operators.tolist()
+        usage_factor = usage_factor.tolist()
+        batch_size = batch_size or lot_count
+        for chunk_start in range(0, lot_count, batch_size):
+            chunk = range(chunk_start, min(lot_count, chunk_start + batch_size))
+            lots = [
+                (analyte_id, lot_numbers[i], start_dates[i], end_dates[i], total_volume,
+                 remaining[i], performed[i], loss_percentage[i], operators[i])
+                for i in chunk
+            ]
+            tests = [
+                (analyte_id, lot_numbers[i], pack, performed[i], usage_factor[i],
+                 loss_percentage[i], start_dates[i], end_dates[i], operators[i])
+                for i in chunk
+            ]
+            yield lots, tests
+
+    def _lane_starts(self, durations: np.ndarray, lane: np.ndarray, lanes: int) -> np.ndarray:
+        """
+        Chaque automate (voie) enchaîne ses lots : le début d'un lot est la fin du précédent.
+        """
+        starts = np.empty_like(durations)
+        for index in range(lanes):
+            mask = lane == index
+            lane_durations = durations[mask]
+            starts[mask] = np.concatenate(([0.0], np.cumsum(lane_durations)[:-1])) + index * 0.5
+        return np.floor(starts)
+
+
+def generate_database(path: str, lot_count: int, seed: int = 0, start_date: str = "2015-01-01",
+                      years: float = 5.0, analyte_count: int = len(ANALYTE_NAMES),
+                      batch_size: int = 200_000, overwrite: bool = False, verbose: bool = False) -> dict:
+    """
+    Crée (ou remplace) le fichier `path` et y charge l'historique synthétique.
+    :return: statistiques de génération (lignes insérées, durée)
+    """
+    if os.path.exists(path):
+        if not overwrite:
+            raise FileExistsError(f"Le fichier '{path}' existe déjà.")
+        os.remove(path)
+
+    started = time.perf_counter()
+    database = ReactifsDatabase(path)  # Crée le schéma de l'application
+    database.close()
+
+    generator = SyntheticDataGenerator(seed, start_date, years, analyte_count)
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    try:
+        # Fichier jetable : pas de journal ni de synchronisation pendant le chargement
+        cursor.execute("PRAGMA journal_mode = OFF")
+        cursor.execute("PRAGMA synchronous = OFF")
+        cursor.execute("PRAGMA cache_size = -200000")
+
+        cursor.execute("BEGIN")
+        drop_daily_usage_triggers(cursor)  # DailyUsage est recalculée en une fois à la fin
+        cursor.executemany(
+            "INSERT INTO Analytes (id, name, unit) VALUES (?, ?, ?)",
+            [(analyte["id"], analyte["name"], analyte["unit"]) for analyte in generator.analytes]
+        )
+
+        pending = 0
+        first_index = 0
+        for analyte, count in zip(generator.analytes, generator.split_lots(lot_count).tolist()):
+            for lots, tests in generator.generate_analyte(analyte, count, first_index, batch_size):
+                chunk = len(lots)
+                first_index += chunk
+                cursor.executemany("""
+                    INSERT INTO Lots (analyte_id, lot_number, start_date, end_date, total_volume,
+                                      remaining_volume, tests_performed, loss_percentage, operator)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, lots)
+                cursor.executemany("""
+                    INSERT INTO Tests (analyte_id, lot_number, estimated_tests, performed_tests, usage_factor,
+                                       loss_percentage, start_date, end_date, operator)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, tests)
+                pending += chunk
+                if pending >= batch_size:
+                    conn.commit()
+                    cursor.execute("BEGIN")
+                    pending = 0
+                    if verbose:
+                        print(f"{first_index} / {lot_count} lots insérés", flush=True)
+        backfill_consumption(cursor)  # Registre des consommations : un événement par lot entamé
+        rebuild_daily_usage(cursor)
+        create_daily_usage_triggers(cursor)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return {
+        "analytes": len(generator.analytes),
+        "lots": lot_count,
+        "tests": lot_count,
+        "seconds": time.perf_counter() - started
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Génère une base de données synthétique reproductible.")
+    parser.add_argument("output", help="Fichier de la base à créer")
+    parser.add_argument("--lots", type=int, default=10_000, help="Nombre de lots (et de tests) à générer")
+    parser.add_argument("--seed", type=int, default=0, help="Graine du générateur")
+    parser.add_argument("--debut", default="2015-01-01", help="Date de début de l'historique (yyyy-MM-dd)")
+    parser.add_argument("--annees", type=float, default=5.0, help="Durée de l'historique en années")
+    parser.add_argument("--analytes", type=int, default=len(ANALYTE_NAMES), help="Nombre d'analytes")
+    parser.add_argument("--batch", type=int, default=200_000, help="Lignes par transaction")
+    parser.add_argument("--force", action="store_true", help="Remplacer le fichier s'il existe")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    date.fromisoformat(args.debut)  # Valide la date avant de générer
+    try:
+        stats = generate_database(args.output, args.lots, args.seed, args.debut, args.annees,
+                                  args.analytes, args.batch, args.force, verbose=True)
+    except FileExistsError as e:
+        print(f"{e} Utilisez --force pour le remplacer.")
+        return 1
+    print(f"{stats['lots']} lots et {stats['tests']} tests générés pour {stats['analytes']} analytes "
+          f"en {stats['seconds']:.1f} s dans '{args.output}'.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
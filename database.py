@@ -1,6 +1,488 @@
+import json
 import sqlite3
-from datetime import datetime
-from PySide6.QtCore import QThread, Signal
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import date, datetime
+from PySide6.QtCore import QCoreApplication, QObject, QThread, Qt, Signal, Slot
+
+from sql_trace import GUARD, TracedCursor
+
+
+def is_gui_thread() -> bool:
+    """
+    Vrai si l'appel a lieu sur le thread principal d'une application Qt (l'outil en
+    ligne de commande n'a pas d'application Qt et n'est donc jamais signalé).
+    """
+    return threading.current_thread() is threading.main_thread() and QCoreApplication.instance() is not None
+
+
+GUARD.is_gui_thread = is_gui_thread
+
+DEFAULT_CHUNK_SIZE = 500
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def epoch_day(value) -> int | None:
+    """
+    Numéro de jour (jours écoulés depuis le 1970-01-01) d'une date 'yyyy-MM-dd', ou None si elle est invalide.
+    """
+    try:
+        return date.fromisoformat(value).toordinal() - EPOCH_ORDINAL
+    except (TypeError, ValueError):
+        return None
+
+
+def day_column(column: str) -> str:
+    """
+    Expression SQL du numéro de jour d'une colonne date (même convention que epoch_day).
+    """
+    return f"CAST(julianday({column}) - 2440587.5 AS INTEGER)"
+
+
+def migrate_day_columns(cursor):
+    """
+    Version 1 : numéros de jour et valeurs dérivées calculés par SQLite (colonnes générées).
+    Les dates restent saisies en texte ; start_day / end_day sont indexés pour les recherches par période.
+    """
+    for table in ("Lots", "Tests"):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN start_day INTEGER "
+                       f"GENERATED ALWAYS AS ({day_column('start_date')}) VIRTUAL")
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN end_day INTEGER "
+                       f"GENERATED ALWAYS AS ({day_column('end_date')}) VIRTUAL")
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN duration_days INTEGER "
+                       f"GENERATED ALWAYS AS (ABS(end_day - start_day)) VIRTUAL")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table.lower()}_start_day ON {table}(start_day)")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table.lower()}_end_day ON {table}(end_day)")
+
+    cursor.execute("""
+        ALTER TABLE Lots ADD COLUMN volume_per_test REAL GENERATED ALWAYS AS (
+            CASE WHEN tests_performed > 0 THEN (total_volume - remaining_volume) / tests_performed END
+        ) VIRTUAL
+    """)
+    cursor.execute("""
+        ALTER TABLE Tests ADD COLUMN loss_tests INTEGER GENERATED ALWAYS AS (estimated_tests - performed_tests) VIRTUAL
+    """)
+
+
+# Écart de consommation d'un lot modifié à la main (paramètres : restant, tests, id, restant, tests),
+# enregistré dans le registre avant l'UPDATE du lot
+LEDGER_ADJUSTMENT_SQL = """
+    INSERT INTO Consumption (lot_id, consumed_at, volume, tests, operator, source)
+    SELECT id, datetime('now', 'localtime'), remaining_volume - ?, ? - tests_performed, operator, 'adjustment'
+    FROM Lots
+    WHERE id = ? AND (remaining_volume <> ? OR tests_performed <> ?)
+"""
+
+
+# Numéro du jour courant (même convention que epoch_day)
+TODAY_DAY_SQL = day_column("'now', 'localtime'")
+
+
+def _create_opening_table(cursor):
+    cursor.execute("""
+        CREATE TEMP TABLE _opening (
+            lot_id INTEGER PRIMARY KEY, volume REAL, tests INTEGER,
+            first_day INTEGER, last_day INTEGER, operator TEXT
+        )
+    """)
+
+
+def _insert_openings(cursor):
+    """
+    Inscrit dans le registre les consommations de la table temporaire _opening
+    (lot_id, volume, tests, first_day, last_day, operator) : un événement 'opening' par jour
+    de first_day à last_day, le total étant réparti également (les tests en nombres entiers).
+    Les soldes des lots ne changent pas : consumption_apply ignore les événements 'opening'.
+    """
+    cursor.execute("""
+        WITH RECURSIVE spread(lot_id, day) AS (
+            SELECT lot_id, first_day FROM _opening
+            UNION ALL
+            SELECT spread.lot_id, spread.day + 1
+            FROM spread JOIN _opening ON _opening.lot_id = spread.lot_id
+            WHERE spread.day < _opening.last_day
+        )
+        INSERT INTO Consumption (lot_id, consumed_at, volume, tests, operator, source)
+        SELECT o.lot_id, date(spread.day * 86400, 'unixepoch'),
+               o.volume * (spread.day - o.first_day + 1) / (o.last_day - o.first_day + 1)
+                   - o.volume * (spread.day - o.first_day) / (o.last_day - o.first_day + 1),
+               o.tests * (spread.day - o.first_day + 1) / (o.last_day - o.first_day + 1)
+                   - o.tests * (spread.day - o.first_day) / (o.last_day - o.first_day + 1),
+               o.operator, 'opening'
+        FROM spread JOIN _opening AS o ON o.lot_id = spread.lot_id
+    """)
+
+
+def rebuild_consumption_daily(cursor):
+    """
+    Recalcule entièrement les cumuls journaliers (ConsumptionDaily) à partir du registre.
+    """
+    cursor.execute("DELETE FROM ConsumptionDaily")
+    cursor.execute("""
+        INSERT INTO ConsumptionDaily (day, analyte_id, volume, tests, events)
+        SELECT Consumption.day, Lots.analyte_id, SUM(Consumption.volume), SUM(Consumption.tests), COUNT(*)
+        FROM Consumption
+        JOIN Lots ON Lots.id = Consumption.lot_id
+        GROUP BY Consumption.day, Lots.analyte_id
+    """)
+
+
+def backfill_consumption(cursor):
+    """
+    Reporte l'état actuel des lots sans historique dans le registre, réparti jour par jour
+    du début du lot jusqu'à sa fin (ou aujourd'hui s'il est encore ouvert) pour ne pas créer
+    de pic artificiel dans les fenêtres glissantes, puis recalcule les cumuls journaliers.
+    Les soldes des lots ne changent pas.
+    """
+    cursor.execute("DROP TRIGGER IF EXISTS consumption_apply")  # Cumuls recalculés en une fois à la fin
+    _create_opening_table(cursor)
+    cursor.execute(f"""
+        INSERT INTO _opening (lot_id, volume, tests, first_day, last_day, operator)
+        SELECT id AS lot_id, total_volume - remaining_volume AS volume, tests_performed AS tests,
+               first_day, MAX(first_day, MIN(last_day, {TODAY_DAY_SQL})) AS last_day, operator
+        FROM (
+            SELECT *, MIN(COALESCE(start_day, end_day), end_day) AS first_day,
+                      MAX(COALESCE(start_day, end_day), end_day) AS last_day
+            FROM Lots
+        ) AS lot
+        WHERE NOT EXISTS (SELECT 1 FROM Consumption WHERE Consumption.lot_id = lot.id)
+          AND (total_volume <> remaining_volume OR tests_performed <> 0)
+    """)
+    _insert_openings(cursor)
+    cursor.execute("DROP TABLE _opening")
+    create_consumption_apply_trigger(cursor)
+    rebuild_consumption_daily(cursor)
+
+
+def create_consumption_apply_trigger(cursor):
+    # Chaque événement alimente le cumul du jour de son analyte et décrémente le solde du lot,
+    # sauf l'historique 'opening', déjà compris dans le solde saisi
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS consumption_apply AFTER INSERT ON Consumption
+        BEGIN
+            UPDATE Lots
+            SET remaining_volume = MAX(remaining_volume - NEW.volume, 0),
+                tests_performed = MAX(tests_performed + NEW.tests, 0)
+            WHERE id = NEW.lot_id AND NEW.source <> 'opening';
+
+            INSERT INTO ConsumptionDaily (day, analyte_id, volume, tests, events)
+            SELECT NEW.day, analyte_id, NEW.volume, NEW.tests, 1 FROM Lots WHERE id = NEW.lot_id
+            ON CONFLICT (day, analyte_id) DO UPDATE SET
+                volume = volume + excluded.volume,
+                tests = tests + excluded.tests,
+                events = events + 1;
+        END
+    """)
+
+
+def migrate_consumption_ledger(cursor):
+    """
+    Version 2 : registre des consommations (ajout seul) et cumuls journaliers par analyte.
+    """
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS Consumption (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            lot_id INTEGER NOT NULL,
+            consumed_at TEXT NOT NULL,
+            volume REAL NOT NULL DEFAULT 0.0,
+            tests INTEGER NOT NULL DEFAULT 0,
+            operator TEXT,
+            source TEXT NOT NULL DEFAULT 'usage',
+            day INTEGER GENERATED ALWAYS AS ({day_column('consumed_at')}) STORED,
+            FOREIGN KEY (lot_id) REFERENCES Lots(id) ON DELETE CASCADE
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_consumption_lot_day ON Consumption(lot_id, day)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_consumption_day ON Consumption(day)")
+
+    # Un cumul par jour et par analyte : les fenêtres glissantes ne lisent que quelques centaines de lignes
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ConsumptionDaily (
+            day INTEGER NOT NULL,
+            analyte_id INTEGER NOT NULL,
+            volume REAL NOT NULL DEFAULT 0.0,
+            tests INTEGER NOT NULL DEFAULT 0,
+            events INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, analyte_id)
+        ) WITHOUT ROWID
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS consumption_read_only BEFORE UPDATE ON Consumption
+        BEGIN
+            SELECT RAISE(ABORT, 'Le registre des consommations est en ajout seul');
+        END
+    """)
+    # Suppression d'un lot : ses événements et leurs cumuls disparaissent avec lui
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS consumption_unapply AFTER DELETE ON Consumption
+        BEGIN
+            UPDATE ConsumptionDaily
+            SET volume = volume - OLD.volume, tests = tests - OLD.tests, events = events - 1
+            WHERE day = OLD.day AND analyte_id = (SELECT analyte_id FROM Lots WHERE id = OLD.lot_id);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS lots_delete_consumption BEFORE DELETE ON Lots
+        BEGIN
+            DELETE FROM Consumption WHERE lot_id = OLD.id;
+        END
+    """)
+    # Lot rattaché à un autre analyte : ses cumuls journaliers passent de l'ancien analyte au nouveau
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS lots_move_consumption AFTER UPDATE OF analyte_id ON Lots
+        WHEN NEW.analyte_id IS NOT OLD.analyte_id
+        BEGIN
+            UPDATE ConsumptionDaily
+            SET volume = ConsumptionDaily.volume - moved.volume,
+                tests = ConsumptionDaily.tests - moved.tests,
+                events = ConsumptionDaily.events - moved.events
+            FROM (
+                SELECT day, SUM(volume) AS volume, SUM(tests) AS tests, COUNT(*) AS events
+                FROM Consumption WHERE lot_id = NEW.id GROUP BY day
+            ) AS moved
+            WHERE ConsumptionDaily.day = moved.day AND ConsumptionDaily.analyte_id = OLD.analyte_id;
+
+            INSERT INTO ConsumptionDaily (day, analyte_id, volume, tests, events)
+            SELECT day, NEW.analyte_id, SUM(volume), SUM(tests), COUNT(*)
+            FROM Consumption WHERE lot_id = NEW.id GROUP BY day
+            ON CONFLICT (day, analyte_id) DO UPDATE SET
+                volume = volume + excluded.volume,
+                tests = tests + excluded.tests,
+                events = events + excluded.events;
+        END
+    """)
+    backfill_consumption(cursor)
+
+
+CALENDAR_START = "2000-01-01"
+CALENDAR_END = "2099-12-31"
+
+# Deux cumuls journaliers par analyte, chacun pour la donnée qu'il est seul à connaître :
+#   - ConsumptionDaily (registre) : volume consommé des lots, au jour de chaque événement
+#     (l'historique saisi avec un lot est réparti du début du lot jusqu'à aujourd'hui) ;
+#   - TestUsageDaily : tests réalisés de la table Tests, répartis sur la période de chaque test,
+#     jusqu'à aujourd'hui s'il est encore ouvert (pas de consommation sur des jours futurs).
+# La vue DailyUsage (day, analyte_id, volume, tests) les réunit ; prévisions, alertes et moyennes
+# la lisent en additionnant ses lignes par jour ou par analyte. Les fenêtres de consommation
+# récente (get_consumption_windows) lisent le registre seul.
+#
+# La répartition passe par la table Calendar : les triggers de SQLite ne permettent pas les
+# requêtes récursives. Le dernier jour réparti est conservé dans usage_end_day pour retirer
+# exactement ce qui a été ajouté. {row} : NEW, OLD ou Tests ; {last} : dernier jour réparti
+_TEST_USAGE_SPREAD = "({row}.performed_tests * 1.0 / ({last} - MIN({row}.start_day, {row}.end_day) + 1))"
+
+
+def _usage_end_day(row):
+    # Fin du test, ramenée à aujourd'hui (et au moins au premier jour) tant qu'il est ouvert
+    first_day = f"MIN({row}.start_day, {row}.end_day)"
+    return f"MAX({first_day}, MIN(MAX({row}.start_day, {row}.end_day), {TODAY_DAY_SQL}))"
+
+
+def _test_usage_add(row):
+    last = _usage_end_day(row)
+    return f"""
+        UPDATE Tests SET usage_end_day = {last} WHERE id = {row}.id;
+        INSERT INTO TestUsageDaily (day, analyte_id, tests)
+        SELECT day, {row}.analyte_id, {_TEST_USAGE_SPREAD.format(row=row, last=last)}
+        FROM Calendar
+        WHERE day BETWEEN MIN({row}.start_day, {row}.end_day) AND {last}
+        ON CONFLICT (day, analyte_id) DO UPDATE SET tests = tests + excluded.tests;
+    """
+
+
+def _test_usage_remove(row):
+    last = f"{row}.usage_end_day"
+    return f"""
+        UPDATE TestUsageDaily
+        SET tests = tests - {_TEST_USAGE_SPREAD.format(row=row, last=last)}
+        WHERE analyte_id = {row}.analyte_id
+          AND day BETWEEN MIN({row}.start_day, {row}.end_day) AND {last};
+    """
+
+
+def create_daily_usage_triggers(cursor):
+    """
+    Triggers qui tiennent TestUsageDaily à jour à chaque ajout, modification ou suppression de test.
+    """
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS daily_usage_tests_insert AFTER INSERT ON Tests
+        BEGIN {_test_usage_add("NEW")} END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS daily_usage_tests_delete AFTER DELETE ON Tests
+        BEGIN {_test_usage_remove("OLD")} END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS daily_usage_tests_update
+        AFTER UPDATE OF analyte_id, start_date, end_date, performed_tests ON Tests
+        BEGIN {_test_usage_remove("OLD")} {_test_usage_add("NEW")} END
+    """)
+
+
+def drop_daily_usage_triggers(cursor):
+    """
+    Retire les triggers de TestUsageDaily (chargements en masse, suivis de rebuild_daily_usage).
+    """
+    for event in ("insert", "delete", "update"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS daily_usage_tests_{event}")
+
+
+def rebuild_daily_usage(cursor):
+    """
+    Recalcule entièrement TestUsageDaily à partir des tests, jusqu'à aujourd'hui pour ceux encore ouverts.
+    """
+    cursor.execute("DELETE FROM TestUsageDaily")
+    cursor.execute(f"UPDATE Tests SET usage_end_day = {_usage_end_day('Tests')}")
+    cursor.execute(f"""
+        INSERT INTO TestUsageDaily (day, analyte_id, tests)
+        SELECT Calendar.day, Tests.analyte_id, SUM({_TEST_USAGE_SPREAD.format(row="Tests", last="Tests.usage_end_day")})
+        FROM Tests
+        JOIN Calendar ON Calendar.day BETWEEN MIN(Tests.start_day, Tests.end_day) AND Tests.usage_end_day
+        GROUP BY Calendar.day, Tests.analyte_id
+    """)
+
+
+def migrate_daily_usage(cursor):
+    """
+    Version 3 : consommation journalière par analyte (vue DailyUsage : volume du registre,
+    tests de la table Tests tenus à jour par triggers).
+    """
+    cursor.execute("CREATE TABLE IF NOT EXISTS Calendar (day INTEGER PRIMARY KEY)")
+    cursor.execute(f"""
+        WITH RECURSIVE days(day) AS (
+            SELECT {epoch_day(CALENDAR_START)}
+            UNION ALL
+            SELECT day + 1 FROM days WHERE day < {epoch_day(CALENDAR_END)}
+        )
+        INSERT OR IGNORE INTO Calendar (day) SELECT day FROM days
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS TestUsageDaily (
+            day INTEGER NOT NULL,
+            analyte_id INTEGER NOT NULL,
+            tests REAL NOT NULL DEFAULT 0.0,
+            PRIMARY KEY (day, analyte_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE VIEW IF NOT EXISTS DailyUsage AS
+        SELECT day, analyte_id, volume, 0.0 AS tests FROM ConsumptionDaily
+        UNION ALL
+        SELECT day, analyte_id, 0.0 AS volume, tests FROM TestUsageDaily
+    """)
+    cursor.execute("ALTER TABLE Tests ADD COLUMN usage_end_day INTEGER")
+    rebuild_daily_usage(cursor)
+    create_daily_usage_triggers(cursor)
+
+
+def migrate_forecast_params(cursor):
+    """
+    Version 4 : paramètres des modèles de prévision (voir forecasting.py), mis à jour jour après jour.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ForecastParams (
+            analyte_id INTEGER NOT NULL,
+            measure TEXT NOT NULL CHECK(measure IN ('volume', 'tests')),
+            model TEXT NOT NULL CHECK(model IN ('ses', 'croston')),
+            alpha REAL NOT NULL,
+            level REAL NOT NULL,
+            size REAL NOT NULL,
+            interval REAL NOT NULL,
+            since_demand INTEGER NOT NULL,
+            sse REAL NOT NULL,
+            errors INTEGER NOT NULL,
+            demand_days INTEGER NOT NULL,
+            active_days INTEGER NOT NULL,
+            fitted_day INTEGER NOT NULL,
+            last_day INTEGER NOT NULL,
+            PRIMARY KEY (analyte_id, measure),
+            FOREIGN KEY (analyte_id) REFERENCES Analytes(id) ON DELETE CASCADE
+        )
+    """)
+
+
+def migrate_pack_options(cursor):
+    """
+    Version 5 : conditionnements disponibles par analyte (voir pack_optimizer.py).
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS PackOptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            analyte_id INTEGER NOT NULL,
+            label TEXT NOT NULL,
+            quantity REAL NOT NULL CHECK(quantity > 0),
+            dead_volume REAL NOT NULL DEFAULT 0.0 CHECK(dead_volume >= 0),
+            stability_days INTEGER CHECK(stability_days > 0),
+            UNIQUE (analyte_id, label),
+            FOREIGN KEY (analyte_id) REFERENCES Analytes(id) ON DELETE CASCADE
+        )
+    """)
+
+
+def migrate_scenarios(cursor):
+    """
+    Version 6 : scénarios de calcul du formulaire "Gestion des Réactifs" (voir scenarios.py).
+    Les entrées sont enregistrées en JSON ; le résultat est gardé avec l'empreinte des entrées
+    effectives qui l'ont produit.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Scenarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            analyte_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            inputs TEXT NOT NULL,
+            live_stock INTEGER NOT NULL DEFAULT 1,
+            live_consumption INTEGER NOT NULL DEFAULT 1,
+            input_hash TEXT,
+            results TEXT,
+            computed_at TEXT,
+            UNIQUE (analyte_id, name),
+            FOREIGN KEY (analyte_id) REFERENCES Analytes(id) ON DELETE CASCADE
+        )
+    """)
+
+
+def migrate_control_rules(cursor):
+    """
+    Version 7 : règles de calibration et de contrôle qualité par analyte (voir control_schedule.py).
+    Une règle compte `frequency` événements par jour (ouvré si working_days), semaine, mois
+    ou nouveau lot ; chaque événement consomme `quantity` `unit` de réactif.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ControlRules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            analyte_id INTEGER NOT NULL,
+            kind TEXT NOT NULL CHECK(kind IN ('calibration', 'controle')),
+            frequency REAL NOT NULL CHECK(frequency > 0),
+            period TEXT NOT NULL CHECK(period IN ('jours', 'semaine', 'mois', 'lot')),
+            working_days INTEGER NOT NULL DEFAULT 0,
+            quantity REAL NOT NULL CHECK(quantity >= 0),
+            unit TEXT NOT NULL,
+            FOREIGN KEY (analyte_id) REFERENCES Analytes(id) ON DELETE CASCADE
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_control_rules_analyte ON ControlRules(analyte_id)")
+
+
+# Migrations du schéma, dans l'ordre : la version (PRAGMA user_version) est l'index de la suivante
+MIGRATIONS = [
+    migrate_day_columns, migrate_consumption_ledger, migrate_daily_usage, migrate_forecast_params,
+    migrate_pack_options, migrate_scenarios, migrate_control_rules
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def iter_chunks(cursor, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Parcourt le résultat d'une requête par blocs de `chunk_size` lignes (fetchmany).
+    """
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
 
 
 class ReactifsDatabase:
@@ -15,8 +497,9 @@ class ReactifsDatabase:
         :param db_name: Nom du fichier de la base de données (par défaut 'reactifs_database.db').
         """
         self.conn = sqlite3.connect(db_name)
-        self.cursor = self.conn.cursor()
-        self.create_tables()
+        self.cursor = TracedCursor(self.conn.cursor())  # Chaque requête est mesurée (voir sql_trace.py)
+        with GUARD.allowed():  # Création du schéma : tolérée au démarrage, même sur le thread principal
+            self.create_tables()
 
     def create_tables(self):
         """
@@ -66,11 +549,53 @@ class ReactifsDatabase:
             );
         """)
 
+        # Table OrderPlan : pour stocker les plans de commande calculés pour tous les analytes
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS OrderPlan (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                plan_date DATE NOT NULL,
+                analyte_id INTEGER NOT NULL,
+                unit TEXT NOT NULL,
+                daily_consumption REAL DEFAULT 0.0,
+                safety_stock REAL DEFAULT 0.0,
+                current_stock REAL DEFAULT 0.0,
+                reorder_point REAL DEFAULT 0.0,
+                pack_size REAL DEFAULT 0.0,
+                packs_to_order INTEGER DEFAULT 0 CHECK(packs_to_order >= 0),
+                horizon_days INTEGER NOT NULL,
+                lead_time_days INTEGER NOT NULL,
+                UNIQUE (plan_date, analyte_id),
+                FOREIGN KEY (analyte_id) REFERENCES Analytes(id) ON DELETE CASCADE
+            );
+        """)
+
         # Index pour améliorer la performance des requêtes
         self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_analyte_id ON Lots(analyte_id);")
         self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_analyte_id_tests ON Tests(analyte_id);")
 
         self.conn.commit()
+        self.migrate()
+
+    def migrate(self):
+        """
+        Applique les migrations manquantes (PRAGMA user_version), chacune dans sa transaction.
+        """
+        self.cursor.execute("PRAGMA user_version")
+        if self.cursor.fetchone()[0] >= SCHEMA_VERSION:
+            return
+
+        # Verrou d'écriture avant de relire la version : une autre connexion a pu migrer entre-temps
+        self.cursor.execute("BEGIN IMMEDIATE")
+        try:
+            self.cursor.execute("PRAGMA user_version")
+            version = self.cursor.fetchone()[0]
+            for version, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                migration(self.cursor)
+                self.cursor.execute(f"PRAGMA user_version = {version}")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
 
     def add_test(self, analyte_id: int, lot_number: str, estimated_tests: int, performed_tests: int = 0,
                  usage_factor: float = 0.0, loss_percentage: float = 0.0,
@@ -129,12 +654,28 @@ class ReactifsDatabase:
         """
         self.cursor.execute("""
             SELECT Tests.id, Analytes.name, Analytes.unit, Tests.lot_number, Tests.start_date, Tests.end_date,
-                   Tests.estimated_tests, Tests.performed_tests, Tests.usage_factor, Tests.loss_percentage, Tests.operator
+                   Tests.estimated_tests, Tests.performed_tests, Tests.usage_factor, Tests.loss_percentage, Tests.operator,
+                   Tests.duration_days, Tests.loss_tests
             FROM Tests
             JOIN Analytes ON Tests.analyte_id = Analytes.id
         """)
         return self.cursor.fetchall()
 
+    def get_tests_in_period(self, start_date: str, end_date: str) -> list:
+        """
+        Tests dont la période chevauche [start_date, end_date] (mêmes colonnes que get_all_tests).
+        La recherche utilise les index des numéros de jour.
+        """
+        self.cursor.execute("""
+            SELECT Tests.id, Analytes.name, Analytes.unit, Tests.lot_number, Tests.start_date, Tests.end_date,
+                   Tests.estimated_tests, Tests.performed_tests, Tests.usage_factor, Tests.loss_percentage, Tests.operator,
+                   Tests.duration_days, Tests.loss_tests
+            FROM Tests
+            JOIN Analytes ON Tests.analyte_id = Analytes.id
+            WHERE Tests.start_day <= ? AND Tests.end_day >= ?
+        """, (epoch_day(end_date), epoch_day(start_date)))
+        return self.cursor.fetchall()
+
     def add_lot(self, analyte_id: int, lot_number: str, start_date: str, end_date: str,
                total_volume: float, remaining_volume: float, tests_performed: int = 0,
                loss_percentage: float = 0.0, operator: str = None) -> int | None:
@@ -147,7 +688,11 @@ class ReactifsDatabase:
                     INSERT INTO Lots (analyte_id, lot_number, start_date, end_date, total_volume, remaining_volume, tests_performed, loss_percentage, operator)
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """, (analyte_id, lot_number, start_date, end_date, total_volume, remaining_volume, tests_performed, loss_percentage, operator))
-                return self.cursor.lastrowid
+                lot_id = self.cursor.lastrowid
+                # La consommation déjà saisie entre dans le registre comme historique 'opening'
+                if total_volume != remaining_volume or tests_performed:
+                    self._record_opening(lot_id, total_volume - remaining_volume, tests_performed, operator)
+                return lot_id
         except sqlite3.IntegrityError:
             print(f"Erreur : le lot '{lot_number}' existe déjà.")
             return None
@@ -155,6 +700,27 @@ class ReactifsDatabase:
             print(f"Erreur lors de l'ajout du lot : {e}")
             return None
         
+    def _record_opening(self, lot_id: int, volume: float, tests: int, operator: str = None):
+        """
+        Inscrit la consommation d'un lot antérieure à sa saisie, répartie du début du lot
+        jusqu'à sa fin (ou aujourd'hui s'il est encore ouvert), comme backfill_consumption.
+        """
+        self.cursor.execute("DROP TABLE IF EXISTS _opening")
+        _create_opening_table(self.cursor)
+        try:
+            self.cursor.execute(f"""
+                INSERT INTO _opening (lot_id, volume, tests, first_day, last_day, operator)
+                SELECT id, ?, ?, first_day, MAX(first_day, MIN(last_day, {TODAY_DAY_SQL})), ?
+                FROM (
+                    SELECT id, MIN(COALESCE(start_day, end_day), end_day) AS first_day,
+                               MAX(COALESCE(start_day, end_day), end_day) AS last_day
+                    FROM Lots WHERE id = ?
+                )
+            """, (volume, tests, operator, lot_id))
+            _insert_openings(self.cursor)
+        finally:
+            self.cursor.execute("DROP TABLE IF EXISTS _opening")
+
     def get_lot_number_by_id(self, lot_id: int) -> str | None:
         """
         Récupère le numéro de lot à partir de l'ID du lot.
@@ -182,7 +748,7 @@ class ReactifsDatabase:
                 Lots.id, Analytes.name, Analytes.unit, Lots.lot_number, 
                 Lots.start_date, Lots.end_date, Lots.total_volume, 
                 Lots.remaining_volume, Lots.tests_performed, 
-                Lots.loss_percentage, Lots.operator
+                Lots.loss_percentage, Lots.operator, Lots.duration_days, Lots.volume_per_test
             FROM Lots
             JOIN Analytes ON Lots.analyte_id = Analytes.id
             WHERE Analytes.name = ?
@@ -204,7 +770,9 @@ class ReactifsDatabase:
                     'remaining_volume': row[7],
                     'tests_performed': row[8],
                     'loss_percentage': row[9],
-                    'operator': row[10]
+                    'operator': row[10],
+                    'duration_days': row[11] or 0,
+                    'volume_per_test': row[12]
                 }
                 lots.append(lot)
             return lots
@@ -219,6 +787,9 @@ class ReactifsDatabase:
         """
         try:
             with self.conn:
+                # L'écart de volume restant / tests réalisés est conservé dans le registre des consommations
+                self.cursor.execute(LEDGER_ADJUSTMENT_SQL, (
+                    remaining_volume, tests_performed, lot_id, remaining_volume, tests_performed))
                 self.cursor.execute("""
                     UPDATE Lots
                     SET analyte_id = ?, lot_number = ?, start_date = ?, end_date = ?,
@@ -248,12 +819,42 @@ class ReactifsDatabase:
         """
         self.cursor.execute("""
             SELECT Lots.id, Analytes.name, Analytes.unit, Lots.lot_number, Lots.start_date, Lots.end_date,
-                   Lots.total_volume, Lots.remaining_volume, Lots.tests_performed, Lots.loss_percentage, Lots.operator
+                   Lots.total_volume, Lots.remaining_volume, Lots.tests_performed, Lots.loss_percentage, Lots.operator,
+                   Lots.duration_days, Lots.volume_per_test
             FROM Lots
             JOIN Analytes ON Lots.analyte_id = Analytes.id
         """)
         return self.cursor.fetchall()
 
+    def get_lots_in_period(self, start_date: str, end_date: str) -> list:
+        """
+        Lots dont la période d'utilisation chevauche [start_date, end_date] (mêmes colonnes que get_all_lots).
+        La recherche utilise les index des numéros de jour.
+        """
+        self.cursor.execute("""
+            SELECT Lots.id, Analytes.name, Analytes.unit, Lots.lot_number, Lots.start_date, Lots.end_date,
+                   Lots.total_volume, Lots.remaining_volume, Lots.tests_performed, Lots.loss_percentage, Lots.operator,
+                   Lots.duration_days, Lots.volume_per_test
+            FROM Lots
+            JOIN Analytes ON Lots.analyte_id = Analytes.id
+            WHERE Lots.start_day <= ? AND Lots.end_day >= ?
+        """, (epoch_day(end_date), epoch_day(start_date)))
+        return self.cursor.fetchall()
+
+    def stream_query(self, query: str, params: tuple = (), on_chunk=None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+        """
+        Exécute une requête et transmet ses lignes par blocs à on_chunk(rows).
+        Si on_chunk renvoie False, la lecture s'arrête (résultat devenu inutile).
+        :return: nombre de lignes transmises
+        """
+        self.cursor.execute(query, params)
+        count = 0
+        for rows in iter_chunks(self.cursor, chunk_size):
+            count += len(rows)
+            if on_chunk is not None and on_chunk(rows) is False:
+                break
+        return count
+
     def get_all_analytes(self) -> list:
         """
         Récupère tous les noms d'analytes depuis la table Analytes.
@@ -313,7 +914,7 @@ class ReactifsDatabase:
         try:
             self.cursor.execute("""
                 SELECT AVG(total_volume), AVG(remaining_volume), AVG(tests_performed), AVG(loss_percentage),
-                       AVG((total_volume - remaining_volume) / tests_performed), AVG(julianday(end_date) - julianday(start_date))
+                       AVG(volume_per_test), AVG(end_day - start_day)
                 FROM Lots
                 JOIN Analytes ON Lots.analyte_id = Analytes.id
                 WHERE Analytes.name = ?
@@ -333,10 +934,535 @@ class ReactifsDatabase:
             print(f"Erreur lors du calcul des moyennes des lots : {e}")
             return {}
 
+    def get_consumption_history(self, as_of: str = None) -> list:
+        """
+        Agrège en une seule requête l'historique de consommation de chaque analyte,
+        à partir des tables Lots (volumes) et Tests (nombre de tests).
+        :param as_of: date de référence 'yyyy-MM-dd' pour le stock actuel (par défaut aujourd'hui)
+        :return: liste de tuples (analyte_id, nom, unité,
+                 volume consommé, jours couverts par les lots, volume moyen par lot, volume en stock,
+                 tests réalisés, jours couverts par les tests, tests estimés moyens par lot, tests en stock)
+        """
+        as_of = epoch_day(as_of or datetime.now().strftime("%Y-%m-%d"))
+        try:
+            self.cursor.execute("""
+                SELECT Analytes.id, Analytes.name, Analytes.unit,
+                       COALESCE(l.consumed_volume, 0), COALESCE(l.covered_days, 0),
+                       COALESCE(l.avg_lot_volume, 0), COALESCE(l.stock_volume, 0),
+                       COALESCE(t.performed_tests, 0), COALESCE(t.covered_days, 0),
+                       COALESCE(t.avg_lot_tests, 0), COALESCE(t.stock_tests, 0)
+                FROM Analytes
+                LEFT JOIN (
+                    SELECT analyte_id,
+                           SUM(total_volume - remaining_volume) AS consumed_volume,
+                           MAX(end_day) - MIN(start_day) + 1 AS covered_days,
+                           AVG(total_volume) AS avg_lot_volume,
+                           SUM(CASE WHEN end_day >= ? THEN remaining_volume ELSE 0 END) AS stock_volume
+                    FROM Lots
+                    GROUP BY analyte_id
+                ) AS l ON l.analyte_id = Analytes.id
+                LEFT JOIN (
+                    SELECT analyte_id,
+                           SUM(performed_tests) AS performed_tests,
+                           MAX(end_day) - MIN(start_day) + 1 AS covered_days,
+                           AVG(estimated_tests) AS avg_lot_tests,
+                           SUM(CASE WHEN end_day >= ? THEN MAX(loss_tests, 0) ELSE 0 END) AS stock_tests
+                    FROM Tests
+                    GROUP BY analyte_id
+                ) AS t ON t.analyte_id = Analytes.id
+                ORDER BY Analytes.name
+            """, (as_of, as_of))
+            return self.cursor.fetchall()
+        except Exception as e:
+            print(f"Erreur lors de la récupération de l'historique de consommation : {e}")
+            return []
+
+    def record_consumption(self, lot_id: int, volume: float, tests: int = 0, consumed_at: str = None,
+                           operator: str = None) -> int | None:
+        """
+        Ajoute une consommation au registre ; le solde du lot et le cumul du jour sont mis à jour par trigger.
+        :param consumed_at: date 'yyyy-MM-dd' ou 'yyyy-MM-dd HH:MM:SS' (par défaut maintenant)
+        :return: ID de l'événement ou None
+        """
+        try:
+            with self.conn:
+                self.cursor.execute("""
+                    INSERT INTO Consumption (lot_id, consumed_at, volume, tests, operator)
+                    VALUES (?, COALESCE(?, datetime('now', 'localtime')), ?, ?, ?)
+                """, (lot_id, consumed_at, volume, tests, operator))
+                return self.cursor.lastrowid
+        except Exception as e:
+            print(f"Erreur lors de l'enregistrement de la consommation : {e}")
+            return None
+
+    def record_consumptions(self, events) -> int:
+        """
+        Ajoute en une transaction une série de consommations (lot_id, consumed_at, volume, tests, operator).
+        :return: nombre d'événements ajoutés (0 en cas d'erreur : rien n'est enregistré)
+        """
+        try:
+            with self.conn:
+                self.cursor.executemany("""
+                    INSERT INTO Consumption (lot_id, consumed_at, volume, tests, operator)
+                    VALUES (?, ?, ?, ?, ?)
+                """, events)
+                return self.cursor.rowcount
+        except Exception as e:
+            print(f"Erreur lors de l'enregistrement des consommations : {e}")
+            return 0
+
+    def get_lot_consumption(self, lot_id: int) -> list:
+        """
+        Historique des consommations d'un lot : (id, consumed_at, volume, tests, operator, source).
+        """
+        self.cursor.execute("""
+            SELECT id, consumed_at, volume, tests, operator, source
+            FROM Consumption
+            WHERE lot_id = ?
+            ORDER BY day, id
+        """, (lot_id,))
+        return self.cursor.fetchall()
+
+    def window_totals(self, table: str, windows, as_of: str = None, analyte_ids=None) -> list:
+        """
+        Sommes des colonnes volume et tests d'une table de cumuls journaliers (day, analyte_id, volume, tests)
+        sur plusieurs fenêtres glissantes, en une seule lecture de la clé primaire (day, analyte_id).
+        :return: liste de tuples (analyte_id, nom, unité, [(volume, tests) pour chaque fenêtre])
+        """
+        as_of = epoch_day(as_of or datetime.now().strftime("%Y-%m-%d"))
+        windows = list(windows)
+        columns = ", ".join(
+            f"SUM(CASE WHEN day > {as_of - window} THEN volume ELSE 0 END), "
+            f"SUM(CASE WHEN day > {as_of - window} THEN tests ELSE 0 END)"
+            for window in windows
+        )
+        params = [as_of - max(windows), as_of]
+        analyte_filter = ""
+        if analyte_ids is not None:
+            analyte_ids = list(analyte_ids)
+            analyte_filter = f"AND analyte_id IN ({', '.join('?' * len(analyte_ids))})"
+            params += analyte_ids
+        self.cursor.execute(f"""
+            SELECT Analytes.id, Analytes.name, Analytes.unit, w.*
+            FROM (
+                SELECT analyte_id, {columns}
+                FROM {table}
+                WHERE day > ? AND day <= ? {analyte_filter}
+                GROUP BY analyte_id
+            ) AS w
+            JOIN Analytes ON Analytes.id = w.analyte_id
+            ORDER BY Analytes.name
+        """, params)
+        return [
+            (row[0], row[1], row[2], [(row[4 + 2 * i], row[5 + 2 * i]) for i in range(len(windows))])
+            for row in self.cursor.fetchall()
+        ]
+
+    def get_consumption_windows(self, windows=(7, 30, 90), as_of: str = None, analyte_ids=None) -> list:
+        """
+        Consommation enregistrée de chaque analyte sur les derniers jours (registre Consumption).
+        :param windows: tailles des fenêtres en jours (jour de référence inclus)
+        :param as_of: date de référence 'yyyy-MM-dd' (par défaut aujourd'hui)
+        :param analyte_ids: analytes à inclure (par défaut tous ceux qui ont consommé)
+        :return: liste de tuples (analyte_id, nom, unité, [(volume, tests) pour chaque fenêtre])
+        """
+        return self.window_totals("ConsumptionDaily", windows, as_of, analyte_ids)
+
+    def get_daily_usage_averages(self, windows=(30, 90, 365), as_of: str = None, analyte_ids=None) -> list:
+        """
+        Consommation moyenne par jour de chaque analyte sur des fenêtres glissantes (vue DailyUsage :
+        volume des lots d'après le registre et tests réalisés de la table Tests ; aucune consommation
+        n'est comptée dans le futur).
+        Une fenêtre qui commence avant le premier jour d'utilisation de l'analyte est ramenée à ce jour.
+        :return: liste de tuples (analyte_id, nom, unité, [(volume / jour, tests / jour) pour chaque fenêtre])
+        """
+        windows = list(windows)
+        rows = self.window_totals("DailyUsage", windows, as_of, analyte_ids)
+        as_of = epoch_day(as_of or datetime.now().strftime("%Y-%m-%d"))
+        analyte_filter = f"AND analyte_id IN ({', '.join('?' * len(rows))})"
+        self.cursor.execute(f"""
+            SELECT analyte_id, MIN(day)
+            FROM DailyUsage
+            WHERE day <= ? AND (volume <> 0 OR tests <> 0) {analyte_filter}
+            GROUP BY analyte_id
+        """, [as_of] + [row[0] for row in rows])
+        first_days = dict(self.cursor.fetchall())
+        averages = []
+        for analyte_id, name, unit, totals in rows:
+            active_days = as_of - first_days.get(analyte_id, as_of) + 1
+            averages.append((analyte_id, name, unit, [
+                (volume / min(window, active_days), tests / min(window, active_days))
+                for (volume, tests), window in zip(totals, windows)
+            ]))
+        return averages
+
+    def get_daily_usage_series(self, first_day: int, last_day: int, measure: str = "tests",
+                               analyte_ids=None) -> list:
+        """
+        Consommation journalière (vue DailyUsage) entre deux numéros de jour inclus.
+        :param measure: 'tests' ou 'volume'
+        :return: liste de tuples (jour, analyte_id, valeur), triés par jour
+        """
+        if measure not in ("tests", "volume"):
+            raise ValueError(f"Mesure inconnue : {measure}")
+        params = [first_day, last_day]
+        analyte_filter = ""
+        if analyte_ids is not None:
+            analyte_ids = list(analyte_ids)
+            analyte_filter = f"AND analyte_id IN ({', '.join('?' * len(analyte_ids))})"
+            params += analyte_ids
+        self.cursor.execute(f"""
+            SELECT day, analyte_id, SUM({measure})
+            FROM DailyUsage
+            WHERE day BETWEEN ? AND ? {analyte_filter}
+            GROUP BY day, analyte_id
+            ORDER BY day
+        """, params)
+        return self.cursor.fetchall()
+
+    def get_forecast_params(self, measure: str = "tests") -> list:
+        """
+        Paramètres de prévision enregistrés (colonnes de ForecastParams à partir de model).
+        :return: liste de tuples (analyte_id, model, alpha, level, size, interval, since_demand, sse, errors,
+                 demand_days, active_days, fitted_day, last_day)
+        """
+        self.cursor.execute("""
+            SELECT analyte_id, model, alpha, level, size, interval, since_demand, sse, errors,
+                   demand_days, active_days, fitted_day, last_day
+            FROM ForecastParams
+            WHERE measure = ?
+            ORDER BY analyte_id
+        """, (measure,))
+        return self.cursor.fetchall()
+
+    def save_forecast_params(self, measure: str, rows: list) -> bool:
+        """
+        Enregistre (ou remplace) les paramètres de prévision, dans l'ordre de get_forecast_params.
+        """
+        try:
+            with self.conn:
+                self.cursor.executemany("""
+                    INSERT OR REPLACE INTO ForecastParams (analyte_id, measure, model, alpha, level, size, interval,
+                                                           since_demand, sse, errors, demand_days, active_days,
+                                                           fitted_day, last_day)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, [(row[0], measure, *row[1:]) for row in rows])
+                return True
+        except Exception as e:
+            print(f"Erreur lors de l'enregistrement des paramètres de prévision : {e}")
+            return False
+
+    def get_stock_status(self, window_days: int = 90, as_of: str = None, analyte_ids=None) -> list:
+        """
+        Stock actuel et consommation moyenne par jour (DailyUsage sur `window_days` jours) de chaque analyte.
+        :param analyte_ids: analytes à inclure (par défaut tous)
+        :return: liste de tuples (analyte_id, nom, unité, volume en stock, tests en stock,
+                 volume / jour, tests / jour)
+        """
+        as_of = epoch_day(as_of or datetime.now().strftime("%Y-%m-%d"))
+        params = [as_of, as_of, as_of - window_days, as_of]
+        analyte_filter = ""
+        if analyte_ids is not None:
+            analyte_ids = list(analyte_ids)
+            analyte_filter = f"WHERE Analytes.id IN ({', '.join('?' * len(analyte_ids))})"
+            params += analyte_ids
+        self.cursor.execute(f"""
+            SELECT Analytes.id, Analytes.name, Analytes.unit,
+                   COALESCE(l.stock_volume, 0), COALESCE(t.stock_tests, 0),
+                   COALESCE(u.volume, 0) / {window_days}, COALESCE(u.tests, 0) / {window_days}
+            FROM Analytes
+            LEFT JOIN (
+                SELECT analyte_id, SUM(remaining_volume) AS stock_volume
+                FROM Lots WHERE end_day >= ? GROUP BY analyte_id
+            ) AS l ON l.analyte_id = Analytes.id
+            LEFT JOIN (
+                SELECT analyte_id, SUM(MAX(loss_tests, 0)) AS stock_tests
+                FROM Tests WHERE end_day >= ? GROUP BY analyte_id
+            ) AS t ON t.analyte_id = Analytes.id
+            LEFT JOIN (
+                SELECT analyte_id, SUM(volume) AS volume, SUM(tests) AS tests
+                FROM DailyUsage WHERE day > ? AND day <= ? GROUP BY analyte_id
+            ) AS u ON u.analyte_id = Analytes.id
+            {analyte_filter}
+            ORDER BY Analytes.name
+        """, params)
+        return self.cursor.fetchall()
+
+    def get_pack_options(self) -> list:
+        """
+        Conditionnements enregistrés : (analyte_id, libellé, quantité, volume mort, stabilité en jours ou None).
+        La quantité est exprimée dans l'unité de l'analyte (tests pour les analytes comptés en tests).
+        """
+        self.cursor.execute("""
+            SELECT analyte_id, label, quantity, dead_volume, stability_days
+            FROM PackOptions
+            ORDER BY analyte_id, quantity
+        """)
+        return self.cursor.fetchall()
+
+    def save_pack_option(self, analyte_id: int, label: str, quantity: float, dead_volume: float = 0.0,
+                         stability_days: int = None) -> bool:
+        """
+        Ajoute (ou remplace) un conditionnement d'un analyte.
+        """
+        try:
+            with self.conn:
+                self.cursor.execute("""
+                    INSERT OR REPLACE INTO PackOptions (analyte_id, label, quantity, dead_volume, stability_days)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (analyte_id, label, quantity, dead_volume, stability_days))
+                return True
+        except Exception as e:
+            print(f"Erreur lors de l'enregistrement du conditionnement : {e}")
+            return False
+
+    def get_observed_pack_sizes(self) -> list:
+        """
+        Tailles de conditionnement relevées dans l'historique : volume total des lots et tests
+        estimés des tests, avec le nombre de lots et la plus longue durée d'utilisation observée.
+        :return: liste de tuples (analyte_id, mesure 'volume' ou 'tests', quantité, nombre de lots, jours)
+        """
+        self.cursor.execute("""
+            SELECT analyte_id, 'volume', total_volume, COUNT(*), MAX(duration_days) + 1
+            FROM Lots
+            WHERE total_volume > 0
+            GROUP BY analyte_id, total_volume
+            UNION ALL
+            SELECT analyte_id, 'tests', estimated_tests, COUNT(*), MAX(duration_days) + 1
+            FROM Tests
+            WHERE estimated_tests > 0
+            GROUP BY analyte_id, estimated_tests
+        """)
+        return self.cursor.fetchall()
+
+    def get_open_lots(self, as_of: str = None) -> list:
+        """
+        Lots encore ouverts à une date : volume restant des lots et tests restants (tests estimés
+        non réalisés) des tests dont la date de fin n'est pas dépassée.
+        :return: liste de tuples (analyte_id, mesure 'volume' ou 'tests', numéro de lot, jour de fin, restant),
+                 triés par analyte puis par date de fin
+        """
+        as_of = epoch_day(as_of or datetime.now().strftime("%Y-%m-%d"))
+        self.cursor.execute("""
+            SELECT analyte_id, 'volume', lot_number, end_day, remaining_volume
+            FROM Lots
+            WHERE end_day >= ? AND remaining_volume > 0
+            UNION ALL
+            SELECT analyte_id, 'tests', lot_number, end_day, loss_tests
+            FROM Tests
+            WHERE end_day >= ? AND loss_tests > 0
+            ORDER BY 1, 4, 3
+        """, (as_of, as_of))
+        return self.cursor.fetchall()
+
+    def save_scenario(self, analyte_id: int, name: str, inputs: dict, live_stock: bool = True,
+                      live_consumption: bool = True) -> int | None:
+        """
+        Enregistre (ou remplace) un scénario de calcul ; son résultat sera recalculé.
+        :return: identifiant du scénario, ou None en cas d'erreur
+        """
+        try:
+            with self.conn:
+                self.cursor.execute("""
+                    INSERT INTO Scenarios (analyte_id, name, inputs, live_stock, live_consumption)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (analyte_id, name) DO UPDATE SET
+                        inputs = excluded.inputs,
+                        live_stock = excluded.live_stock,
+                        live_consumption = excluded.live_consumption,
+                        input_hash = NULL,
+                        results = NULL,
+                        computed_at = NULL
+                """, (analyte_id, name, json.dumps(inputs), int(live_stock), int(live_consumption)))
+                self.cursor.execute("SELECT id FROM Scenarios WHERE analyte_id = ? AND name = ?", (analyte_id, name))
+                return self.cursor.fetchone()[0]
+        except Exception as e:
+            print(f"Erreur lors de l'enregistrement du scénario : {e}")
+            return None
+
+    def get_scenarios(self, analyte_ids=None) -> list:
+        """
+        Scénarios enregistrés (de tous les analytes ou de ceux indiqués), entrées et résultats décodés.
+        :return: liste de tuples (id, analyte_id, nom analyte, nom du scénario, entrées, stock suivi,
+                 consommation suivie, empreinte, résultats ou None, date du calcul)
+        """
+        params = []
+        analyte_filter = ""
+        if analyte_ids is not None:
+            analyte_ids = list(analyte_ids)
+            analyte_filter = f"WHERE Scenarios.analyte_id IN ({', '.join('?' * len(analyte_ids))})"
+            params = analyte_ids
+        self.cursor.execute(f"""
+            SELECT Scenarios.id, Scenarios.analyte_id, Analytes.name, Scenarios.name, inputs, live_stock,
+                   live_consumption, input_hash, results, computed_at
+            FROM Scenarios
+            JOIN Analytes ON Analytes.id = Scenarios.analyte_id
+            {analyte_filter}
+            ORDER BY Analytes.name, Scenarios.name
+        """, params)
+        return [
+            (*row[:4], json.loads(row[4]), bool(row[5]), bool(row[6]), row[7],
+             json.loads(row[8]) if row[8] else None, row[9])
+            for row in self.cursor.fetchall()
+        ]
+
+    def save_scenario_results(self, rows: list) -> bool:
+        """
+        Enregistre les résultats recalculés.
+        :param rows: liste de tuples (id, empreinte des entrées, résultats, date du calcul)
+        """
+        try:
+            with self.conn:
+                self.cursor.executemany("""
+                    UPDATE Scenarios SET input_hash = ?, results = ?, computed_at = ? WHERE id = ?
+                """, [(input_hash, json.dumps(results), computed_at, scenario_id)
+                      for scenario_id, input_hash, results, computed_at in rows])
+                return True
+        except Exception as e:
+            print(f"Erreur lors de l'enregistrement des résultats des scénarios : {e}")
+            return False
+
+    def delete_scenario(self, scenario_id: int) -> bool:
+        """
+        Supprime un scénario par son ID.
+        """
+        try:
+            with self.conn:
+                self.cursor.execute("DELETE FROM Scenarios WHERE id = ?", (scenario_id,))
+                return True
+        except Exception as e:
+            print(f"Erreur lors de la suppression du scénario : {e}")
+            return False
+
+    def save_control_rule(self, analyte_id: int, kind: str, frequency: float, period: str, quantity: float,
+                          unit: str, working_days: bool = False) -> int | None:
+        """
+        Ajoute une règle de calibration ou de contrôle qualité à un analyte.
+        :param kind: 'calibration' ou 'controle'
+        :param period: 'jours', 'semaine', 'mois' ou 'lot' (après chaque nouveau lot)
+        :return: identifiant de la règle, ou None en cas d'erreur
+        """
+        try:
+            with self.conn:
+                self.cursor.execute("""
+                    INSERT INTO ControlRules (analyte_id, kind, frequency, period, working_days, quantity, unit)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (analyte_id, kind, frequency, period, int(working_days), quantity, unit))
+                return self.cursor.lastrowid
+        except Exception as e:
+            print(f"Erreur lors de l'enregistrement de la règle de contrôle : {e}")
+            return None
+
+    def get_control_rules(self, analyte_ids=None) -> list:
+        """
+        Règles de calibration et de contrôle (de tous les analytes ou de ceux indiqués).
+        :return: liste de tuples (id, analyte_id, nom analyte, unité analyte, type, fréquence, période,
+                 jours ouvrés, quantité par événement, unité)
+        """
+        params = []
+        analyte_filter = ""
+        if analyte_ids is not None:
+            analyte_ids = list(analyte_ids)
+            analyte_filter = f"WHERE ControlRules.analyte_id IN ({', '.join('?' * len(analyte_ids))})"
+            params = analyte_ids
+        self.cursor.execute(f"""
+            SELECT ControlRules.id, ControlRules.analyte_id, Analytes.name, Analytes.unit, kind, frequency,
+                   period, working_days, quantity, ControlRules.unit
+            FROM ControlRules
+            JOIN Analytes ON Analytes.id = ControlRules.analyte_id
+            {analyte_filter}
+            ORDER BY Analytes.name, kind, ControlRules.id
+        """, params)
+        return [(*row[:7], bool(row[7]), *row[8:]) for row in self.cursor.fetchall()]
+
+    def delete_control_rule(self, rule_id: int) -> bool:
+        """
+        Supprime une règle de calibration ou de contrôle par son ID.
+        """
+        try:
+            with self.conn:
+                self.cursor.execute("DELETE FROM ControlRules WHERE id = ?", (rule_id,))
+                return True
+        except Exception as e:
+            print(f"Erreur lors de la suppression de la règle de contrôle : {e}")
+            return False
+
+    def save_order_plan(self, plan_date: str, rows: list) -> bool:
+        """
+        Enregistre (ou remplace) le plan de commande d'une date donnée.
+        :param plan_date: date du plan 'yyyy-MM-dd'
+        :param rows: liste de tuples (analyte_id, unit, daily_consumption, safety_stock, current_stock,
+                     reorder_point, pack_size, packs_to_order, horizon_days, lead_time_days)
+        """
+        try:
+            with self.conn:
+                self.cursor.executemany("""
+                    INSERT OR REPLACE INTO OrderPlan (plan_date, analyte_id, unit, daily_consumption, safety_stock,
+                                                      current_stock, reorder_point, pack_size, packs_to_order,
+                                                      horizon_days, lead_time_days)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, [(plan_date, *row) for row in rows])
+                return True
+        except Exception as e:
+            print(f"Erreur lors de l'enregistrement du plan de commande : {e}")
+            return False
+
+    def get_order_plan(self, plan_date: str = None) -> list:
+        """
+        Récupère le plan de commande d'une date (par défaut le plus récent).
+        """
+        try:
+            if plan_date is None:
+                self.cursor.execute("SELECT MAX(plan_date) FROM OrderPlan")
+                plan_date = self.cursor.fetchone()[0]
+                if plan_date is None:
+                    return []
+            self.cursor.execute("""
+                SELECT OrderPlan.plan_date, Analytes.name, OrderPlan.unit, OrderPlan.daily_consumption,
+                       OrderPlan.safety_stock, OrderPlan.current_stock, OrderPlan.reorder_point,
+                       OrderPlan.pack_size, OrderPlan.packs_to_order
+                FROM OrderPlan
+                JOIN Analytes ON OrderPlan.analyte_id = Analytes.id
+                WHERE OrderPlan.plan_date = ?
+                ORDER BY Analytes.name
+            """, (plan_date,))
+            return self.cursor.fetchall()
+        except Exception as e:
+            print(f"Erreur lors de la récupération du plan de commande : {e}")
+            return []
+
+    def run_maintenance(self, integrity_check: bool = True, analyze: bool = True, vacuum: bool = False) -> dict:
+        """
+        Exécute les opérations de maintenance de la base de données.
+        :param integrity_check: vérifie l'intégrité du fichier (PRAGMA integrity_check)
+        :param analyze: met à jour les statistiques de l'optimiseur (ANALYZE + PRAGMA optimize)
+        :param vacuum: reconstruit le fichier pour récupérer l'espace libre (VACUUM)
+        :return: dictionnaire du résultat de chaque opération
+        """
+        results = {}
+        try:
+            if integrity_check:
+                self.cursor.execute("PRAGMA integrity_check")
+                results['integrity_check'] = ", ".join(row[0] for row in self.cursor.fetchall())
+            if analyze:
+                self.cursor.execute("ANALYZE")
+                self.cursor.execute("PRAGMA optimize")
+                self.conn.commit()
+                results['analyze'] = "ok"
+            if vacuum:
+                self.conn.commit()
+                self.cursor.execute("VACUUM")
+                results['vacuum'] = "ok"
+        except Exception as e:
+            print(f"Erreur lors de la maintenance de la base de données : {e}")
+            results['error'] = str(e)
+        return results
+
     def close(self):
         """
         Ferme la connexion à la base de données.
         """
+        self.cursor.close()
         self.conn.close()
 
 
@@ -411,29 +1537,36 @@ class ReactifsDatabase:
         """
         Ferme la connexion à la base de données.
         """
+        self.cursor.close()
         self.conn.close()
 
 
 class DatabaseWorkerThread(QThread):
     """
     Thread générique pour exécuter des requêtes SQL en arrière-plan.
+
+    Avec `chunk_size`, une requête simple avec fetch est lue par blocs (fetchmany) :
+    chaque bloc est émis par chunk_ready dès qu'il est lu, et finished reçoit
+    le nombre total de lignes. requestInterruption() arrête la lecture entre deux blocs.
     """
     finished = Signal(bool, object)
+    chunk_ready = Signal(object)
 
     def __init__(self, query: str | list, params: tuple | list = None, fetch: bool = False,
-                 transaction: bool = False, db_path: str = "reactifs_database.db"):
+                 transaction: bool = False, db_path: str = "reactifs_database.db", chunk_size: int = None):
         super().__init__()
         self.query = query
         self.params = params if params else ()
         self.fetch = fetch
         self.transaction = transaction
         self.db_path = db_path
+        self.chunk_size = chunk_size
 
     def run(self):
         conn = None
         try:
             conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = TracedCursor(conn.cursor())
 
             if self.transaction:
                 cursor.execute("BEGIN TRANSACTION;")
@@ -447,7 +1580,14 @@ class DatabaseWorkerThread(QThread):
                 result = results
             else:
                 cursor.execute(self.query, self.params)
-                if self.fetch:
+                if self.fetch and self.chunk_size:
+                    result = 0
+                    for rows in iter_chunks(cursor, self.chunk_size):
+                        if self.isInterruptionRequested():
+                            break
+                        result += len(rows)
+                        self.chunk_ready.emit(rows)
+                elif self.fetch:
                     result = cursor.fetchall()
                 else:
                     result = None
@@ -468,4 +1608,105 @@ class DatabaseWorkerThread(QThread):
             self.finished.emit(False, str(e))
         finally:
             if conn:
-                conn.close()
\ No newline at end of file
+                conn.close()
+
+
+class CallbackBridge(QObject):
+    """
+    Livre le résultat d'un Future dans le thread de l'interface (connexion en file d'attente).
+    """
+    delivered = Signal(object, object, object)
+
+    def __init__(self):
+        super().__init__()
+        self.delivered.connect(self.deliver, Qt.QueuedConnection)
+
+    @Slot(object, object, object)
+    def deliver(self, future, callback, error_callback):
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            if callback:
+                callback(future.result())
+        elif error_callback:
+            error_callback(error)
+        else:
+            print(f"Erreur lors d'une requête asynchrone : {error}")
+
+
+class DatabaseService:
+    """
+    Accès asynchrone à la base de données pour les onglets.
+
+    Les appels s'exécutent dans un thread dédié qui possède sa propre connexion
+    (une connexion SQLite ne peut pas être partagée entre threads). Chaque appel
+    renvoie un concurrent.futures.Future ; si `callback` / `error_callback` sont
+    fournis, ils sont exécutés dans le thread de l'interface une fois le résultat prêt.
+
+        service = get_database_service()
+        service.call("get_lots_by_analyte", name, callback=self.on_lots_loaded)
+        service.submit(lambda db: db.get_analyte_id(name) or db.add_analyte(name, unit), callback=...)
+
+    Un seul thread exécute les appels : les écritures restent donc ordonnées.
+    Le service doit être créé depuis le thread de l'interface.
+    """
+    def __init__(self, db_path: str = "reactifs_database.db"):
+        self.db_path = db_path
+        self.database = None  # Créée dans le thread du service
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="DatabaseService")
+        self.bridge = CallbackBridge()
+
+    def _run(self, function, args, kwargs):
+        if self.database is None:
+            self.database = ReactifsDatabase(self.db_path)
+        if isinstance(function, str):
+            return getattr(self.database, function)(*args, **kwargs)
+        return function(self.database, *args, **kwargs)
+
+    def submit(self, function, *args, callback=None, error_callback=None, **kwargs) -> Future:
+        """
+        Exécute function(database, *args, **kwargs) dans le thread du service.
+        :param function: fonction recevant la ReactifsDatabase du service, ou nom d'une de ses méthodes
+        """
+        future = self.executor.submit(self._run, function, args, kwargs)
+        if callback or error_callback:
+            future.add_done_callback(lambda done: self.bridge.delivered.emit(done, callback, error_callback))
+        return future
+
+    def call(self, method_name: str, *args, callback=None, error_callback=None, **kwargs) -> Future:
+        """
+        Raccourci pour appeler une méthode de ReactifsDatabase.
+        """
+        return self.submit(method_name, *args, callback=callback, error_callback=error_callback, **kwargs)
+
+    def _close(self):
+        if self.database is not None:
+            self.database.close()
+            self.database = None
+
+    def shutdown(self):
+        """
+        Termine les appels en attente puis ferme la connexion du service.
+        """
+        self.executor.submit(self._close)
+        self.executor.shutdown(wait=True)
+
+
+_services = {}
+
+
+def get_database_service(db_path: str = "reactifs_database.db") -> DatabaseService:
+    """
+    Renvoie le service partagé pour le fichier `db_path` (créé au premier appel).
+    """
+    service = _services.get(db_path)
+    if service is None:
+        service = _services[db_path] = DatabaseService(db_path)
+    return service
+
+
+def shutdown_database_services():
+    while _services:
+        _, service = _services.popitem()
+        service.shutdown()
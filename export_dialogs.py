@@ -0,0 +1,104 @@
+# export_dialogs.py
+"""
+Partie graphique de l'exportation : boîte de dialogue des options et thread d'exportation.
+Les fonctions d'écriture des fichiers restent dans export.py, utilisable sans interface.
+"""
+from PySide6.QtWidgets import QFileDialog, QDialog, QVBoxLayout, QLabel, QRadioButton, QDialogButtonBox
+from PySide6.QtCore import QThread, Signal
+
+from export import export_to_pdf, export_to_excel, export_to_csv
+
+EXPORT_FUNCTIONS = {
+    "pdf": export_to_pdf,
+    "excel": export_to_excel,
+    "csv": export_to_csv
+}
+
+#################################################
+#                THREAD ET DIALOGUES            #
+#################################################
+
+class ExportThread(QThread):
+    """
+    Thread pour exécuter l'exportation en arrière-plan.
+    """
+    finished = Signal(bool, str)
+
+    def __init__(self, export_func, filename, headers, data, export_mode="individual"):
+        super().__init__()
+        self.export_func = export_func
+        self.filename = filename
+        self.headers = headers
+        self.data = data
+        self.export_mode = export_mode
+
+    def run(self):
+        try:
+            self.export_func(self.filename, self.headers, self.data, self.export_mode)
+            self.finished.emit(True, "Exportation réussie")
+        except Exception as e:
+            self.finished.emit(False, str(e))
+
+
+class ExportOptionsDialog(QDialog):
+    """
+    Boîte de dialogue pour choisir le mode d'exportation (individuel ou moyenne).
+    """
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Options d'exportation")
+        self.setMinimumWidth(300)
+        layout = QVBoxLayout(self)
+
+        self.individual_radio = QRadioButton("Exporter les valeurs individuelles")
+        self.average_radio = QRadioButton("Exporter les moyennes pour tests multi-lots")
+        self.individual_radio.setChecked(True)
+
+        layout.addWidget(QLabel("Choisissez le mode d'exportation :"))
+        layout.addWidget(self.individual_radio)
+        layout.addWidget(self.average_radio)
+
+        btn_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        btn_box.accepted.connect(self.accept)
+        btn_box.rejected.connect(self.reject)
+        layout.addWidget(btn_box)
+
+    def get_export_mode(self):
+        return "individual" if self.individual_radio.isChecked() else "average"
+
+
+def export_data(parent, export_type, headers, data):
+    """
+    Ouvre une boîte de dialogue pour choisir le fichier à exporter et lance le processus.
+    """
+    dialog = ExportOptionsDialog()
+    if dialog.exec_() == QDialog.Accepted:
+        export_mode = dialog.get_export_mode()
+
+        # Filtre de fichier
+        if export_type == "excel":
+            file_filter = "Fichiers Excel (*.xlsx)"
+            default_extension = ".xlsx"
+        elif export_type == "pdf":
+            file_filter = "Fichiers PDF (*.pdf)"
+            default_extension = ".pdf"
+        else:
+            file_filter = f"Fichiers {export_type.upper()} (*.{export_type.lower()})"
+            default_extension = f".{export_type.lower()}"
+
+        # Choisir l'emplacement
+        filename, _ = QFileDialog.getSaveFileName(parent, "Exporter", "", file_filter)
+        if not filename:
+            return
+
+        # Vérifier l'extension
+        if not filename.lower().endswith(default_extension):
+            filename += default_extension
+
+        # Choisir la bonne fonction
+        export_func = EXPORT_FUNCTIONS.get(export_type, export_to_excel)
+
+        # Lancer l'export dans un thread
+        parent.export_thread = ExportThread(export_func, filename, headers, data, export_mode)
+        parent.export_thread.finished.connect(parent.on_export_finished)
+        parent.export_thread.start()
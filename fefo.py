@@ -0,0 +1,163 @@
+# fefo.py
+"""
+Affectation des lots ouverts selon la règle FEFO (premier périmé, premier sorti) et
+rapport des pertes prévues (sans interface graphique).
+
+Pour chaque analyte, les lots ouverts sont consommés l'un après l'autre par date de fin
+croissante, à la consommation journalière prévue par forecasting.py (tests pour les
+analytes comptés en tests, volume sinon). Un lot n'est entamé qu'une fois le précédent
+épuisé ou périmé ; ce qu'il reste à sa date de fin est perdu :
+    consommé = min(restant, consommation/jour × jours restants avant sa date de fin)
+    périmé = restant - consommé
+
+Tous les lots du catalogue sont lus triés par (analyte, date de fin) et parcourus en une
+seule passe. Le rapport s'exporte avec les fonctions de export.py (WASTE_HEADERS).
+
+Utilisation en ligne de commande :
+    python fefo.py --date 2024-06-01
+"""
+import argparse
+import math
+import sys
+from datetime import date, datetime
+from itertools import groupby
+
+from database import EPOCH_ORDINAL, ReactifsDatabase, epoch_day
+from forecasting import DemandForecaster, predict
+from logic_calc import UNIT_REGISTRY, DIM_COUNT
+
+WASTE_HEADERS = [
+    "Nom analyte", "Unité", "Numéro Lot", "Date Fin", "Restant",
+    "Consommé prévu", "Périmé prévu", "Épuisement prévu", "Perte prévue (%)"
+]
+
+
+def allocate_lots(lots, daily_rate: float, as_of: int) -> list:
+    """
+    Consomme les lots d'un analyte dans l'ordre FEFO à partir du jour `as_of`.
+    :param lots: séquence de (numéro de lot, jour de fin, restant) triée par jour de fin
+    :return: liste de dictionnaires 'lot_number', 'end_day', 'remaining', 'consumed', 'expired',
+             'exhausted_day' (jour où le lot est épuisé, None s'il périme avant)
+    """
+    elapsed = 0.0  # Jours de consommation déjà affectés aux lots précédents
+    allocation = []
+    for lot_number, end_day, remaining in lots:
+        window = max(end_day + 1 - as_of - elapsed, 0.0)
+        consumed = min(remaining, daily_rate * window) if daily_rate > 0 else 0.0
+        exhausted_day = None
+        if consumed > 0:
+            elapsed += consumed / daily_rate
+            if consumed >= remaining:
+                exhausted_day = as_of + max(math.ceil(elapsed) - 1, 0)
+        allocation.append({
+            'lot_number': lot_number,
+            'end_day': end_day,
+            'remaining': remaining,
+            'consumed': consumed,
+            'expired': remaining - consumed,
+            'exhausted_day': exhausted_day
+        })
+    return allocation
+
+
+class FefoAllocator:
+    """
+    Projection FEFO de tous les lots ouverts du catalogue.
+    """
+    def __init__(self, database: ReactifsDatabase):
+        self.database = database
+
+    def daily_demand(self, measure: str, as_of: str = None) -> dict:
+        """
+        Consommation journalière prévue de chaque analyte : {analyte_id: quantité par jour}.
+        """
+        params = DemandForecaster(self.database, measure).update(as_of)
+        return dict(zip(params.analyte_ids.tolist(), predict(params, 1)['daily'].tolist()))
+
+    def project(self, as_of: str = None) -> list:
+        """
+        Consommation et péremption prévues de chaque lot ouvert.
+        :return: liste de dictionnaires (voir allocate_lots) avec 'analyte_id', 'nom_analyte', 'unite'
+                 et 'daily_rate', triés par analyte puis par date de fin
+        """
+        as_of = as_of or datetime.now().strftime("%Y-%m-%d")
+        today = epoch_day(as_of)
+        lots = self.database.get_open_lots(as_of)
+        self.database.cursor.execute("SELECT id, name, unit FROM Analytes")
+        analytes = {row[0]: row[1:] for row in self.database.cursor.fetchall()}
+
+        measures = {row[1] for row in lots}
+        demand = {measure: self.daily_demand(measure, as_of) for measure in measures}
+
+        projection = []
+        for analyte_id, group in groupby(lots, key=lambda row: row[0]):
+            if analyte_id not in analytes:
+                continue
+            name, unit = analytes[analyte_id]
+            counted = UNIT_REGISTRY.dimension(unit) == DIM_COUNT
+            measure = "tests" if counted else "volume"
+            daily_rate = demand.get(measure, {}).get(analyte_id, 0.0)
+            analyte_lots = [(lot_number, end_day, remaining)
+                            for _, lot_measure, lot_number, end_day, remaining in group if lot_measure == measure]
+            for entry in allocate_lots(analyte_lots, daily_rate, today):
+                entry.update(analyte_id=analyte_id, nom_analyte=name, unite="test" if counted else unit,
+                             daily_rate=daily_rate)
+                projection.append(entry)
+        projection.sort(key=lambda entry: (entry['nom_analyte'], entry['end_day'], entry['lot_number']))
+        return projection
+
+
+def day_to_text(day) -> str:
+    return date.fromordinal(day + EPOCH_ORDINAL).strftime("%Y-%m-%d") if day is not None else "-"
+
+
+def waste_to_rows(projection: list) -> list:
+    """
+    Convertit une projection FEFO en lignes de texte alignées sur WASTE_HEADERS.
+    """
+    return [
+        [
+            entry['nom_analyte'],
+            entry['unite'],
+            entry['lot_number'],
+            day_to_text(entry['end_day']),
+            f"{entry['remaining']:.2f}",
+            f"{entry['consumed']:.2f}",
+            f"{entry['expired']:.2f}",
+            day_to_text(entry['exhausted_day']),
+            f"{100 * entry['expired'] / entry['remaining']:.1f}" if entry['remaining'] else "0.0"
+        ]
+        for entry in projection
+    ]
+
+
+def build_parser(parser: argparse.ArgumentParser = None) -> argparse.ArgumentParser:
+    # Sous-commande de cli.py : l'option --db générale n'est pas écrasée par celle-ci
+    database_default = "reactifs_database.db" if parser is None else argparse.SUPPRESS
+    parser = parser or argparse.ArgumentParser(description="Pertes prévues des lots ouverts (FEFO).")
+    parser.add_argument("--db", default=database_default, help="Fichier de la base de données")
+    parser.add_argument("--date", default=None, help="Date de référence (yyyy-MM-dd)")
+    parser.add_argument("--pertes", action="store_true", help="N'afficher que les lots avec une perte prévue")
+    return parser
+
+
+def run(args) -> int:
+    database = ReactifsDatabase(args.db)
+    try:
+        projection = FefoAllocator(database).project(args.date)
+        if args.pertes:
+            projection = [entry for entry in projection if entry['expired'] > 0]
+        print("\t".join(WASTE_HEADERS))
+        for row in waste_to_rows(projection):
+            print("\t".join(row))
+        return 0
+    finally:
+        database.close()
+
+
+def main(argv=None) -> int:
+    return run(build_parser().parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
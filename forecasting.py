@@ -0,0 +1,361 @@
+# forecasting.py
+"""
+Prévision de la consommation journalière de tous les analytes (sans interface graphique).
+
+L'historique de DailyUsage est chargé dans une matrice NumPy (analytes × jours, 0 pour les
+jours sans consommation), puis deux modèles sont ajustés pour tous les analytes à la fois :
+    - lissage exponentiel simple (SES) pour les consommations régulières ;
+    - Croston (correction de Syntetos-Boylan) pour les consommations intermittentes,
+      choisi quand l'intervalle moyen entre deux jours de consommation dépasse 1,32 jour.
+Chaque modèle est évalué sur toute une grille de coefficients alpha en une passe : la boucle
+ne porte que sur les jours, chaque pas traite la matrice (analytes × alphas).
+
+Les paramètres retenus et l'état des modèles sont enregistrés dans ForecastParams :
+une nouvelle journée d'historique ne demande qu'un pas de lissage, sans réajustement.
+Les lots saisis après coup modifient des jours déjà traités ; ils sont pris en compte au
+réajustement complet suivant (tous les `refit_days` jours).
+
+Utilisation en ligne de commande :
+    python forecasting.py --horizon 30 --mesure tests
+"""
+import argparse
+import sys
+from datetime import datetime
+from statistics import NormalDist
+
+import numpy as np
+
+from database import ReactifsDatabase, epoch_day
+
+FORECAST_HEADERS = [
+    "Nom analyte", "Unité", "Modèle", "Alpha", "Prévision/Jour", "Total Horizon", "Borne Basse", "Borne Haute"
+]
+
+# Coefficients de lissage essayés lors de l'ajustement
+ALPHAS = np.array([0.02, 0.05, 0.1, 0.15, 0.2, 0.3, 0.5])
+
+# Intervalle moyen entre deux jours de consommation au-delà duquel la demande est intermittente
+INTERMITTENT_INTERVAL = 1.32
+
+# Colonnes de l'état d'un modèle, dans l'ordre de la table ForecastParams
+STATE_FIELDS = ("level", "size", "interval", "since_demand", "sse", "errors", "demand_days", "active_days")
+
+
+class ForecastParams:
+    """
+    Paramètres et état des modèles de prévision : un tableau par champ, une ligne par analyte.
+    """
+    def __init__(self, analyte_ids, croston, alpha, state, fitted_day, last_day):
+        self.analyte_ids = np.asarray(analyte_ids, dtype=np.int64)
+        self.croston = np.asarray(croston, dtype=bool)
+        self.alpha = np.asarray(alpha, dtype=float)
+        self.state = state
+        self.fitted_day = np.asarray(fitted_day, dtype=np.int64)
+        self.last_day = np.asarray(last_day, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.analyte_ids)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Reconstruit les paramètres à partir des lignes de get_forecast_params.
+        """
+        columns = list(zip(*rows)) if rows else [()] * 13
+        state = {name: np.array(columns[3 + i], dtype=float) for i, name in enumerate(STATE_FIELDS)}
+        return cls(columns[0], [model == "croston" for model in columns[1]], columns[2], state,
+                   columns[11], columns[12])
+
+    def rows(self):
+        """
+        Lignes pour save_forecast_params.
+        """
+        columns = [self.state[name].tolist() for name in STATE_FIELDS]
+        return [
+            (int(analyte_id), "croston" if croston else "ses", float(alpha), *values, int(fitted), int(last))
+            for analyte_id, croston, alpha, *values, fitted, last in zip(
+                self.analyte_ids, self.croston, self.alpha, *columns, self.fitted_day, self.last_day)
+        ]
+
+    def select(self, mask):
+        return ForecastParams(self.analyte_ids[mask], self.croston[mask], self.alpha[mask],
+                              {name: values[mask] for name, values in self.state.items()},
+                              self.fitted_day[mask], self.last_day[mask])
+
+    def merge(self, other):
+        """
+        Paramètres de self complétés (ou remplacés) par ceux de other, triés par analyte.
+        """
+        keep = ~np.isin(self.analyte_ids, other.analyte_ids)
+        parts = [self.select(keep), other]
+        order = np.argsort(np.concatenate([part.analyte_ids for part in parts]), kind="stable")
+        join = lambda values: np.concatenate(values)[order]
+        return ForecastParams(
+            join([part.analyte_ids for part in parts]), join([part.croston for part in parts]),
+            join([part.alpha for part in parts]),
+            {name: join([part.state[name] for part in parts]) for name in STATE_FIELDS},
+            join([part.fitted_day for part in parts]), join([part.last_day for part in parts])
+        )
+
+
+def empty_state(shape):
+    return {name: np.zeros(shape) for name in STATE_FIELDS}
+
+
+def smooth(matrix, alpha, croston, state, live=None):
+    """
+    Fait avancer les modèles jour après jour sur une matrice (analytes × jours).
+    Toutes les opérations sont vectorisées sur la forme de l'état : (analytes, alphas) lors
+    de l'ajustement, (analytes, 1) lors d'une mise à jour.
+
+    :param alpha: coefficients de lissage, diffusés avec l'état
+    :param croston: vrai pour les analytes (ou colonnes) prévus par Croston, diffusé avec l'état
+    :param state: dictionnaire des tableaux de STATE_FIELDS, modifié sur place
+    :param live: masque (analytes × jours) des valeurs à traiter (par défaut toutes)
+    """
+    level, size, interval = state["level"], state["size"], state["interval"]
+    since, sse, errors = state["since_demand"], state["sse"], state["errors"]
+    demand_days, active_days = state["demand_days"], state["active_days"]
+    debias = 1 - alpha / 2  # Correction de Syntetos-Boylan
+    for day in range(matrix.shape[1]):
+        y = matrix[:, day, None]
+        demand = y > 0
+        started = active_days > 0
+        if live is not None:
+            mask = live[:, day, None]
+            demand = demand & mask
+            started = started & mask
+        first = demand & (active_days == 0)
+        if live is not None:
+            first = first & mask
+
+        # Erreur de prévision à un jour, puis mise à jour des états (analytes déjà actifs)
+        forecast = np.where(croston, debias * size / np.maximum(interval, 1), level)
+        error = np.where(started, y - forecast, 0.0)
+        sse += error * error
+        errors += started
+        level += np.where(started, alpha * (y - level), 0.0)
+        since += started
+        update = started & demand
+        size += np.where(update, alpha * (y - size), 0.0)
+        interval += np.where(update, alpha * (since - interval), 0.0)
+        since[...] = np.where(update, 0, since)
+
+        # Premier jour de consommation : initialisation des modèles
+        level[...] = np.where(first, y, level)
+        size[...] = np.where(first, y, size)
+        interval[...] = np.where(first, 1.0, interval)
+        since[...] = np.where(first, 0, since)
+
+        demand_days += demand
+        active_days += started | first
+    return state
+
+
+def fit(matrix, analyte_ids, last_day, alphas=ALPHAS):
+    """
+    Ajuste SES et Croston sur toute la grille d'alphas, puis retient pour chaque analyte
+    le modèle adapté à son intermittence et l'alpha de plus faible erreur quadratique.
+    """
+    count, grid = len(analyte_ids), len(alphas)
+    runs = {}
+    for croston in (False, True):
+        runs[croston] = smooth(matrix, alphas[None, :], croston, empty_state((count, grid)))
+
+    # Intervalle moyen entre consommations, identique pour toutes les colonnes
+    state = runs[False]
+    mean_interval = state["active_days"][:, 0] / np.maximum(state["demand_days"][:, 0], 1)
+    croston = (mean_interval > INTERMITTENT_INTERVAL) & (state["demand_days"][:, 0] > 1)
+
+    rows = np.arange(count)
+    chosen = {}
+    for name in STATE_FIELDS:
+        chosen[name] = np.where(croston[:, None], runs[True][name], runs[False][name])
+    mse = chosen["sse"] / np.maximum(chosen["errors"], 1)
+    best = np.argmin(mse, axis=1)
+    days = np.full(count, last_day, dtype=np.int64)
+    return ForecastParams(
+        analyte_ids, croston, alphas[best], {name: values[rows, best] for name, values in chosen.items()},
+        days, days
+    )
+
+
+def predict(params, horizon_days, level=0.95):
+    """
+    Prévisions ponctuelles et intervalles de tous les analytes en un seul calcul.
+    L'erreur à un jour est estimée par la racine de l'erreur quadratique moyenne ; pour le
+    total sur l'horizon, les erreurs de prévision à 1..h jours d'un lissage exponentiel
+    s'accumulent comme la somme des (1 + j·alpha)², j = 0..h-1.
+
+    :return: dictionnaire de tableaux 'daily', 'total', 'lower', 'upper', 'sigma'
+    """
+    state, alpha = params.state, params.alpha
+    debias = 1 - alpha / 2
+    daily = np.where(params.croston, debias * state["size"] / np.maximum(state["interval"], 1), state["level"])
+    daily = np.maximum(daily, 0.0)
+    sigma = np.sqrt(state["sse"] / np.maximum(state["errors"], 1))
+
+    h = horizon_days
+    spread = np.sqrt(h + alpha * h * (h - 1) + alpha ** 2 * (h - 1) * h * (2 * h - 1) / 6)
+    z = NormalDist().inv_cdf(0.5 + level / 2)
+    total = daily * h
+    return {
+        'daily': daily,
+        'total': total,
+        'lower': np.maximum(total - z * sigma * spread, 0.0),
+        'upper': total + z * sigma * spread,
+        'sigma': sigma
+    }
+
+
+class DemandForecaster:
+    """
+    Prévision de la consommation de tous les analytes, avec cache des paramètres dans ForecastParams.
+    """
+    def __init__(self, database: ReactifsDatabase, measure: str = "tests", history_days: int = 730,
+                 refit_days: int = 28, alphas=ALPHAS):
+        self.database = database
+        self.measure = measure
+        self.history_days = history_days
+        self.refit_days = refit_days
+        self.alphas = np.asarray(alphas, dtype=float)
+
+    def usage_matrix(self, first_day: int, last_day: int, analyte_ids=None):
+        """
+        Matrice (analytes × jours) de la consommation journalière entre deux jours inclus.
+        :return: (identifiants des analytes, matrice)
+        """
+        rows = self.database.get_daily_usage_series(first_day, last_day, self.measure, analyte_ids)
+        if analyte_ids is None:
+            analyte_ids = [row[1] for row in rows]
+        analyte_ids = np.unique(np.asarray(analyte_ids, dtype=np.int64))
+        matrix = np.zeros((len(analyte_ids), max(last_day - first_day + 1, 0)))
+        if rows:
+            days, ids, values = (np.array(column) for column in zip(*rows))
+            positions = np.searchsorted(analyte_ids, ids)
+            matrix[positions, days - first_day] = values
+        return analyte_ids, matrix
+
+    def fit(self, as_of: str = None, analyte_ids=None) -> ForecastParams:
+        """
+        Réajuste les modèles sur les `history_days` derniers jours et enregistre les paramètres.
+        """
+        last_day = epoch_day(as_of or datetime.now().strftime("%Y-%m-%d"))
+        ids, matrix = self.usage_matrix(last_day - self.history_days + 1, last_day, analyte_ids)
+        params = fit(matrix, ids, last_day, self.alphas)
+        self.database.save_forecast_params(self.measure, params.rows())
+        return params
+
+    def update(self, as_of: str = None) -> ForecastParams:
+        """
+        Fait avancer les paramètres enregistrés jusqu'à `as_of` (un pas de lissage par nouveau jour).
+        Les analytes sans paramètres, ou ajustés depuis plus de `refit_days` jours, sont réajustés.
+        """
+        last_day = epoch_day(as_of or datetime.now().strftime("%Y-%m-%d"))
+        cached = ForecastParams.from_rows(self.database.get_forecast_params(self.measure))
+        known_ids = list(self.analytes())
+
+        stale = (last_day - cached.fitted_day >= self.refit_days) | (cached.last_day > last_day)
+        refit_ids = sorted(set(known_ids) - set(cached.analyte_ids[~stale].tolist()))
+        params = cached.select(~stale & np.isin(cached.analyte_ids, known_ids))
+
+        if len(params) and params.last_day.min() < last_day:
+            first_day = int(params.last_day.min()) + 1
+            _ids, matrix = self.usage_matrix(first_day, last_day, params.analyte_ids.tolist())
+            live = np.arange(first_day, last_day + 1)[None, :] > params.last_day[:, None]
+            smooth(matrix, params.alpha[:, None], params.croston[:, None],
+                   {name: values[:, None] for name, values in params.state.items()}, live)
+            params.last_day[:] = last_day
+
+        if refit_ids:
+            params = params.merge(self.fit(as_of, refit_ids))
+        self.database.save_forecast_params(self.measure, params.rows())
+        return params
+
+    def analytes(self) -> dict:
+        """
+        Analytes de la base : {id: (nom, unité)}.
+        """
+        self.database.cursor.execute("SELECT id, name, unit FROM Analytes ORDER BY id")
+        return {row[0]: row[1:] for row in self.database.cursor.fetchall()}
+
+    def forecast(self, horizon_days: int = 30, as_of: str = None, level: float = 0.95) -> list:
+        """
+        Prévision de tous les analytes sur l'horizon (paramètres mis à jour au préalable).
+        :return: liste de dictionnaires, un par analyte, triés par nom
+        """
+        params = self.update(as_of)
+        result = predict(params, horizon_days, level)
+        analytes = self.analytes()
+        forecasts = []
+        for index, analyte_id in enumerate(params.analyte_ids.tolist()):
+            name, unit = analytes.get(analyte_id, (str(analyte_id), ""))
+            forecasts.append({
+                'analyte_id': analyte_id,
+                'nom_analyte': name,
+                'unite': unit,
+                'model': "croston" if params.croston[index] else "ses",
+                'alpha': float(params.alpha[index]),
+                'daily': float(result['daily'][index]),
+                'total': float(result['total'][index]),
+                'lower': float(result['lower'][index]),
+                'upper': float(result['upper'][index]),
+                'horizon_days': horizon_days
+            })
+        forecasts.sort(key=lambda entry: entry['nom_analyte'])
+        return forecasts
+
+
+def forecast_to_rows(forecasts: list) -> list:
+    """
+    Convertit des prévisions en lignes de texte alignées sur FORECAST_HEADERS.
+    """
+    return [
+        [
+            entry['nom_analyte'],
+            entry['unite'],
+            "Croston" if entry['model'] == "croston" else "SES",
+            f"{entry['alpha']:.2f}",
+            f"{entry['daily']:.2f}",
+            f"{entry['total']:.2f}",
+            f"{entry['lower']:.2f}",
+            f"{entry['upper']:.2f}"
+        ]
+        for entry in forecasts
+    ]
+
+
+def build_parser(parser: argparse.ArgumentParser = None) -> argparse.ArgumentParser:
+    # Sous-commande de cli.py : l'option --db générale n'est pas écrasée par celle-ci
+    database_default = "reactifs_database.db" if parser is None else argparse.SUPPRESS
+    parser = parser or argparse.ArgumentParser(description="Prévision de consommation de tous les analytes.")
+    parser.add_argument("--db", default=database_default, help="Fichier de la base de données")
+    parser.add_argument("--horizon", type=int, default=30, help="Jours à prévoir")
+    parser.add_argument("--mesure", choices=["tests", "volume"], default="tests", help="Grandeur prévue")
+    parser.add_argument("--niveau", type=float, default=0.95, help="Niveau de l'intervalle (0-1)")
+    parser.add_argument("--date", default=None, help="Date de référence (yyyy-MM-dd)")
+    parser.add_argument("--reajuster", action="store_true", help="Réajuster tous les modèles")
+    return parser
+
+
+def run(args) -> int:
+    database = ReactifsDatabase(args.db)
+    try:
+        forecaster = DemandForecaster(database, args.mesure)
+        if args.reajuster:
+            forecaster.fit(args.date)
+        forecasts = forecaster.forecast(args.horizon, args.date, args.niveau)
+        print("\t".join(FORECAST_HEADERS))
+        for row in forecast_to_rows(forecasts):
+            print("\t".join(row))
+        return 0
+    finally:
+        database.close()
+
+
+def main(argv=None) -> int:
+    return run(build_parser().parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,103 +1,396 @@
 # logic_calc.py
+from datetime import date
+
+import numpy as np
+
+from periods import CALENDAR, DAYS, period_unit
+
+# Dimensions physiques des unités
+DIM_VOLUME = 0
+DIM_MASS = 1
+DIM_COUNT = 2
 
 # Unités de volume
-VOLUME_UNITS = ['µl', 'ml', 'l']
 VOLUME_CONVERSIONS = {
+    'pl': 1e-9,   # 1 pL = 0.000000001 mL
     'µl': 0.001,  # 1 µL = 0.001 mL
     'ml': 1,      # 1 mL = 1 mL
     'l': 1000     # 1 L = 1000 mL
 }
+VOLUME_UNITS = list(VOLUME_CONVERSIONS)
 
 # Unités de masse
-MASS_UNITS = ['mg', 'g', 'kg']
 MASS_CONVERSIONS = {
     'mg': 0.001,  # 1 mg = 0.001 g
     'g': 1,       # 1 g = 1 g
     'kg': 1000    # 1 kg = 1000 g
 }
+MASS_UNITS = list(MASS_CONVERSIONS)
 
 # Unités de comptage
 COUNT_UNITS = ['boîte', 'kit', 'sachet', 'flacon', 'tube', 'coffret', 'test']
 
-class ConsumptionCalculator:
+# Orthographes alternatives acceptées pour certaines unités
+UNIT_ALIASES = {
+    'µl': ['ul', 'μl'],  # micro (U+00B5), "u" et mu grec (U+03BC)
+    'boîte': ['boite'],
+}
+
+
+class UnitRegistry:
+    """
+    Registre des unités : chaque unité est internée en un identifiant entier
+    associé à sa dimension (volume, masse, comptage).
+    Les facteurs de conversion entre toutes les paires d'unités sont
+    précalculés dans une matrice indexée par identifiant, ce qui ramène
+    chaque conversion à deux recherches de dictionnaire et une multiplication.
+    """
     def __init__(self):
-        self.time_factors = {
-            'jours': 1,
-            'semaine': 7,
-            'mois': 30
-        }
+        self._ids = {}          # orthographe -> identifiant
+        self.names = []         # identifiant -> nom canonique
+        self.dimensions = []    # identifiant -> dimension
+        self.base_factors = []  # identifiant -> facteur vers l'unité de base (ml, g, 1)
+        self.factors = []
+        self.density_exponents = []
+        self.factor_matrix = np.ones((0, 0))
+        self.exponent_matrix = np.zeros((0, 0), dtype=np.int8)
 
-    def is_unit_valid(self, unit):
-        """Vérifie si une unité est valide."""
-        unit = unit.lower()
-        return (unit in VOLUME_UNITS or
-                unit in MASS_UNITS or
-                unit in COUNT_UNITS)
+    def register(self, name, dimension, base_factor=1.0, aliases=()):
+        """Ajoute une unité au registre et retourne son identifiant."""
+        unit_id = len(self.names)
+        self.names.append(name)
+        self.dimensions.append(dimension)
+        self.base_factors.append(float(base_factor))
+        for spelling in (name, *aliases):
+            self._ids[spelling] = unit_id
+            self._ids[spelling.lower()] = unit_id
+        self._build_tables()
+        return unit_id
 
-    def are_units_compatible(self, from_unit, to_unit):
-        """Vérifie si les unités sont compatibles pour la conversion."""
-        from_unit, to_unit = from_unit.lower(), to_unit.lower()
+    def _build_tables(self):
+        """
+        Précalcule la matrice des facteurs de conversion.
+        factors[i][j] vaut None si les unités ne sont pas convertibles directement.
+        density_exponents[i][j] vaut 1 (volume → masse, multiplier par la densité),
+        -1 (masse → volume, diviser par la densité) ou 0 (pas de densité requise).
+        """
+        size = len(self.names)
+        self.factors = [[None] * size for _ in range(size)]
+        self.density_exponents = [[0] * size for _ in range(size)]
+        for i in range(size):
+            for j in range(size):
+                dim_i, dim_j = self.dimensions[i], self.dimensions[j]
+                if i == j:
+                    self.factors[i][j] = 1.0
+                elif dim_i == dim_j and dim_i != DIM_COUNT:
+                    self.factors[i][j] = self.base_factors[i] / self.base_factors[j]
+                elif {dim_i, dim_j} == {DIM_VOLUME, DIM_MASS}:
+                    # ml × densité (g/ml) → g, puis vers l'unité cible
+                    self.factors[i][j] = self.base_factors[i] / self.base_factors[j]
+                    self.density_exponents[i][j] = 1 if dim_i == DIM_VOLUME else -1
 
-        if not self.is_unit_valid(from_unit) or not self.is_unit_valid(to_unit):
-            return False
+        # Mêmes tables au format NumPy pour les conversions vectorisées (NaN = impossible)
+        self.factor_matrix = np.array(
+            [[np.nan if f is None else f for f in row] for row in self.factors], dtype=float
+        ).reshape(size, size)
+        self.exponent_matrix = np.array(self.density_exponents, dtype=np.int8).reshape(size, size)
 
-        # Compatibilité au sein du même type
-        if (from_unit in VOLUME_UNITS and to_unit in VOLUME_UNITS) or \
-           (from_unit in MASS_UNITS and to_unit in MASS_UNITS) or \
-           (from_unit in COUNT_UNITS and to_unit in COUNT_UNITS):
-            return True
+    def unit_id(self, unit):
+        """Retourne l'identifiant entier d'une unité, ou None si elle est inconnue."""
+        unit_id = self._ids.get(unit)
+        if unit_id is None and isinstance(unit, str):
+            unit_id = self._ids.get(unit.strip().lower())
+        return unit_id
 
-        # Conversion volume ↔ masse nécessite une densité
-        return False
+    def dimension(self, unit):
+        """Retourne la dimension d'une unité, ou None si elle est inconnue."""
+        unit_id = self.unit_id(unit)
+        return None if unit_id is None else self.dimensions[unit_id]
 
-    def convert_value(self, value, from_unit, to_unit, density=None):
-        """Convertit une valeur entre deux unités compatibles."""
-        from_unit, to_unit = from_unit.lower(), to_unit.lower()
+    def is_physical(self, unit):
+        """Vrai pour les unités de volume ou de masse."""
+        return self.dimension(unit) in (DIM_VOLUME, DIM_MASS)
 
-        if not self.is_unit_valid(from_unit):
+    def factor(self, from_unit, to_unit, density=None):
+        """
+        Retourne le facteur multiplicatif de conversion entre deux unités.
+        Lève ValueError si la conversion est impossible.
+        """
+        from_id = self.unit_id(from_unit)
+        to_id = self.unit_id(to_unit)
+        if from_id is None:
             raise ValueError(f"Unité source invalide : {from_unit}")
-        if not self.is_unit_valid(to_unit):
+        if to_id is None:
             raise ValueError(f"Unité cible invalide : {to_unit}")
 
-        if not self.are_units_compatible(from_unit, to_unit):
+        factor = self.factors[from_id][to_id]
+        if factor is None:
+            raise ValueError(f"Conversion impossible entre {from_unit} et {to_unit}")
+
+        exponent = self.density_exponents[from_id][to_id]
+        if exponent:
             if density is None:
                 raise ValueError(f"Conversion impossible entre {from_unit} et {to_unit} sans densité")
-            elif not (from_unit in VOLUME_UNITS and to_unit in MASS_UNITS) and \
-                 not (from_unit in MASS_UNITS and to_unit in VOLUME_UNITS):
-                raise ValueError(f"Conversion impossible entre {from_unit} et {to_unit}")
-
-        # Conversion entre volumes
-        if from_unit in VOLUME_UNITS and to_unit in VOLUME_UNITS:
-            value_in_ml = value * VOLUME_CONVERSIONS[from_unit]
-            return value_in_ml / VOLUME_CONVERSIONS[to_unit]
-
-        # Conversion entre masses
-        if from_unit in MASS_UNITS and to_unit in MASS_UNITS:
-            value_in_g = value * MASS_CONVERSIONS[from_unit]
-            return value_in_g / MASS_CONVERSIONS[to_unit]
-
-        # Conversion volume ↔ masse (nécessite une densité)
-        if from_unit in VOLUME_UNITS and to_unit in MASS_UNITS:
-            if density is None:
-                raise ValueError("Une densité est requise pour convertir un volume en masse")
-            value_in_g = value * VOLUME_CONVERSIONS[from_unit] * density  # ml → g
-            return value_in_g / MASS_CONVERSIONS[to_unit]
+            if density <= 0:
+                raise ValueError("La densité doit être strictement positive")
+            factor = factor * density if exponent > 0 else factor / density
+        return factor
 
-        if from_unit in MASS_UNITS and to_unit in VOLUME_UNITS:
-            if density is None:
-                raise ValueError("Une densité est requise pour convertir une masse en volume")
-            value_in_ml = value * MASS_CONVERSIONS[from_unit] / density  # g → ml
-            return value_in_ml / VOLUME_CONVERSIONS[to_unit]
+    def convert(self, value, from_unit, to_unit, density=None):
+        """Convertit une valeur entre deux unités du registre."""
+        return value * self.factor(from_unit, to_unit, density)
 
-        raise ValueError(f"Conversion impossible entre {from_unit} et {to_unit}")
 
-    def calculate_control_usage(self, qty_per_control, frequency, period, time_value, time_unit, qty_unit, display_unit):
-        """Calcule la quantité totale utilisée par le contrôle."""
-        try:
-            total_days = time_value * self.time_factors.get(time_unit.lower(), 1)
-            period_days = self.time_factors.get(period.lower(), 1)
+def convert_many(values, from_units, to_unit, densities=None, registry=None):
+    """
+    Convertit un tableau de quantités vers une unité cible en une seule passe.
+
+    :param values: valeurs à convertir (séquence ou tableau NumPy)
+    :param from_units: unité source commune (str) ou une unité par valeur
+    :param to_unit: unité cible
+    :param densities: densité (g/ml) scalaire ou par valeur, requise pour volume ↔ masse
+    :return: tuple (valeurs converties, masque d'erreurs). Les éléments en erreur
+             (unité inconnue, dimensions incompatibles, densité manquante) valent NaN
+             et sont marqués True dans le masque, sans lever d'exception.
+    """
+    registry = registry or UNIT_REGISTRY
+    values = np.asarray(values, dtype=float)
+    result = np.full(values.shape, np.nan)
+    to_id = registry.unit_id(to_unit)
+    if to_id is None:
+        return result, np.ones(values.shape, dtype=bool)
+
+    # Regrouper par unité source : chaque orthographe distincte n'est résolue qu'une fois
+    if isinstance(from_units, str):
+        group_names = [from_units]
+        inverse = np.zeros(values.shape, dtype=np.intp)
+    else:
+        # Cellules vides (None) et valeurs non textuelles ramenées à des chaînes, comparables entre elles
+        names = ["" if unit is None else str(unit).strip() for unit in np.asarray(from_units, dtype=object).ravel()]
+        group_names, inverse = np.unique(np.asarray(names, dtype=object), return_inverse=True)
+        inverse = inverse.reshape(values.shape)
+
+    group_factors = np.full(len(group_names), np.nan)
+    group_exponents = np.zeros(len(group_names), dtype=np.int8)
+    for index, name in enumerate(group_names):
+        from_id = registry.unit_id(name)
+        if from_id is not None:
+            group_factors[index] = registry.factor_matrix[from_id, to_id]
+            group_exponents[index] = registry.exponent_matrix[from_id, to_id]
+
+    factors = group_factors[inverse]
+    exponents = group_exponents[inverse]
+    if group_exponents.any():
+        if densities is None:
+            factors = np.where(exponents != 0, np.nan, factors)
+        else:
+            densities = np.broadcast_to(np.asarray(densities, dtype=float), values.shape)
+            densities = np.where(densities > 0, densities, np.nan)
+            factors = np.where(exponents > 0, factors * densities,
+                               np.where(exponents < 0, factors / densities, factors))
+
+    np.multiply(values, factors, out=result)
+    errors = np.isnan(result)
+    return result, errors
+
+
+def qac_chain(consommation, calibration, pertes, confirmation, stock_actuel,
+              conditionnement, livraison, period):
+    """
+    Chaîne de calcul CMA → CMJ → ROP → QAC.
+    Accepte des scalaires ou des tableaux NumPy (diffusés ensemble), de sorte
+    qu'un même appel calcule un formulaire ou tout un catalogue d'analytes.
+
+    :return: dictionnaire de tableaux 'cma', 'cmj', 'stock_securite', 'rop', 'qac'
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cma = np.add(np.add(consommation, calibration), np.add(pertes, confirmation))
+        cmj = np.divide(cma, period)
+        stock_securite = cmj * livraison
+        rop = cma + stock_securite - stock_actuel
+        qac = np.maximum(0, np.ceil(np.divide(rop, conditionnement)))
+    return {
+        'cma': cma,
+        'cmj': cmj,
+        'stock_securite': stock_securite,
+        'rop': rop,
+        'qac': qac
+    }
+
+
+def normalize_fields(fields, calculator):
+    """
+    Convertit les champs du formulaire dans l'unité du conditionnement
+    (le conditionnement et le délai de livraison sont laissés tels quels).
+    """
+    target_unit = fields['conditionnement']['unit']
+    converted_values = {}
+    for key, data in fields.items():
+        if key in ["conditionnement", "livraison"]:
+            continue  # Déjà dans l'unité cible
+
+        value = data['value']
+        unit = data['unit']
+
+        if unit != target_unit:
+            if calculator.are_units_compatible(unit, target_unit):
+                converted_values[key] = calculator.convert_value(value, unit, target_unit)
+            else:
+                raise ValueError(f"Conversion impossible entre {unit} et {target_unit} pour le champ {key}")
+        else:
+            converted_values[key] = value
+    return converted_values
+
+
+# Entrées du formulaire de GestionReactifs que qac_sweep peut faire varier (clé -> libellé)
+SWEEP_PARAMETERS = {
+    'nbr_tests': "Nbr Tests",
+    'pertes_pct': "Pertes (%)",
+    'confirmation_pct': "Confirmation (%)",
+    'livraison': "D.Livraison"
+}
+SWEEP_OUTPUTS = {
+    'qac': "Q.A.C",
+    'rop': "ROP",
+    'cma': "CMA",
+    'cmj': "CMJ"
+}
+MAX_SWEEP_SCENARIOS = 2_000_000
+
+
+def sweep_values(start, stop, step):
+    """
+    Valeurs d'un axe du balayage, de `start` à `stop` inclus (un seul point si le pas est nul).
+    """
+    if step <= 0 or stop <= start:
+        return np.array([float(start)])
+    return np.arange(start, stop + step / 2, step, dtype=float)
+
+
+def qac_sweep(base, ranges):
+    """
+    Évalue la chaîne CMA → CMJ → ROP → QAC sur toute la grille cartésienne des paramètres
+    de `ranges` en un seul appel de qac_chain (grilles creuses diffusées par NumPy).
+
+    :param base: valeurs du formulaire, dans l'unité du conditionnement : 'nbr_tests', 'qte_par_test',
+                 'calibration', 'qte_pertes', 'pertes_pct', 'qte_confirmation', 'confirmation_pct',
+                 'stock_actuel', 'conditionnement', 'livraison', 'period'
+    :param ranges: {clé de SWEEP_PARAMETERS: valeurs}, un axe de la grille par paramètre, dans l'ordre
+    :return: dictionnaire 'axes' [(clé, valeurs)] et tableaux 'cma', 'cmj', 'stock_securite', 'rop',
+             'qac' de forme (nombre de valeurs de chaque axe)
+    """
+    unknown = set(ranges) - set(SWEEP_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Paramètre de balayage inconnu : {', '.join(sorted(unknown))}")
+    axes = [(key, np.atleast_1d(np.asarray(values, dtype=float))) for key, values in ranges.items()]
+    shape = tuple(len(values) for _, values in axes)
+    if np.prod(shape, dtype=float) > MAX_SWEEP_SCENARIOS:
+        raise ValueError(f"Trop de scénarios ({int(np.prod(shape, dtype=float))}), maximum {MAX_SWEEP_SCENARIOS}")
+
+    values = dict(base)
+    values.update(zip(ranges, np.meshgrid(*(axis for _, axis in axes), indexing='ij', sparse=True)))
+    nbr_tests = values['nbr_tests']
+    chain = qac_chain(
+        nbr_tests * values['qte_par_test'],
+        values['calibration'],
+        values['qte_pertes'] * values['pertes_pct'] / 100,
+        nbr_tests * values['confirmation_pct'] / 100 * values['qte_confirmation'],
+        values['stock_actuel'],
+        values['conditionnement'],
+        values['livraison'],
+        values['period']
+    )
+    result = {key: np.broadcast_to(array, shape) for key, array in chain.items()}
+    result['axes'] = axes
+    return result
+
+
+def sweep_sensitivity(base, ranges, output='qac'):
+    """
+    Effet de chaque paramètre seul (les autres à leur valeur du formulaire) sur une sortie.
+    :return: liste de (clé, première valeur, dernière valeur, sortie minimale, sortie maximale)
+    """
+    sensitivity = []
+    for key, values in ranges.items():
+        values = np.atleast_1d(np.asarray(values, dtype=float))
+        outputs = qac_sweep(base, {key: values})[output]
+        sensitivity.append((key, float(values[0]), float(values[-1]), float(outputs.min()), float(outputs.max())))
+    return sensitivity
 
-            total_controls = (total_days // period_days) * frequency
+
+def sweep_heatmap(result, output='qac', rows=0, cols=1):
+    """
+    Réduit le résultat de qac_sweep à un tableau (axe `rows` × axe `cols`) : les autres axes
+    sont ramenés à leur maximum (pire cas). Avec un seul axe, le tableau a une colonne.
+    """
+    array = result[output]
+    if array.ndim == 1:
+        return array[:, None]
+    others = tuple(axis for axis in range(array.ndim) if axis not in (rows, cols))
+    if others:
+        array = array.max(axis=others)
+    return array if rows < cols else array.T
+
+
+def _build_default_registry():
+    registry = UnitRegistry()
+    for name, base_factor in VOLUME_CONVERSIONS.items():
+        registry.register(name, DIM_VOLUME, base_factor, UNIT_ALIASES.get(name, ()))
+    for name, base_factor in MASS_CONVERSIONS.items():
+        registry.register(name, DIM_MASS, base_factor, UNIT_ALIASES.get(name, ()))
+    for name in COUNT_UNITS:
+        registry.register(name, DIM_COUNT, 1.0, UNIT_ALIASES.get(name, ()))
+    return registry
+
+
+UNIT_REGISTRY = _build_default_registry()
+
+
+class ConsumptionCalculator:
+    def __init__(self):
+        self.units = UNIT_REGISTRY
+        self.periods = CALENDAR
+
+    def is_unit_valid(self, unit):
+        """Vérifie si une unité est valide."""
+        return self.units.unit_id(unit) is not None
+
+    def are_units_compatible(self, from_unit, to_unit):
+        """Vérifie si les unités sont compatibles pour la conversion."""
+        from_dim = self.units.dimension(from_unit)
+        to_dim = self.units.dimension(to_unit)
+
+        # Compatibilité au sein du même type
+        # (la conversion volume ↔ masse nécessite une densité)
+        return from_dim is not None and from_dim == to_dim
+
+    def convert_value(self, value, from_unit, to_unit, density=None):
+        """Convertit une valeur entre deux unités compatibles."""
+        return value * self.units.factor(from_unit, to_unit, density)
+
+    def convert_many(self, values, from_units, to_unit, densities=None):
+        """Convertit un tableau de valeurs (voir convert_many du module)."""
+        return convert_many(values, from_units, to_unit, densities, self.units)
+
+    def control_counts(self, frequency, period, time_value, time_unit, start=None, working_days=False):
+        """
+        Nombre de contrôles sur la période de `time_value` `time_unit` commençant à `start` :
+        `frequency` par période `period` entière (par jour ouvré si `working_days`).
+        `frequency` peut être un tableau (une valeur par règle).
+        """
+        start = start or date.today().isoformat()
+        end, _days, busdays = self.periods.span(start, time_value, time_unit)
+        if working_days and period_unit(period) == DAYS:
+            periods = busdays
+        else:
+            periods = np.floor(self.periods.unit_counts([start], [end], period)[0])
+        return np.asarray(frequency) * periods
+
+    def calculate_control_usage(self, qty_per_control, frequency, period, time_value, time_unit, qty_unit, display_unit,
+                                start=None, working_days=False):
+        """Calcule la quantité totale utilisée par le contrôle (périodes entières à partir de `start`)."""
+        try:
+            total_controls = float(self.control_counts(frequency, period, time_value, time_unit, start, working_days))
             total_qty = total_controls * qty_per_control
 
             if qty_unit != display_unit:
@@ -0,0 +1,142 @@
+# pack_optimizer.py
+"""
+Choix de la composition d'une commande parmi plusieurs conditionnements (sans interface graphique).
+
+Un réactif existe souvent en plusieurs tailles (coffrets, flacons), chacune avec un volume
+mort et une stabilité limitée après ouverture. À la consommation journalière prévue, un
+conditionnement ouvert ne peut servir que :
+    utilisable = min(quantité - volume mort, consommation/jour × stabilité)
+le reste est perdu (volume mort ou péremption).
+
+Pour chaque analyte, la composition retenue couvre la quantité à commander avec le moins
+de quantité achetée (donc le moins de pertes et d'excédent), puis le moins de
+conditionnements. La recherche est une programmation dynamique (sac à dos non borné de
+couverture) sur une grille entière : quantités au centième, divisées par leur PGCD, ce qui
+réduit la grille à quelques centaines de cases pour des tailles usuelles. Les résultats sont
+mémorisés par (quantité, consommation, conditionnements).
+
+Sans conditionnement enregistré (table PackOptions), les tailles les plus fréquentes de
+l'historique des lots sont utilisées, avec pour stabilité la plus longue durée d'utilisation observée.
+"""
+import math
+from functools import lru_cache
+
+from database import ReactifsDatabase
+from logic_calc import UNIT_REGISTRY, DIM_COUNT
+
+# Nombre de tailles de l'historique proposées quand aucun conditionnement n'est enregistré
+OBSERVED_PACK_SIZES = 3
+
+# Précision de la recherche : 1/100 d'unité
+RESOLUTION = 100
+
+
+def usable_quantity(quantity, dead_volume, stability_days, daily_rate):
+    """
+    Quantité réellement consommable d'un conditionnement ouvert (volume mort et stabilité déduits).
+    """
+    usable = quantity - dead_volume
+    if stability_days and daily_rate > 0:
+        usable = min(usable, daily_rate * stability_days)
+    return max(usable, 0.0)
+
+
+@lru_cache(maxsize=8192)
+def _optimize(demand, daily_rate, packs):
+    quantities = [pack[1] for pack in packs]
+    usable = [usable_quantity(pack[1], pack[2], pack[3], daily_rate) for pack in packs]
+    counts = [0] * len(packs)
+
+    # Grille entière : quantités utilisables au 1/RESOLUTION près (arrondies par défaut), divisées par leur PGCD
+    steps = [math.floor(value * RESOLUTION + 1e-9) for value in usable]
+    candidates = [i for i, step in enumerate(steps) if step > 0]
+    if demand <= 0 or not candidates:
+        return tuple(counts), 0.0, 0.0
+    divisor = math.gcd(*(steps[i] for i in candidates))
+    steps = [step // divisor for step in steps]
+    cells = math.ceil(demand * RESOLUTION / divisor - 1e-9)
+
+    # best[c] : (quantité achetée, nombre de conditionnements) minimale pour couvrir c cases
+    best = [(0.0, 0)] + [(math.inf, 0)] * cells
+    last = [-1] * (cells + 1)
+    for cell in range(1, cells + 1):
+        for i in candidates:
+            purchased, count = best[max(cell - steps[i], 0)]
+            value = (purchased + quantities[i], count + 1)
+            if value < best[cell]:
+                best[cell], last[cell] = value, i
+
+    cell = cells
+    while cell > 0:
+        counts[last[cell]] += 1
+        cell = max(cell - steps[last[cell]], 0)
+    return tuple(counts), best[cells][0], sum(count * value for count, value in zip(counts, usable))
+
+
+def optimize_packs(demand: float, daily_rate: float, packs) -> dict:
+    """
+    Composition optimale pour couvrir `demand` à la consommation `daily_rate` (par jour).
+    :param packs: séquence de (libellé, quantité, volume mort, stabilité en jours ou None)
+    :return: dictionnaire 'mix' [(libellé, nombre)], 'purchased' (quantité achetée),
+             'waste' (volume mort et péremption), 'surplus' (utilisable au-delà du besoin)
+    """
+    packs = tuple(tuple(pack) for pack in packs)
+    demand = round(max(float(demand), 0.0), 2)
+    counts, purchased, usable = _optimize(demand, round(float(daily_rate), 3), packs)
+    return {
+        'mix': [(pack[0], count) for pack, count in zip(packs, counts) if count],
+        'purchased': purchased,
+        'waste': purchased - usable,
+        'surplus': max(usable - demand, 0.0) if purchased else 0.0
+    }
+
+
+def mix_label(mix) -> str:
+    return " + ".join(f"{count} × {label}" for label, count in mix)
+
+
+class PackOptimizer:
+    """
+    Composition des commandes de tout le catalogue à partir d'un plan (voir planning.py).
+    """
+    def __init__(self, database: ReactifsDatabase):
+        self.database = database
+
+    def pack_sets(self, units: dict) -> dict:
+        """
+        Conditionnements de chaque analyte : ceux de PackOptions, sinon les tailles les plus
+        fréquentes de l'historique (en tests pour les analytes comptés en tests, en volume sinon).
+        :param units: {analyte_id: unité}
+        :return: {analyte_id: tuple de (libellé, quantité, volume mort, stabilité)}
+        """
+        packs = {}
+        for analyte_id, label, quantity, dead_volume, stability_days in self.database.get_pack_options():
+            packs.setdefault(analyte_id, []).append((label, quantity, dead_volume, stability_days))
+
+        observed = {}
+        for analyte_id, measure, quantity, lots, days in self.database.get_observed_pack_sizes():
+            if analyte_id in packs or analyte_id not in units:
+                continue
+            counted = UNIT_REGISTRY.dimension(units[analyte_id]) == DIM_COUNT
+            if (measure == "tests") == counted:
+                observed.setdefault(analyte_id, []).append((lots, quantity, days))
+        for analyte_id, sizes in observed.items():
+            unit = units[analyte_id]
+            sizes = sorted(sizes, reverse=True)[:OBSERVED_PACK_SIZES]
+            packs[analyte_id] = [(f"{quantity:g} {unit}", quantity, 0.0, days) for _, quantity, days in sizes]
+        return {analyte_id: tuple(sorted(options, key=lambda pack: pack[1])) for analyte_id, options in packs.items()}
+
+    def optimize_plan(self, plan: list) -> list:
+        """
+        Ajoute à chaque entrée du plan la composition de sa commande ('pack_mix', 'pack_purchased',
+        'pack_waste') ; l'entrée garde sa QAC si l'analyte n'a aucun conditionnement connu.
+        """
+        pack_sets = self.pack_sets({entry['analyte_id']: entry['unite'] for entry in plan})
+        for entry in plan:
+            packs = pack_sets.get(entry['analyte_id'])
+            if not packs:
+                entry.update(pack_mix=[], pack_purchased=0.0, pack_waste=0.0)
+                continue
+            result = optimize_packs(entry['quantity_needed'], entry['daily_consumption'], packs)
+            entry.update(pack_mix=result['mix'], pack_purchased=result['purchased'], pack_waste=result['waste'])
+        return plan
@@ -0,0 +1,215 @@
+# periods.py
+"""
+Moteur de périodes du calendrier (sans interface graphique).
+
+Une période est donnée par un nombre et une unité (« 2 Mois », « 6 semaines »,
+« 20 jours ouvrés ») à partir d'une date de début. Au lieu d'un facteur fixe
+(1 mois = 30 jours), la fin de la période est calculée sur le calendrier réel :
+un mois va du 31 janvier au 28 (ou 29) février, et N jours ouvrés sautent les
+week-ends et les jours de fermeture du laboratoire.
+
+Toutes les fonctions acceptent des tableaux de dates de début (numpy.datetime64,
+chaînes 'yyyy-MM-dd' ou numéros de jour depuis le 1970-01-01) et sont calculées
+en une passe avec numpy.busday_count / numpy.busday_offset. Les variantes scalaires
+(PeriodEngine.days, PeriodEngine.events...) sont mémorisées par (début, période).
+
+Réglages (variables d'environnement) :
+    CMA_CLOSING_DAYS   jours de fermeture du laboratoire, 'yyyy-MM-dd' séparés par des virgules
+"""
+import os
+import re
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+
+PERIOD_CACHE_SIZE = 4096
+
+# Semaine de travail du laboratoire (lundi → dimanche)
+WORKING_WEEK = "1111100"
+
+DAYS, WEEKS, MONTHS = "jours", "semaine", "mois"
+
+# Orthographes acceptées -> unité de période
+PERIOD_UNITS = {
+    "j": DAYS, "jour": DAYS, "jours": DAYS,
+    "sem": WEEKS, "semaine": WEEKS, "semaines": WEEKS,
+    "mois": MONTHS
+}
+
+_PERIOD_PATTERN = re.compile(r"^\s*(\d+)\s*([^\W\d_]+)\.?(?:\s+(ouvrés?|ouvrables?))?\s*$", re.IGNORECASE)
+
+
+def period_unit(unit: str) -> str:
+    """
+    Unité de période ('jours', 'semaine' ou 'mois') d'une orthographe de l'interface ('Jours', 'Semaine'...).
+    """
+    key = str(unit).strip().lower()
+    if key not in PERIOD_UNITS:
+        raise ValueError(f"Unité de période inconnue : {unit}")
+    return PERIOD_UNITS[key]
+
+
+def parse_period(text: str) -> tuple:
+    """
+    Décompose une période saisie en texte : '2 mois' -> (2, 'mois', False),
+    '20 jours ouvrés' -> (20, 'jours', True).
+    """
+    match = _PERIOD_PATTERN.match(text or "")
+    if not match:
+        raise ValueError(f"Période invalide : '{text}' (format attendu : '2 mois', '20 jours ouvrés')")
+    return int(match.group(1)), period_unit(match.group(2)), match.group(3) is not None
+
+
+def as_dates(values) -> np.ndarray:
+    """
+    Tableau numpy.datetime64[D] de dates ou de numéros de jour.
+    """
+    return np.asarray(values).astype("datetime64[D]")
+
+
+def add_months(starts, months) -> np.ndarray:
+    """
+    Décale des dates d'un nombre de mois ; le jour est ramené au dernier jour du mois
+    quand il n'existe pas (31 janvier + 1 mois = 28 ou 29 février).
+    """
+    starts = as_dates(starts)
+    month_starts = starts.astype("datetime64[M]")
+    day_offset = starts - month_starts.astype("datetime64[D]")
+    target = month_starts + np.asarray(months, dtype=np.int64)
+    month_length = (target + 1).astype("datetime64[D]") - target.astype("datetime64[D]")
+    return target.astype("datetime64[D]") + np.minimum(day_offset, month_length - 1)
+
+
+def shift(starts, value, unit) -> np.ndarray:
+    """
+    Dates décalées de `value` unités calendaires (valeur négative pour remonter le temps).
+    """
+    unit = period_unit(unit)
+    starts = as_dates(starts)
+    if unit == MONTHS:
+        return add_months(starts, value)
+    return starts + np.asarray(value, dtype=np.int64) * (7 if unit == WEEKS else 1)
+
+
+def month_fraction(starts, ends) -> np.ndarray:
+    """
+    Nombre de mois (fractionnaire) entre deux dates : mois entiers à partir du début,
+    puis jours restants rapportés à la longueur du mois suivant.
+    """
+    starts, ends = np.broadcast_arrays(as_dates(starts), as_dates(ends))
+    whole = (ends.astype("datetime64[M]") - starts.astype("datetime64[M]")).astype(np.int64)
+    whole = np.where(add_months(starts, whole) > ends, whole - 1, whole)
+    anchor = add_months(starts, whole)
+    following = add_months(starts, whole + 1)
+    return whole + (ends - anchor).astype(np.int64) / (following - anchor).astype(np.int64)
+
+
+def closing_days_from_env() -> tuple:
+    """
+    Jours de fermeture du laboratoire réglés par CMA_CLOSING_DAYS.
+    """
+    text = os.environ.get("CMA_CLOSING_DAYS", "")
+    return tuple(day.strip() for day in text.split(",") if day.strip())
+
+
+class PeriodEngine:
+    """
+    Conversion des périodes en nombres exacts de jours et d'événements (calibrations, contrôles)
+    pour une semaine de travail et des jours de fermeture donnés.
+    """
+    def __init__(self, closing_days=(), weekmask: str = WORKING_WEEK):
+        self.closing_days = tuple(sorted(str(day) for day in as_dates(list(closing_days))))
+        self.weekmask = weekmask
+        self.calendar = np.busdaycalendar(weekmask=weekmask, holidays=list(self.closing_days))
+
+    def period_ends(self, starts, value, unit, working_days: bool = False) -> np.ndarray:
+        """
+        Fin (exclue) des périodes commençant à `starts`. En jours ouvrés, la période
+        compte `value` jours travaillés à partir du premier jour ouvré.
+        """
+        starts = as_dates(starts)
+        if working_days and period_unit(unit) == DAYS:
+            return np.busday_offset(starts, value, roll="forward", busdaycal=self.calendar)
+        return shift(starts, value, unit)
+
+    def day_counts(self, starts, value, unit, working_days: bool = False) -> np.ndarray:
+        """
+        Nombre de jours calendaires couverts par chaque période.
+        """
+        starts = as_dates(starts)
+        return (self.period_ends(starts, value, unit, working_days) - starts).astype(np.int64)
+
+    def working_day_counts(self, starts, value, unit, working_days: bool = False) -> np.ndarray:
+        """
+        Nombre de jours ouvrés (hors week-ends et fermetures) de chaque période.
+        """
+        starts = as_dates(starts)
+        return np.busday_count(starts, self.period_ends(starts, value, unit, working_days), busdaycal=self.calendar)
+
+    def unit_counts(self, starts, ends, unit) -> np.ndarray:
+        """
+        Nombre (fractionnaire) d'unités `unit` entre deux dates.
+        """
+        unit = period_unit(unit)
+        if unit == MONTHS:
+            return month_fraction(starts, ends)
+        days = (as_dates(ends) - as_dates(starts)).astype(np.int64)
+        return days / 7 if unit == WEEKS else days.astype(float)
+
+    def event_counts(self, starts, value, unit, frequency, per, working_days: bool = False) -> np.ndarray:
+        """
+        Nombre d'événements sur chaque période : tous les `frequency` jours si `per` est 'Jours'
+        (jours ouvrés avec `working_days`), sinon `frequency` fois par semaine ou par mois.
+        """
+        starts = as_dates(starts)
+        frequency = np.asarray(frequency)
+        if period_unit(per) == DAYS:
+            days = (self.working_day_counts(starts, value, unit, working_days) if working_days
+                    else self.day_counts(starts, value, unit))
+            return np.where(frequency > 0, days // np.maximum(frequency, 1), 0)
+        ends = self.period_ends(starts, value, unit, working_days)
+        return self.unit_counts(starts, ends, per) * frequency
+
+    @lru_cache(maxsize=PERIOD_CACHE_SIZE)
+    def _span(self, start, value, unit, working_days):
+        starts = as_dates([start])
+        end = self.period_ends(starts, value, unit, working_days)
+        return str(end[0]), int((end - starts)[0].astype(np.int64)), \
+            int(np.busday_count(starts, end, busdaycal=self.calendar)[0])
+
+    def span(self, start, value, unit, working_days: bool = False) -> tuple:
+        """
+        Période commençant à `start` (aujourd'hui par défaut) : (fin exclue 'yyyy-MM-dd',
+        jours calendaires, jours ouvrés).
+        """
+        return self._span(str(as_dates([start or date.today().isoformat()])[0]), int(value), period_unit(unit),
+                          bool(working_days))
+
+    def days(self, start, value, unit, working_days: bool = False) -> int:
+        """
+        Nombre de jours calendaires de la période commençant à `start`.
+        """
+        return self.span(start, value, unit, working_days)[1]
+
+    def days_before(self, end, value, unit) -> int:
+        """
+        Nombre de jours calendaires de la période de `value` unités qui se termine à `end` (exclu).
+        """
+        end = as_dates([end or date.today().isoformat()])
+        return int((end - shift(end, -int(value), unit))[0].astype(np.int64))
+
+    @lru_cache(maxsize=PERIOD_CACHE_SIZE)
+    def _events(self, start, value, unit, frequency, per, working_days):
+        return float(self.event_counts([start], value, unit, frequency, per, working_days)[0])
+
+    def events(self, start, value, unit, frequency, per, working_days: bool = False) -> float:
+        """
+        Nombre d'événements (voir event_counts) de la période commençant à `start` (aujourd'hui par défaut).
+        """
+        return self._events(str(as_dates([start or date.today().isoformat()])[0]), int(value), period_unit(unit),
+                            frequency, period_unit(per), bool(working_days))
+
+
+# Moteur partagé : semaine de travail du lundi au vendredi, fermetures de CMA_CLOSING_DAYS
+CALENDAR = PeriodEngine(closing_days_from_env())
@@ -0,0 +1,223 @@
+# planning.py
+"""
+Moteur de planification des commandes (sans interface graphique).
+
+Calcule en une seule passe vectorisée, pour tous les analytes de la base,
+la consommation journalière, le stock de sécurité, le point de commande (ROP)
+et la quantité à commander (QAC), puis enregistre le plan dans la table OrderPlan.
+Avec un niveau de service visé, stock de sécurité, ROP et QAC viennent de la simulation
+de Monte-Carlo de safety_stock.py (variabilité de la consommation et du délai).
+La composition de chaque commande parmi les conditionnements disponibles est choisie
+par pack_optimizer.py. Avec --controles, le réactif consommé par les calibrations et
+contrôles planifiés sur l'horizon (control_schedule.py) s'ajoute à la consommation prévue.
+
+Utilisation en ligne de commande :
+    python planning.py --horizon 30 --livraison 7
+    python planning.py --horizon 30 --livraison 7 --service 0.95
+    python planning.py --periode "2 mois" --livraison 7
+    python planning.py --periode "2 mois" --livraison 7 --controles
+"""
+import argparse
+import sys
+from datetime import datetime
+
+import numpy as np
+
+from database import ReactifsDatabase, epoch_day
+from forecasting import DemandForecaster
+from logic_calc import UNIT_REGISTRY, DIM_COUNT, qac_chain
+from pack_optimizer import PackOptimizer, mix_label
+from periods import CALENDAR, PeriodEngine, closing_days_from_env, parse_period
+from safety_stock import simulate_service
+from control_schedule import ControlScheduler, schedule_totals
+
+PLAN_HEADERS = [
+    "Nom analyte", "Unité", "Conso./Jour", "Stock Sécurité", "Stock Actuel",
+    "ROP", "Conditionnement", "Q.A.C", "Composition"
+]
+
+
+class OrderPlanner:
+    """
+    Planificateur de commandes pour l'ensemble du catalogue d'analytes.
+    """
+    def __init__(self, database: ReactifsDatabase):
+        self.database = database
+
+    def build_plan(self, horizon_days: int = 30, lead_time_days: int = 7, as_of: str = None,
+                   service_level: float = None, history_days: int = 180, control_volumes: dict = None,
+                   **simulation) -> list:
+        """
+        Construit le plan de commande de tous les analytes.
+        :param horizon_days: nombre de jours de consommation à couvrir par la commande
+        :param lead_time_days: délai de livraison en jours (sert au stock de sécurité)
+        :param as_of: date de référence 'yyyy-MM-dd' (par défaut aujourd'hui)
+        :param service_level: niveau de service visé (0-1) ; s'il est donné, stock de sécurité, ROP
+                              et QAC sont simulés sur les `history_days` derniers jours de DailyUsage
+        :param control_volumes: réactif des calibrations et contrôles planifiés sur l'horizon, par analyte
+                                (voir control_schedule.schedule_totals), ajouté à la consommation prévue
+        :param simulation: options de simulate_service (paths, lead_time_cv, workers...)
+        :return: liste de dictionnaires, un par analyte
+        """
+        history = self.database.get_consumption_history(as_of)
+        if not history:
+            return []
+
+        ids = [row[0] for row in history]
+        names = [row[1] for row in history]
+        units = [row[2] for row in history]
+        columns = np.array([row[3:] for row in history], dtype=float).reshape(len(history), 8)
+        (consumed_volume, volume_days, avg_lot_volume, stock_volume,
+         performed_tests, test_days, avg_lot_tests, stock_tests) = columns.T
+
+        # Les analytes comptés en tests se planifient sur l'historique des tests,
+        # les autres sur les volumes consommés des lots
+        counted = np.array([UNIT_REGISTRY.dimension(unit) == DIM_COUNT for unit in units], dtype=bool)
+        consumed = np.where(counted, performed_tests, consumed_volume)
+        covered_days = np.maximum(np.where(counted, test_days, volume_days), 1)
+        stock = np.where(counted, stock_tests, stock_volume)
+        pack_size = np.where(counted, avg_lot_tests, avg_lot_volume)
+
+        # Consommation attendue sur l'horizon (l'historique inclut déjà pertes et calibrations,
+        # sauf si les calibrations et contrôles sont planifiés à part)
+        daily = consumed / covered_days
+        controls = np.array([(control_volumes or {}).get(analyte_id, 0.0) for analyte_id in ids])
+        chain = qac_chain(daily * horizon_days, controls, 0.0, 0.0, stock, pack_size, lead_time_days, horizon_days)
+        packs = np.where(pack_size > 0, np.nan_to_num(chain['qac']), 0).astype(int)
+        safety_stock, reorder_point = chain['stock_securite'], chain['rop']
+        needed = np.maximum(np.nan_to_num(chain['rop']), 0.0)
+        if service_level is not None:
+            history = self.usage_history(ids, counted, history_days, as_of)
+            simulated = simulate_service(history, stock, pack_size, lead_time_days, horizon_days,
+                                         service_level, controls=controls, **simulation)
+            safety_stock, reorder_point, packs = simulated['stock_securite'], simulated['rop'], simulated['qac']
+            needed = np.maximum(simulated['order_up_to'] - stock, 0.0)
+
+        plan = []
+        for index, analyte_id in enumerate(ids):
+            plan.append({
+                'analyte_id': analyte_id,
+                'nom_analyte': names[index],
+                'unite': units[index],
+                'daily_consumption': float(daily[index]),
+                'control_volume': float(controls[index]),
+                'safety_stock': float(safety_stock[index]),
+                'current_stock': float(stock[index]),
+                'reorder_point': float(reorder_point[index]),
+                'pack_size': float(pack_size[index]),
+                'packs_to_order': int(packs[index]),
+                'quantity_needed': float(needed[index]),
+                'horizon_days': horizon_days,
+                'lead_time_days': lead_time_days
+            })
+        return PackOptimizer(self.database).optimize_plan(plan)
+
+    def usage_history(self, analyte_ids, counted, history_days: int, as_of: str = None) -> np.ndarray:
+        """
+        Consommation journalière (analytes × jours) : tests pour les analytes comptés en tests, volume sinon.
+        """
+        last_day = epoch_day(as_of or datetime.now().strftime("%Y-%m-%d"))
+        first_day = last_day - history_days + 1
+        sorted_ids, tests = DemandForecaster(self.database, "tests").usage_matrix(first_day, last_day, analyte_ids)
+        _ids, volume = DemandForecaster(self.database, "volume").usage_matrix(first_day, last_day, analyte_ids)
+        rows = np.searchsorted(sorted_ids, analyte_ids)  # Matrices triées par identifiant, plan trié par nom
+        return np.where(np.asarray(counted)[:, None], tests[rows], volume[rows])
+
+    def save_plan(self, plan: list, plan_date: str = None) -> bool:
+        """
+        Enregistre le plan dans la table OrderPlan.
+        """
+        plan_date = plan_date or datetime.now().strftime("%Y-%m-%d")
+        rows = [
+            (entry['analyte_id'], entry['unite'], entry['daily_consumption'], entry['safety_stock'],
+             entry['current_stock'], entry['reorder_point'], entry['pack_size'], entry['packs_to_order'],
+             entry['horizon_days'], entry['lead_time_days'])
+            for entry in plan
+        ]
+        return self.database.save_order_plan(plan_date, rows)
+
+
+def plan_to_rows(plan: list) -> list:
+    """
+    Convertit un plan en lignes de texte alignées sur PLAN_HEADERS (affichage et export).
+    """
+    return [
+        [
+            entry['nom_analyte'],
+            entry['unite'],
+            f"{entry['daily_consumption']:.2f}",
+            f"{entry['safety_stock']:.2f}",
+            f"{entry['current_stock']:.2f}",
+            f"{entry['reorder_point']:.2f}",
+            f"{entry['pack_size']:.2f}",
+            str(entry['packs_to_order']),
+            mix_label(entry.get('pack_mix', []))
+        ]
+        for entry in plan
+    ]
+
+
+def resolve_horizon(horizon_days: int, period: str = None, as_of: str = None, closing_days: str = None) -> int:
+    """
+    Horizon du plan en jours : `horizon_days`, ou la durée exacte sur le calendrier de la période
+    saisie ('2 mois', '20 jours ouvrés') à partir de `as_of`.
+    :param closing_days: jours de fermeture ajoutés à ceux de CMA_CLOSING_DAYS (yyyy-MM-dd séparés par des virgules)
+    """
+    if not period:
+        return horizon_days
+    value, unit, working_days = parse_period(period)
+    engine = CALENDAR
+    if closing_days:
+        engine = PeriodEngine(closing_days_from_env() + tuple(day.strip() for day in closing_days.split(",")))
+    return engine.days(as_of, value, unit, working_days)
+
+
+def build_parser(parser: argparse.ArgumentParser = None) -> argparse.ArgumentParser:
+    # Sous-commande de cli.py : l'option --db générale n'est pas écrasée par celle-ci
+    database_default = "reactifs_database.db" if parser is None else argparse.SUPPRESS
+    parser = parser or argparse.ArgumentParser(description="Plan de commande pour tous les analytes.")
+    parser.add_argument("--db", default=database_default, help="Fichier de la base de données")
+    parser.add_argument("--horizon", type=int, default=30, help="Jours de consommation à couvrir")
+    parser.add_argument("--periode", default=None,
+                        help="Période à couvrir sur le calendrier, à la place de --horizon ('2 mois', '20 jours ouvrés')")
+    parser.add_argument("--fermetures", default=None,
+                        help="Jours de fermeture du laboratoire (yyyy-MM-dd séparés par des virgules)")
+    parser.add_argument("--livraison", type=int, default=7, help="Délai de livraison en jours")
+    parser.add_argument("--date", default=None, help="Date de référence (yyyy-MM-dd)")
+    parser.add_argument("--controles", action="store_true",
+                        help="Ajouter le réactif des calibrations et contrôles planifiés (control_schedule.py)")
+    parser.add_argument("--service", type=float, default=None,
+                        help="Niveau de service visé (0-1) : stock de sécurité simulé (Monte-Carlo)")
+    parser.add_argument("--dry-run", action="store_true", help="Affiche le plan sans l'enregistrer")
+    return parser
+
+
+def run(args) -> int:
+    database = ReactifsDatabase(args.db)
+    try:
+        try:
+            horizon = resolve_horizon(args.horizon, args.periode, args.date, args.fermetures)
+        except ValueError as e:
+            print(e)
+            return 1
+        control_volumes = None
+        if args.controles:
+            control_volumes = schedule_totals(ControlScheduler(database).expand(horizon, "jours", args.date))
+        planner = OrderPlanner(database)
+        plan = planner.build_plan(horizon, args.livraison, args.date, args.service, control_volumes=control_volumes)
+        print("\t".join(PLAN_HEADERS))
+        for row in plan_to_rows(plan):
+            print("\t".join(row))
+        if not args.dry_run and not planner.save_plan(plan, args.date):
+            return 1
+        return 0
+    finally:
+        database.close()
+
+
+def main(argv=None) -> int:
+    return run(build_parser().parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
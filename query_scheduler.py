@@ -0,0 +1,246 @@
+# query_scheduler.py
+"""
+Planificateur de requêtes « le plus récent gagne » pour les onglets.
+
+Chaque onglet possède un QueryScheduler. Les requêtes sont regroupées par usage
+(par exemple "load", "stats", "search") :
+    - les demandes rapprochées d'un même usage sont regroupées (délai de debounce) ;
+    - une nouvelle demande interrompt la requête en cours du même usage
+      (sqlite3.Connection.interrupt()) ;
+    - seul le résultat de la demande la plus récente est livré, dans le thread de l'interface ;
+    - avec `chunk_callback`, la fonction reçoit un argument on_chunk(rows) et les blocs de
+      lignes sont livrés au fur et à mesure (chargement progressif des tables). Les livraisons
+      sont traitées une par une à chaque tour de la boucle d'événements, pour que
+      l'interface reste réactive pendant un long chargement.
+
+Chaque usage dispose de son propre thread et de sa propre connexion, ce qui permet
+d'interrompre une requête sans toucher aux autres.
+
+    self.scheduler = QueryScheduler(parent=self)
+    self.scheduler.request("stats", "get_lots_by_analyte", name, callback=self.on_stats)
+"""
+import queue
+import threading
+from collections import deque
+
+from PySide6.QtCore import QObject, QTimer, Qt, Signal, Slot
+
+from database import ReactifsDatabase
+
+
+class _PurposeWorker:
+    """
+    Thread d'exécution d'un usage : traite ses tâches l'une après l'autre avec sa propre connexion.
+    """
+    def __init__(self, purpose, db_path, is_current, deliver):
+        self.purpose = purpose
+        self.db_path = db_path
+        self.is_current = is_current
+        self.deliver = deliver
+        self.tasks = queue.Queue()
+        self.lock = threading.Lock()
+        self.running = None  # Génération en cours d'exécution
+        self.database = None
+        self.thread = threading.Thread(target=self.run, name=f"QueryScheduler-{purpose}", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        self.database = ReactifsDatabase(self.db_path)
+        try:
+            while True:
+                task = self.tasks.get()
+                if task is None:
+                    break
+                generation, function, args, kwargs = task
+                if not self.is_current(self.purpose, generation):
+                    continue  # Remplacée pendant l'attente : inutile de l'exécuter
+
+                with self.lock:
+                    self.running = generation
+                try:
+                    if isinstance(function, str):
+                        result = getattr(self.database, function)(*args, **kwargs)
+                    else:
+                        result = function(self.database, *args, **kwargs)
+                    success = True
+                except Exception as e:
+                    result, success = e, False
+                finally:
+                    with self.lock:
+                        self.running = None
+
+                if not self.deliver(self.purpose, generation, success, result):
+                    break  # Le planificateur a été détruit
+        finally:
+            self.database.close()
+
+    def interrupt(self):
+        """
+        Interrompt la requête SQLite en cours (sans effet si aucune requête n'est active).
+        """
+        with self.lock:
+            if self.running is not None and self.database is not None:
+                self.database.conn.interrupt()
+
+    def stop(self):
+        self.tasks.put(None)
+
+
+class QueryScheduler(QObject):
+    """
+    Planificateur de requêtes par usage, avec regroupement, annulation et livraison du seul dernier résultat.
+    """
+    result_ready = Signal(str, int, bool, object)
+    chunk_ready = Signal(str, int, object)
+
+    def __init__(self, db_path: str = "reactifs_database.db", debounce_ms: int = 150, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.debounce_ms = debounce_ms
+        self.generations = {}  # usage -> numéro de la dernière demande
+        self.pending = {}  # usage -> (génération, fonction, args, kwargs) en attente du debounce
+        self.callbacks = {}  # usage -> (génération, callback, error_callback, chunk_callback)
+        self.timers = {}
+        self.workers = {}
+        self.lock = threading.Lock()
+        self.deliveries = {}  # usage -> file des blocs et résultats à livrer dans le thread de l'interface
+        self.drain_timer = QTimer(self)
+        self.drain_timer.setInterval(0)
+        self.drain_timer.timeout.connect(self.drain_deliveries)
+        self.result_ready.connect(self.on_result_ready, Qt.QueuedConnection)
+        self.chunk_ready.connect(self.on_chunk_ready, Qt.QueuedConnection)
+
+    def is_current(self, purpose: str, generation: int) -> bool:
+        with self.lock:
+            return self.generations.get(purpose) == generation
+
+    def request(self, purpose: str, function, *args, callback=None, error_callback=None,
+                chunk_callback=None, debounce_ms: int = None, **kwargs) -> int:
+        """
+        Demande l'exécution de function(database, *args, **kwargs) pour l'usage `purpose`.
+        :param function: fonction recevant la ReactifsDatabase du thread, ou nom d'une de ses méthodes
+        :param chunk_callback: reçoit chaque bloc transmis par la fonction via on_chunk(rows)
+        :param debounce_ms: délai de regroupement (par défaut celui du planificateur, 0 = immédiat)
+        :return: numéro de génération de la demande
+        """
+        with self.lock:
+            generation = self.generations.get(purpose, 0) + 1
+            self.generations[purpose] = generation
+        self.callbacks[purpose] = (generation, callback, error_callback, chunk_callback)
+        self.deliveries.pop(purpose, None)  # Blocs d'une demande précédente pas encore affichés
+        if chunk_callback is not None:
+            kwargs["on_chunk"] = lambda rows: self.deliver_chunk(purpose, generation, rows)
+        self.pending[purpose] = (generation, function, args, kwargs)
+
+        # La requête en cours est désormais inutile
+        worker = self.workers.get(purpose)
+        if worker:
+            worker.interrupt()
+
+        delay = self.debounce_ms if debounce_ms is None else debounce_ms
+        if delay <= 0:
+            self.dispatch(purpose)
+        else:
+            timer = self.timers.get(purpose)
+            if timer is None:
+                timer = self.timers[purpose] = QTimer(self)
+                timer.setSingleShot(True)
+                timer.timeout.connect(lambda purpose=purpose: self.dispatch(purpose))
+            timer.start(delay)
+        return generation
+
+    def dispatch(self, purpose: str):
+        task = self.pending.pop(purpose, None)
+        if task is None:
+            return
+        worker = self.workers.get(purpose)
+        if worker is None:
+            worker = self.workers[purpose] = _PurposeWorker(purpose, self.db_path, self.is_current, self.deliver)
+        worker.tasks.put(task)
+
+    def deliver(self, purpose, generation, success, result) -> bool:
+        """
+        Appelée dans le thread de l'usage : transmet le résultat au thread de l'interface.
+        """
+        if not self.is_current(purpose, generation):
+            return True  # Résultat périmé (souvent une requête interrompue) : ignoré
+        try:
+            self.result_ready.emit(purpose, generation, success, result)
+        except RuntimeError:
+            return False  # Objet Qt détruit
+        return True
+
+    def deliver_chunk(self, purpose, generation, rows) -> bool:
+        """
+        Appelée dans le thread de l'usage pour chaque bloc ; renvoie False si la demande est périmée.
+        """
+        if not self.is_current(purpose, generation):
+            return False
+        try:
+            self.chunk_ready.emit(purpose, generation, rows)
+        except RuntimeError:
+            return False
+        return True
+
+    @Slot(str, int, object)
+    def on_chunk_ready(self, purpose, generation, rows):
+        self.enqueue_delivery(purpose, (generation, True, rows, True))
+
+    @Slot(str, int, bool, object)
+    def on_result_ready(self, purpose, generation, success, result):
+        self.enqueue_delivery(purpose, (generation, success, result, False))
+
+    def enqueue_delivery(self, purpose, delivery):
+        self.deliveries.setdefault(purpose, deque()).append(delivery)
+        if not self.drain_timer.isActive():
+            self.drain_timer.start()
+
+    def drain_deliveries(self):
+        """
+        Livre au plus un élément par usage, puis rend la main à la boucle d'événements.
+        """
+        for purpose, pending in list(self.deliveries.items()):
+            if pending:
+                self.deliver_now(purpose, *pending.popleft())
+        if not any(self.deliveries.values()):
+            self.drain_timer.stop()
+
+    def deliver_now(self, purpose, generation, success, payload, is_chunk):
+        current_generation, callback, error_callback, chunk_callback = self.callbacks.get(
+            purpose, (None, None, None, None))
+        if generation != current_generation:
+            return  # Une demande plus récente a été faite entre-temps
+        if is_chunk:
+            if chunk_callback:
+                chunk_callback(payload)
+            return
+        self.callbacks.pop(purpose, None)
+        if success:
+            if callback:
+                callback(payload)
+        elif error_callback:
+            error_callback(payload)
+        else:
+            print(f"Erreur lors de la requête '{purpose}' : {payload}")
+
+    def cancel(self, purpose: str):
+        """
+        Annule la demande en attente ou en cours pour cet usage.
+        """
+        with self.lock:
+            self.generations[purpose] = self.generations.get(purpose, 0) + 1
+        self.pending.pop(purpose, None)
+        self.callbacks.pop(purpose, None)
+        self.deliveries.pop(purpose, None)
+        if purpose in self.timers:
+            self.timers[purpose].stop()
+        if purpose in self.workers:
+            self.workers[purpose].interrupt()
+
+    def shutdown(self):
+        self.drain_timer.stop()
+        for purpose in list(self.generations):
+            self.cancel(purpose)
+        for worker in self.workers.values():
+            worker.stop()
+        self.workers.clear()
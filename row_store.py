@@ -0,0 +1,250 @@
+# row_store.py
+"""
+Stockage compact des lignes affichées par les onglets "Calcul Volume Test" et "Calcul Test".
+
+Au lieu d'un dictionnaire par ligne (avec les nombres convertis en texte), chaque colonne
+est conservée dans un tableau typé (array) ou une liste de chaînes. Les chaînes très répétées
+(analytes, unités, opérateurs, dates) sont internées : une seule copie en mémoire par valeur.
+
+Le même stockage sert à la table, à la recherche et aux exportations (display_rows),
+ce qui garantit une mise en forme identique partout, y compris dans cli.py.
+
+    store = LotStore()
+    store.extend(database.get_all_lots())
+    rows = store.display_rows()
+"""
+import math
+import sys
+from array import array
+from functools import lru_cache
+
+from database import epoch_day
+
+LOTS_HEADERS = [
+    "ID", "Nom analyte", "Unité", "Numéro lot", "Début", "Fin", "Durée",
+    "Volume Total (ml)", "Volume Restant (ml)", "Tests Réalisés", "Volume/Test (ml)", "Perte %", "Opérateur"
+]
+
+TESTS_HEADERS = [
+    "ID", "Nom analyte", "Numéro de lot", "Date Ouverture", "Date Fin", "Durée",
+    "Tests Estimés", "Tests Réalisés", "Perte (Tests)", "Facteur Utilisation", "Perte (%)", "Opérateur"
+]
+
+# Types de colonnes : "q" entier, "d" réel, "i" chaîne internée, "s" chaîne
+_EMPTY = {"q": 0, "d": math.nan}
+
+
+@lru_cache(maxsize=8192)
+def day_number(value):
+    return epoch_day(value)
+
+
+def duration_days(start_date, end_date):
+    """
+    Durée en jours, comme la colonne générée duration_days (pour les lignes saisies,
+    qui n'ont pas encore été relues depuis la base). None si une date est invalide.
+    """
+    start, end = day_number(start_date), day_number(end_date)
+    if start is None or end is None:
+        return None
+    return abs(end - start)
+
+
+def format_duration(days):
+    return "" if days is None or math.isnan(days) else f"{int(days)} jours"
+
+
+def format_number(value):
+    return "" if isinstance(value, float) and math.isnan(value) else str(value)
+
+
+def format_ratio(value):
+    return "" if math.isnan(value) else f"{value:.2f}"
+
+
+class ColumnStore:
+    """
+    Lignes stockées par colonnes. Les sous-classes définissent COLUMNS [(nom, type)]
+    et DISPLAY [(nom, mise en forme)] : colonnes affichées dans la table et les exportations,
+    dans l'ordre des HEADERS.
+    """
+    COLUMNS = ()
+    HEADERS = ()
+    DISPLAY = ()
+
+    def __init__(self, rows=()):
+        self.names = [name for name, _ in self.COLUMNS]
+        self.positions = {name: position for position, name in enumerate(self.names)}
+        self.display = [(self.positions[name], formatter) for name, formatter in self.DISPLAY]
+        self.clear()
+        self.extend(rows)
+
+    def clear(self):
+        self.columns = [array(kind) if kind in _EMPTY else [] for _, kind in self.COLUMNS]
+        self._index = {}  # id -> position, reconstruit à la demande après une suppression (None)
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def complete(self, values):
+        """
+        Complète une ligne saisie avec les colonnes calculées par la base (voir LotStore / TestStore).
+        """
+        return values
+
+    def convert(self, values):
+        """
+        Convertit une ligne (tuple SQLite ou valeurs saisies) au type de chaque colonne.
+        """
+        if len(values) < len(self.COLUMNS):
+            values = self.complete(tuple(values))
+        converted = []
+        for (_, kind), value in zip(self.COLUMNS, values):
+            if kind == "q":
+                value = int(float(value)) if value not in (None, "") else 0
+            elif kind == "d":
+                value = float(value) if value not in (None, "") else math.nan
+            elif kind == "i":
+                value = sys.intern(str(value)) if value is not None else ""
+            else:
+                value = str(value) if value is not None else ""
+            converted.append(value)
+        return converted
+
+    def append(self, values):
+        for column, value in zip(self.columns, self.convert(values)):
+            column.append(value)
+        if self._index is not None:
+            self._index.setdefault(self.columns[self.positions["id"]][-1], len(self) - 1)
+
+    def extend(self, rows):
+        for values in rows:
+            self.append(values)
+
+    def row(self, position):
+        return tuple(column[position] for column in self.columns)
+
+    def record(self, position):
+        """
+        Ligne sous forme de dictionnaire {nom de colonne: valeur}.
+        """
+        return dict(zip(self.names, self.row(position)))
+
+    def value(self, position, name):
+        return self.columns[self.positions[name]][position]
+
+    def set_row(self, position, values):
+        ids = self.columns[self.positions["id"]]
+        old_id = ids[position]
+        for column, value in zip(self.columns, self.convert(values)):
+            column[position] = value
+        if ids[position] != old_id:
+            self._index = None
+
+    def remove(self, position):
+        for column in self.columns:
+            del column[position]
+        self._index = None  # Les positions suivantes sont décalées
+
+    def position_of(self, row_id):
+        """
+        Position de la ligne d'identifiant `row_id` (colonne "id"), ou -1.
+        """
+        if self._index is None:
+            ids = self.columns[self.positions["id"]]
+            self._index = {}
+            for position, value in enumerate(ids):
+                self._index.setdefault(value, position)
+        try:
+            return self._index.get(int(row_id), -1)
+        except (ValueError, TypeError):
+            return -1
+
+    def matching(self, name, text):
+        """
+        Liste de booléens : la colonne `name` contient-elle `text` (sans tenir compte de la casse) ?
+        Le test n'est fait qu'une fois par valeur distincte (analytes, opérateurs...).
+        """
+        text = text.lower()
+        cache = {}
+        result = []
+        for value in self.columns[self.positions[name]]:
+            found = cache.get(value)
+            if found is None:
+                found = cache[value] = text in str(value).lower()
+            result.append(found)
+        return result
+
+    def display_row(self, position):
+        """
+        Ligne mise en forme (liste de chaînes), dans l'ordre des HEADERS.
+        """
+        return [formatter(self.columns[column][position]) for column, formatter in self.display]
+
+    def display_rows(self, positions=None):
+        """
+        Lignes mises en forme (listes de chaînes), dans l'ordre des HEADERS.
+        """
+        if positions is None:
+            positions = range(len(self))
+        return [self.display_row(position) for position in positions]
+
+    def nbytes(self):
+        """
+        Taille approximative des colonnes (sans les chaînes internées partagées).
+        """
+        total = 0
+        for (_, kind), column in zip(self.COLUMNS, self.columns):
+            if kind in _EMPTY:
+                total += column.itemsize * len(column)
+            else:
+                total += sys.getsizeof(column)
+                if kind == "s":
+                    total += sum(sys.getsizeof(value) for value in column)
+        return total
+
+
+class LotStore(ColumnStore):
+    """
+    Lots de l'onglet "Calcul Volume Test" (colonnes de LOTS_QUERY / get_all_lots).
+    Durée et volume par test viennent des colonnes générées de la base.
+    """
+    COLUMNS = (
+        ("id", "q"), ("analyte", "i"), ("unit", "i"), ("lot_number", "s"), ("start_date", "i"),
+        ("end_date", "i"), ("total_volume", "d"), ("remaining_volume", "d"), ("tests_performed", "q"),
+        ("loss_percentage", "d"), ("operator", "i"), ("duration_days", "d"), ("volume_per_test", "d")
+    )
+    HEADERS = LOTS_HEADERS
+    DISPLAY = (
+        ("id", str), ("analyte", str), ("unit", str), ("lot_number", str), ("start_date", str),
+        ("end_date", str), ("duration_days", format_duration), ("total_volume", format_number),
+        ("remaining_volume", format_number), ("tests_performed", str), ("volume_per_test", format_ratio),
+        ("loss_percentage", format_number), ("operator", str)
+    )
+
+    def complete(self, values):
+        total, remaining, tests = (float(value or 0) for value in values[6:9])
+        return values + (duration_days(values[4], values[5]), (total - remaining) / tests if tests > 0 else None)
+
+
+class TestStore(ColumnStore):
+    """
+    Tests de l'onglet "Calcul Test" (colonnes de TESTS_QUERY).
+    Durée et perte en tests viennent des colonnes générées de la base.
+    """
+    COLUMNS = (
+        ("id", "q"), ("analyte", "i"), ("lot_number", "s"), ("start_date", "i"), ("end_date", "i"),
+        ("estimated_tests", "q"), ("performed_tests", "q"), ("usage_factor", "d"), ("loss_percentage", "d"),
+        ("operator", "i"), ("duration_days", "d"), ("loss_tests", "q")
+    )
+    HEADERS = TESTS_HEADERS
+    DISPLAY = (
+        ("id", str), ("analyte", str), ("lot_number", str), ("start_date", str), ("end_date", str),
+        ("duration_days", format_duration), ("estimated_tests", str), ("performed_tests", str),
+        ("loss_tests", str), ("usage_factor", format_number), ("loss_percentage", format_number),
+        ("operator", str)
+    )
+
+    def complete(self, values):
+        estimated, performed = (int(float(value or 0)) for value in values[5:7])
+        return values + (duration_days(values[3], values[4]), estimated - performed)
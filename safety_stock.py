@@ -0,0 +1,161 @@
+# safety_stock.py
+"""
+Stock de sécurité par simulation de Monte-Carlo (sans interface graphique).
+
+La formule de qac_chain (stock de sécurité = CMJ × délai) ignore la variabilité de la
+consommation et du délai de livraison. Ici, pour chaque analyte, des milliers de
+trajectoires sont tirées :
+    - délai de livraison : loi gamma de moyenne `lead_time_days` et de coefficient de
+      variation `lead_time_cv`, arrondi au jour supérieur ;
+    - consommation journalière : rééchantillonnage par blocs de `block_days` jours de
+      l'historique DailyUsage (les blocs conservent les semaines creuses et chargées),
+      plus, le cas échéant, le réactif des calibrations et contrôles planifiés sur l'horizon,
+      réparti également sur les jours.
+La consommation cumulée pendant le délai donne le point de commande (ROP) au niveau de
+service visé ; pendant délai + horizon, le niveau à atteindre par la commande (QAC) et la
+courbe niveau de service / nombre de conditionnements commandés.
+
+Chaque analyte est simulé d'un bloc (tableaux trajectoires × jours) ; les analytes sont
+répartis entre plusieurs processus. Chaque analyte a sa propre graine : les résultats ne
+dépendent pas du nombre de processus.
+
+    results = simulate_service(history, stock, pack_size, lead_time_days=7, horizon_days=30, target=0.95)
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+DEFAULT_PATHS = 5000
+DEFAULT_LEAD_TIME_CV = 0.25
+DEFAULT_BLOCK_DAYS = 7
+
+# En dessous de ce nombre d'analytes, la simulation reste dans le processus courant
+MIN_ANALYTES_PER_PROCESS = 8
+
+
+def lead_time_draws(rng, mean_days, cv, paths):
+    """
+    Délais de livraison simulés (jours entiers, au moins 1).
+    """
+    if cv <= 0:
+        return np.full(paths, max(int(np.ceil(mean_days)), 1))
+    shape = 1.0 / (cv * cv)
+    draws = rng.gamma(shape, mean_days / shape, size=paths)
+    return np.maximum(np.ceil(draws).astype(np.int64), 1)
+
+
+def demand_paths(rng, history, paths, days, block_days):
+    """
+    Trajectoires de consommation (trajectoires × jours) rééchantillonnées par blocs dans l'historique.
+    """
+    block = max(1, min(block_days, len(history)))
+    blocks = -(-days // block)
+    starts = rng.integers(0, len(history) - block + 1, size=(paths, blocks))
+    index = (starts[:, :, None] + np.arange(block)).reshape(paths, blocks * block)[:, :days]
+    return history[index]
+
+
+def simulate_analyte(history, stock, pack_size, lead_time_days, horizon_days, target, paths, lead_time_cv,
+                     block_days, seed, control_volume=0.0):
+    """
+    Simule un analyte et renvoie (consommation moyenne pendant le délai, ROP, niveau à atteindre,
+    conditionnements à commander, niveau de service obtenu, courbe niveau de service par nombre
+    de conditionnements). `control_volume` (calibrations et contrôles planifiés sur l'horizon)
+    s'ajoute à chaque jour simulé, au prorata.
+    """
+    history = np.asarray(history, dtype=float)
+    daily_controls = control_volume / horizon_days if horizon_days > 0 else 0.0
+    if (not len(history) or not history.any()) and not daily_controls:
+        return 0.0, 0.0, 0.0, 0, 1.0, np.ones(1)
+    if not len(history):
+        history = np.zeros(1)
+
+    rng = np.random.default_rng(seed)
+    lead_times = lead_time_draws(rng, lead_time_days, lead_time_cv, paths)
+    demand = demand_paths(rng, history, paths, int(lead_times.max()) + horizon_days, block_days) + daily_controls
+    cumulative = np.cumsum(demand, axis=1)
+    rows = np.arange(paths)
+    lead_demand = cumulative[rows, lead_times - 1]
+    cover_demand = np.sort(cumulative[rows, lead_times + horizon_days - 1])
+
+    reorder_point = float(np.quantile(lead_demand, target))
+    order_up_to = float(np.quantile(cover_demand, target))
+    if pack_size > 0:
+        packs = int(np.ceil(max(order_up_to - stock, 0.0) / pack_size))
+        # Niveau de service (délai + horizon couverts sans rupture) pour 0..2×packs conditionnements
+        levels = stock + pack_size * np.arange(max(2 * packs, 1) + 1)
+    else:
+        packs = 0
+        levels = np.array([stock])
+    curve = np.searchsorted(cover_demand, levels, side="right") / paths
+    return float(lead_demand.mean()), reorder_point, order_up_to, packs, float(curve[min(packs, len(curve) - 1)]), curve
+
+
+def _simulate_chunk(task):
+    """
+    Simule une série d'analytes (exécuté dans un processus du pool).
+    """
+    history, stock, pack_size, controls, seeds, options = task
+    return [
+        simulate_analyte(history[i], stock[i], pack_size[i], seed=seeds[i], control_volume=controls[i], **options)
+        for i in range(len(seeds))
+    ]
+
+
+def simulate_service(history, stock, pack_size, lead_time_days: float = 7, horizon_days: int = 30,
+                     target: float = 0.95, paths: int = DEFAULT_PATHS, lead_time_cv: float = DEFAULT_LEAD_TIME_CV,
+                     block_days: int = DEFAULT_BLOCK_DAYS, seed: int = 0, workers: int = None,
+                     controls=None) -> dict:
+    """
+    Point de commande et quantité à commander de tous les analytes pour un niveau de service visé.
+
+    :param history: matrice (analytes × jours) de consommation journalière
+    :param stock: stock actuel de chaque analyte
+    :param pack_size: taille d'un conditionnement de chaque analyte (0 = pas de commande)
+    :param target: niveau de service visé (probabilité de ne pas être en rupture), entre 0 et 1
+    :param workers: nombre de processus (par défaut le nombre de processeurs, 1 = sans pool)
+    :param controls: réactif des calibrations et contrôles planifiés sur l'horizon, par analyte (0 par défaut)
+    :return: dictionnaire de tableaux 'lead_demand', 'stock_securite', 'rop', 'order_up_to', 'qac',
+             'service_level' et de la liste 'service_curve' (niveau de service pour 0, 1, 2...
+             conditionnements commandés)
+    """
+    if not 0 < target < 1:
+        raise ValueError("Le niveau de service doit être compris entre 0 et 1")
+    history = np.asarray(history, dtype=float)
+    stock = np.asarray(stock, dtype=float)
+    pack_size = np.asarray(pack_size, dtype=float)
+    count = len(history)
+    controls = np.zeros(count) if controls is None else np.asarray(controls, dtype=float)
+    seeds = np.random.SeedSequence(seed).spawn(count)
+    options = {
+        'lead_time_days': lead_time_days, 'horizon_days': horizon_days, 'target': target, 'paths': paths,
+        'lead_time_cv': lead_time_cv, 'block_days': block_days
+    }
+
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, max(count // MIN_ANALYTES_PER_PROCESS, 1))
+    chunks = np.array_split(np.arange(count), workers)
+    tasks = [(history[chunk], stock[chunk], pack_size[chunk], controls[chunk], [seeds[i] for i in chunk], options)
+             for chunk in chunks if len(chunk)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = [result for chunk in pool.map(_simulate_chunk, tasks) for result in chunk]
+    else:
+        results = [result for task in tasks for result in _simulate_chunk(task)]
+
+    if not results:
+        empty = np.zeros(0)
+        return {'lead_demand': empty, 'stock_securite': empty, 'rop': empty, 'order_up_to': empty,
+                'qac': empty.astype(int), 'service_level': empty, 'service_curve': []}
+    lead_demand, rop, order_up_to, qac, service_level, curves = (list(column) for column in zip(*results))
+    lead_demand, rop = np.array(lead_demand), np.array(rop)
+    return {
+        'lead_demand': lead_demand,
+        'stock_securite': rop - lead_demand,
+        'rop': rop,
+        'order_up_to': np.array(order_up_to),
+        'qac': np.array(qac, dtype=int),
+        'service_level': np.array(service_level),
+        'service_curve': curves
+    }
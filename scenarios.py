@@ -0,0 +1,235 @@
+# scenarios.py
+"""
+Scénarios de calcul enregistrés et recalcul en lot (sans interface graphique).
+
+Un scénario garde toutes les entrées du formulaire "Gestion des Réactifs" d'un analyte
+(table Scenarios) : les champs du formulaire pour le recharger, et les champs de la chaîne
+CMA → CMJ → ROP → QAC pour la recalculer. Le stock actuel et la consommation peuvent suivre
+la base (lots et tests ouverts, moyenne DailyUsage des `window_days` derniers jours) : quand
+le stock ou la consommation changent, tous les scénarios sont recalculés d'un seul appel
+vectorisé de qac_chain.
+
+Chaque résultat est enregistré avec l'empreinte (SHA-1) des entrées effectives qui l'ont
+produit : seuls les scénarios dont une entrée a réellement changé sont recalculés.
+
+Utilisation en ligne de commande :
+    python scenarios.py --recalculer
+"""
+import argparse
+import hashlib
+import json
+import sys
+from datetime import datetime
+
+import numpy as np
+
+from database import ReactifsDatabase
+from logic_calc import ConsumptionCalculator, UNIT_REGISTRY, DIM_COUNT, normalize_fields, qac_chain
+
+SCENARIO_HEADERS = [
+    "Nom analyte", "Scénario", "Unité", "Consommation", "Stock Actuel", "CMA", "CMJ", "ROP", "Q.A.C", "Calculé le"
+]
+
+CHAIN_INPUTS = ("consommation", "calibration", "pertes", "confirmation", "stock_actuel", "conditionnement",
+                "livraison", "period")
+
+
+def input_hash(inputs: dict) -> str:
+    """
+    Empreinte des entrées effectives d'un scénario (indépendante de l'ordre des clés).
+    """
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+class ScenarioEngine:
+    """
+    Recalcul des scénarios enregistrés à partir de leurs entrées et de l'état actuel de la base.
+    """
+    def __init__(self, database: ReactifsDatabase, window_days: int = 90):
+        self.database = database
+        self.window_days = window_days
+        self.calculator = ConsumptionCalculator()
+
+    def to_unit(self, value, unit, target_unit):
+        """
+        Valeur convertie dans l'unité cible, ou None si la conversion est impossible.
+        """
+        if unit == target_unit:
+            return value
+        try:
+            return self.calculator.convert_value(value, unit, target_unit)
+        except ValueError:
+            return None
+
+    def effective_inputs(self, inputs: dict, live_stock: bool, live_consumption: bool, status) -> dict:
+        """
+        Entrées de la chaîne dans l'unité du conditionnement : celles du formulaire, avec le stock
+        et la consommation de la base quand le scénario les suit.
+        :param status: ligne de get_stock_status de l'analyte (ou None)
+        """
+        fields = inputs['fields']
+        target_unit = fields['conditionnement']['unit']
+        values = normalize_fields(fields, self.calculator)
+        values.update(
+            conditionnement=fields['conditionnement']['value'],
+            livraison=fields['livraison']['value'],
+            period=fields['consommation']['period']
+        )
+
+        if status is not None:
+            _analyte_id, _name, unit, stock_volume, stock_tests, volume_rate, tests_rate = status
+            counted = UNIT_REGISTRY.dimension(unit) == DIM_COUNT
+            unit = "test" if counted else unit
+            if live_stock:
+                stock = self.to_unit(stock_tests if counted else stock_volume, unit, target_unit)
+                if stock is not None:
+                    values['stock_actuel'] = stock
+            # Sans consommation récente, la valeur saisie est conservée
+            daily_rate = tests_rate if counted else volume_rate
+            if live_consumption and daily_rate > 0:
+                consumption = self.to_unit(daily_rate * values['period'], unit, target_unit)
+                if consumption is not None:
+                    values['consommation'] = consumption
+
+        effective = {key: round(float(values[key]), 6) for key in CHAIN_INPUTS}
+        effective.update(unit=target_unit, packaging=fields['conditionnement'].get('packaging', ""))
+        return effective
+
+    def recompute(self, analyte_ids=None, as_of: str = None, force: bool = False) -> dict:
+        """
+        Recalcule les scénarios (de tous les analytes ou de ceux indiqués) dont les entrées
+        effectives ont changé depuis le dernier calcul (tous avec `force`).
+        :return: dictionnaire 'total', 'recomputed' et 'errors' (nombre de scénarios)
+        """
+        scenarios = self.database.get_scenarios(analyte_ids)
+        if not scenarios:
+            return {'total': 0, 'recomputed': 0, 'errors': 0}
+        status = {row[0]: row for row in self.database.get_stock_status(
+            self.window_days, as_of, analyte_ids={scenario[1] for scenario in scenarios})}
+        computed_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        pending, updates, errors = [], [], 0
+        for scenario_id, analyte_id, _analyte, _name, inputs, live_stock, live_consumption, stored_hash, _results, \
+                _computed_at in scenarios:
+            try:
+                effective = self.effective_inputs(inputs, live_stock, live_consumption, status.get(analyte_id))
+            except (KeyError, TypeError, ValueError) as e:
+                errors += 1
+                digest = input_hash(inputs)
+                if force or digest != stored_hash:
+                    updates.append((scenario_id, digest, {'erreur': str(e)}, computed_at))
+                continue
+            digest = input_hash(effective)
+            if force or digest != stored_hash:
+                pending.append((scenario_id, digest, effective))
+
+        if pending:
+            columns = {key: np.array([effective[key] for _, _, effective in pending]) for key in CHAIN_INPUTS}
+            chain = qac_chain(*(columns[key] for key in CHAIN_INPUTS))
+            for index, (scenario_id, digest, effective) in enumerate(pending):
+                results = {key: float(values[index]) for key, values in chain.items()}
+                results.update(consommation=effective['consommation'], stock_actuel=effective['stock_actuel'],
+                               unit=effective['unit'], packaging=effective['packaging'], period=effective['period'])
+                updates.append((scenario_id, digest, results, computed_at))
+
+        if updates:
+            self.database.save_scenario_results(updates)
+        return {'total': len(scenarios), 'recomputed': len(updates), 'errors': errors}
+
+
+def recompute_scenarios(database, analyte_names=None, window_days: int = 90) -> dict:
+    """
+    Recalcule les scénarios des analytes nommés (tous par défaut), pour le service de base de données.
+    """
+    analyte_ids = None
+    if analyte_names is not None:
+        analyte_ids = [analyte_id for analyte_id in map(database.get_analyte_id, analyte_names) if analyte_id]
+    return ScenarioEngine(database, window_days).recompute(analyte_ids)
+
+
+def store_scenario(database, analyte_name: str, name: str, inputs: dict) -> dict:
+    """
+    Enregistre un scénario de l'analyte nommé et calcule son résultat, pour le service de base de données.
+    """
+    analyte_id = database.get_analyte_id(analyte_name)
+    if analyte_id is None:
+        raise ValueError(f"Analyte inconnu : {analyte_name}")
+    if database.save_scenario(analyte_id, name, inputs) is None:
+        raise ValueError("Impossible d'enregistrer le scénario.")
+    return ScenarioEngine(database).recompute([analyte_id])
+
+
+def fetch_scenarios(database, analyte_name: str = None) -> list:
+    """
+    Scénarios de l'analyte nommé, ou de tous les analytes s'il est inconnu.
+    """
+    analyte_id = database.get_analyte_id(analyte_name) if analyte_name else None
+    return database.get_scenarios(None if analyte_id is None else [analyte_id])
+
+
+def scenarios_to_rows(scenarios: list) -> list:
+    """
+    Convertit des scénarios (résultat de get_scenarios) en lignes de texte alignées sur SCENARIO_HEADERS.
+    """
+    rows = []
+    for _id, _analyte_id, analyte, name, _inputs, _live_stock, _live_consumption, _hash, results, computed_at \
+            in scenarios:
+        if not results or 'erreur' in results:
+            message = results['erreur'] if results else "Non calculé"
+            rows.append([analyte, name, "", "", "", "", "", "", message, computed_at or ""])
+            continue
+        unit = results['unit']
+        rows.append([
+            analyte,
+            name,
+            unit,
+            f"{results['consommation']:.2f} / {results['period']:g} j",
+            f"{results['stock_actuel']:.2f}",
+            f"{results['cma']:.2f}",
+            f"{results['cmj']:.2f}",
+            f"{results['rop']:.2f}",
+            f"{results['qac']:.0f} {results['packaging']}",
+            computed_at
+        ])
+    return rows
+
+
+def build_parser(parser: argparse.ArgumentParser = None) -> argparse.ArgumentParser:
+    database_default = "reactifs_database.db" if parser is None else argparse.SUPPRESS
+    parser = parser or argparse.ArgumentParser(description="Scénarios de calcul enregistrés.")
+    parser.add_argument("--db", default=database_default, help="Fichier de la base de données")
+    parser.add_argument("--analyte", default=None, help="Limiter à un analyte")
+    parser.add_argument("--recalculer", action="store_true", help="Recalculer les scénarios dont les entrées ont changé")
+    parser.add_argument("--force", action="store_true", help="Recalculer tous les scénarios")
+    parser.add_argument("--date", default=None, help="Date de référence du stock et de la consommation (yyyy-MM-dd)")
+    return parser
+
+
+def run(args) -> int:
+    database = ReactifsDatabase(args.db)
+    try:
+        analyte_ids = None
+        if args.analyte:
+            analyte_id = database.get_analyte_id(args.analyte)
+            if analyte_id is None:
+                print(f"Analyte inconnu : {args.analyte}")
+                return 1
+            analyte_ids = [analyte_id]
+        if args.recalculer or args.force:
+            summary = ScenarioEngine(database).recompute(analyte_ids, args.date, args.force)
+            print(f"{summary['recomputed']} scénarios recalculés sur {summary['total']} "
+                  f"({summary['errors']} en erreur).")
+        print("\t".join(SCENARIO_HEADERS))
+        for row in scenarios_to_rows(database.get_scenarios(analyte_ids)):
+            print("\t".join(row))
+        return 0
+    finally:
+        database.close()
+
+
+def main(argv=None) -> int:
+    return run(build_parser().parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,381 @@
+# sql_trace.py
+"""
+Instrumentation des requêtes SQLite.
+
+Chaque requête exécutée par ReactifsDatabase ou DatabaseWorkerThread passe par un
+TracedCursor qui enregistre :
+    - l'empreinte de la requête (littéraux remplacés par '?', espaces normalisés)
+    - le nombre de paramètres et de lignes renvoyées
+    - le temps réel (exécution + lecture des lignes)
+    - le thread appelant
+
+Les enregistrements sont conservés dans un tampon circulaire en mémoire, agrégés en
+histogramme par requête, et les requêtes plus lentes que le seuil sont écrites dans
+un journal rotatif (cma_slow_queries.log dans le dossier temporaire, hors des sources).
+
+Le même curseur signale les requêtes exécutées sur le thread de l'interface graphique
+(MainThreadGuard) : elles sont comptées par emplacement appelant, et selon le mode
+signalées dans la console ou refusées (MainThreadSQLError).
+
+Réglages (variables d'environnement) :
+    CMA_SLOW_QUERY_MS    seuil des requêtes lentes en millisecondes (défaut 100)
+    CMA_SQL_TRACE_SIZE   taille du tampon circulaire (défaut 5000)
+    CMA_SQL_GUARD        off | warn | strict : requêtes sur le thread principal (défaut warn)
+    CMA_SLOW_QUERY_LOG   chemin du journal des requêtes lentes
+"""
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+from logging.handlers import RotatingFileHandler
+
+SLOW_LOG_PATH = os.environ.get("CMA_SLOW_QUERY_LOG") or os.path.join(tempfile.gettempdir(), "cma_slow_queries.log")
+
+# Bornes supérieures (ms) des classes de l'histogramme
+HISTOGRAM_BOUNDS_MS = [1, 5, 10, 50, 100, 500, 1000, 5000]
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql: str) -> str:
+    """
+    Normalise une requête pour regrouper les exécutions d'une même instruction.
+    """
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _IN_LIST.sub("(?+)", sql)
+    return _WHITESPACE.sub(" ", sql).strip().rstrip(";")
+
+
+def count_parameters(params) -> int:
+    if params is None:
+        return 0
+    try:
+        return len(params)
+    except TypeError:
+        return 0
+
+
+class SQLTracer:
+    """
+    Collecte des mesures : tampon circulaire, histogramme par empreinte et journal des requêtes lentes.
+    """
+    def __init__(self, capacity: int = 5000, slow_threshold_ms: float = 100.0, log_path: str = SLOW_LOG_PATH):
+        self.enabled = True
+        self.slow_threshold_ms = slow_threshold_ms
+        self.log_path = log_path
+        self.records = deque(maxlen=capacity)
+        self.statistics = {}
+        self.lock = threading.Lock()
+        self._slow_logger = None
+
+    @property
+    def slow_logger(self) -> logging.Logger:
+        # Le fichier n'est créé qu'à la première requête lente
+        if self._slow_logger is None:
+            logger = logging.getLogger("gestion_stock_cma.slow_queries")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            if not logger.handlers:
+                handler = RotatingFileHandler(self.log_path, maxBytes=1_000_000, backupCount=3, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(asctime)s\t%(message)s"))
+                logger.addHandler(handler)
+            self._slow_logger = logger
+        return self._slow_logger
+
+    def record(self, sql: str, param_count: int, rows: int, elapsed: float):
+        """
+        Enregistre une exécution terminée (elapsed en secondes).
+        """
+        if not self.enabled:
+            return
+        key = fingerprint(sql)
+        elapsed_ms = elapsed * 1000
+        thread_name = threading.current_thread().name
+        entry = (time.time(), key, param_count, rows, elapsed_ms, thread_name)
+
+        with self.lock:
+            self.records.append(entry)
+            stats = self.statistics.get(key)
+            if stats is None:
+                stats = self.statistics[key] = {
+                    "count": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0,
+                    "buckets": [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+                }
+            stats["count"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            stats["rows"] += rows
+            stats["buckets"][self._bucket(elapsed_ms)] += 1
+
+        if elapsed_ms >= self.slow_threshold_ms:
+            self.slow_logger.info(f"{elapsed_ms:.1f} ms\t{rows} lignes\t{param_count} param.\t{thread_name}\t{key}")
+
+    @staticmethod
+    def _bucket(elapsed_ms: float) -> int:
+        for index, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if elapsed_ms <= bound:
+                return index
+        return len(HISTOGRAM_BOUNDS_MS)
+
+    def recent(self, limit: int = None) -> list:
+        """
+        Renvoie les dernières exécutions (les plus récentes en dernier).
+        """
+        with self.lock:
+            records = list(self.records)
+        return records[-limit:] if limit else records
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {key: dict(stats, buckets=list(stats["buckets"])) for key, stats in self.statistics.items()}
+
+    def reset(self):
+        with self.lock:
+            self.records.clear()
+            self.statistics.clear()
+
+    def report(self, limit: int = 30) -> str:
+        """
+        Histogramme texte des requêtes, triées par temps total décroissant.
+        """
+        snapshot = sorted(self.snapshot().items(), key=lambda item: item[1]["total_ms"], reverse=True)
+        labels = [f"≤{bound}ms" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}ms"]
+        lines = [
+            f"Requêtes distinctes : {len(snapshot)} — seuil lent : {self.slow_threshold_ms:.0f} ms",
+            "Total ms | Appels | Moy. ms | Max ms | Lignes | " + " ".join(labels)
+        ]
+        for key, stats in snapshot[:limit]:
+            average = stats["total_ms"] / stats["count"]
+            buckets = " ".join(f"{count:>{len(label)}}" for count, label in zip(stats["buckets"], labels))
+            lines.append(f"{stats['total_ms']:8.1f} | {stats['count']:6} | {average:7.2f} | {stats['max_ms']:6.1f} | "
+                         f"{stats['rows']:6} | {buckets}")
+            lines.append(f"    {key[:200]}")
+        return "\n".join(lines)
+
+    def dump(self, filename: str) -> bool:
+        """
+        Écrit le rapport agrégé suivi des dernières exécutions dans un fichier texte.
+        """
+        try:
+            with open(filename, "w", encoding="utf-8") as file:
+                file.write(self.report(limit=len(self.statistics)))
+                file.write("\n\nDernières exécutions :\n")
+                for timestamp, key, param_count, rows, elapsed_ms, thread_name in self.recent():
+                    moment = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+                    file.write(f"{moment}\t{elapsed_ms:.2f} ms\t{rows} lignes\t{param_count} param.\t{thread_name}\t{key}\n")
+            return True
+        except OSError as e:
+            print(f"Erreur lors de l'écriture du rapport SQL : {e}")
+            return False
+
+
+class MainThreadSQLError(BaseException):
+    """
+    Levée en mode strict lorsqu'une requête est exécutée sur le thread de l'interface.
+    Signal de mise au point : dérivée de BaseException pour traverser les
+    `except Exception` de ReactifsDatabase au lieu de devenir un résultat vide.
+    """
+
+
+class MainThreadGuard:
+    """
+    Détecte les requêtes SQLite exécutées sur le thread de l'interface graphique.
+
+    `is_gui_thread` est fourni par database.py (ce module ne dépend pas de Qt).
+    Modes : "off" (aucun contrôle), "warn" (comptage et avertissement à la première
+    occurrence de chaque emplacement) ou "strict" (MainThreadSQLError).
+    """
+    MODES = ("off", "warn", "strict")
+    IGNORED_FILES = ("sql_trace.py", "database.py")
+
+    def __init__(self, mode: str = "warn"):
+        self.mode = mode if mode in self.MODES else "warn"
+        self.is_gui_thread = lambda: False
+        self.callers = {}  # emplacement -> [appels, temps total (ms), exemple de requête]
+        self.lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def allowed(self):
+        """
+        Autorise ponctuellement des requêtes sur le thread principal (création du schéma au démarrage).
+        """
+        self._local.depth = getattr(self._local, "depth", 0) + 1
+        try:
+            yield
+        finally:
+            self._local.depth -= 1
+
+    @staticmethod
+    def caller_location() -> str:
+        frame = sys._getframe(1)
+        while frame is not None and os.path.basename(frame.f_code.co_filename) in MainThreadGuard.IGNORED_FILES:
+            frame = frame.f_back
+        if frame is None:
+            return "(inconnu)"
+        return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+
+    def check(self, sql: str) -> str | None:
+        """
+        Renvoie l'emplacement appelant si la requête s'exécute sur le thread principal, sinon None.
+        """
+        if self.mode == "off" or getattr(self._local, "depth", 0) or not self.is_gui_thread():
+            return None
+        location = self.caller_location()
+        if self.mode == "strict":
+            raise MainThreadSQLError(f"Requête SQL sur le thread principal ({location}) : {fingerprint(sql)[:120]}")
+        with self.lock:
+            first_time = location not in self.callers
+            if first_time:
+                self.callers[location] = [0, 0.0, fingerprint(sql)]
+        if first_time:
+            print(f"⚠️ Requête SQL sur le thread principal ({location}) : {fingerprint(sql)[:120]}")
+        return location
+
+    def record(self, location: str, elapsed: float):
+        with self.lock:
+            caller = self.callers.setdefault(location, [0, 0.0, ""])
+            caller[0] += 1
+            caller[1] += elapsed * 1000
+
+    def total_ms(self) -> float:
+        with self.lock:
+            return sum(caller[1] for caller in self.callers.values())
+
+    def reset(self):
+        with self.lock:
+            self.callers.clear()
+
+    def report(self) -> str:
+        with self.lock:
+            callers = sorted(self.callers.items(), key=lambda item: item[1][1], reverse=True)
+        lines = [
+            f"Mode : {self.mode} — temps SQL total sur le thread principal : "
+            f"{sum(caller[1] for _, caller in callers):.1f} ms",
+            "Total ms | Appels | Emplacement",
+        ]
+        for location, (count, total_ms, example) in callers:
+            lines.append(f"{total_ms:8.1f} | {count:6} | {location}")
+            lines.append(f"    {example[:200]}")
+        return "\n".join(lines)
+
+    def dump(self, filename: str) -> bool:
+        try:
+            with open(filename, "w", encoding="utf-8") as file:
+                file.write(self.report())
+            return True
+        except OSError as e:
+            print(f"Erreur lors de l'écriture du rapport : {e}")
+            return False
+
+
+class TracedCursor:
+    """
+    Enveloppe d'un sqlite3.Cursor qui mesure chaque requête.
+
+    Avec SQLite, une grande partie du travail d'un SELECT a lieu pendant la lecture des
+    lignes : la mesure d'une requête inclut donc ses fetch* et n'est enregistrée qu'une
+    fois les lignes lues (ou à la requête suivante).
+    """
+    def __init__(self, cursor, tracer: SQLTracer = None, guard: MainThreadGuard = None):
+        self._cursor = cursor
+        self._tracer = tracer or TRACER
+        self._guard = guard or GUARD
+        self._pending = None  # [sql, nb paramètres, lignes, secondes, emplacement sur le thread principal]
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def _record(self, sql, param_count, rows, elapsed, location):
+        self._tracer.record(sql, param_count, rows, elapsed)
+        if location is not None:
+            self._guard.record(location, elapsed)
+
+    def _flush(self):
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            self._record(*pending)
+
+    def _run(self, method, sql, params, param_count):
+        self._flush()
+        location = self._guard.check(sql)
+        start = time.perf_counter()
+        try:
+            method(sql, params) if params is not None else method(sql)
+        except Exception:
+            self._record(sql, param_count, 0, time.perf_counter() - start, location)
+            raise
+        elapsed = time.perf_counter() - start
+        if self._cursor.description is None:
+            self._record(sql, param_count, max(self._cursor.rowcount, 0), elapsed, location)
+        else:
+            self._pending = [sql, param_count, 0, elapsed, location]
+        return self
+
+    def execute(self, sql, params=None):
+        return self._run(self._cursor.execute, sql, params, count_parameters(params))
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = seq_of_params if isinstance(seq_of_params, (list, tuple)) else list(seq_of_params)
+        param_count = sum(count_parameters(params) for params in seq_of_params)
+        return self._run(self._cursor.executemany, sql, seq_of_params, param_count)
+
+    def executescript(self, script):
+        return self._run(self._cursor.executescript, script, None, 0)
+
+    def _fetch(self, method, *args):
+        start = time.perf_counter()
+        result = method(*args)
+        if self._pending is not None:
+            self._pending[3] += time.perf_counter() - start
+        return result
+
+    def fetchone(self):
+        row = self._fetch(self._cursor.fetchone)
+        if self._pending is not None:
+            if row is None:
+                self._flush()
+            else:
+                self._pending[2] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._fetch(self._cursor.fetchmany, size if size is not None else self._cursor.arraysize)
+        if self._pending is not None:
+            self._pending[2] += len(rows)
+            if not rows:
+                self._flush()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(self._cursor.fetchall)
+        if self._pending is not None:
+            self._pending[2] += len(rows)
+            self._flush()
+        return rows
+
+    def close(self):
+        self._flush()
+        self._cursor.close()
+
+
+TRACER = SQLTracer(
+    capacity=int(os.environ.get("CMA_SQL_TRACE_SIZE", 5000)),
+    slow_threshold_ms=float(os.environ.get("CMA_SLOW_QUERY_MS", 100))
+)
+
+GUARD = MainThreadGuard(os.environ.get("CMA_SQL_GUARD", "warn"))
@@ -0,0 +1,174 @@
+# stall_watchdog.py
+"""
+Surveillance des blocages du thread principal (interface graphique).
+
+Un QTimer du thread principal note l'heure de chaque tick. Un thread de surveillance
+vérifie régulièrement ce battement : si un tick a plus de `threshold_ms` de retard,
+la pile du thread principal est échantillonnée avec sys._current_frames() jusqu'à la
+fin du blocage. Les échantillons sont agrégés par fonction de l'application, ce qui
+permet d'attribuer les blocages aux gestionnaires responsables.
+
+Réglages (variables d'environnement) :
+    CMA_STALL_MS       retard (ms) au-delà duquel un blocage est enregistré (défaut 200)
+    CMA_WATCHDOG       mettre à 0 pour désactiver la surveillance
+"""
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+
+from PySide6.QtCore import QObject, QTimer
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def project_frames(frame) -> list:
+    """
+    Extrait la pile d'un frame (de l'appelant le plus externe au plus interne),
+    limitée aux fichiers de l'application.
+    """
+    frames = []
+    for summary in traceback.extract_stack(frame):
+        if not summary.filename.startswith("<") and os.path.abspath(summary.filename).startswith(PROJECT_DIR):
+            frames.append((os.path.basename(summary.filename), summary.name, summary.lineno))
+    return frames
+
+
+class StallWatchdog(QObject):
+    """
+    Détecte les blocages de la boucle d'événements et échantillonne la pile du thread principal.
+    """
+    def __init__(self, threshold_ms: float = 200, tick_ms: int = 50, sample_ms: float = 10,
+                 max_stalls: int = 200, parent=None):
+        super().__init__(parent)
+        self.threshold = threshold_ms / 1000
+        self.tick = tick_ms / 1000
+        self.sample_interval = sample_ms / 1000
+        self.main_ident = threading.main_thread().ident
+        self.lock = threading.Lock()
+
+        self.last_tick = time.monotonic()
+        self.stalls = deque(maxlen=max_stalls)  # (début, durée en s, pile dominante)
+        self.handler_samples = Counter()  # gestionnaire (premier frame de l'application) -> échantillons
+        self.function_samples = Counter()  # fonction la plus interne de l'application -> échantillons
+        self.total_samples = 0
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(tick_ms)
+        self.timer.timeout.connect(self.on_tick)
+
+        self._stop = threading.Event()
+        self._monitor = None
+
+    def on_tick(self):
+        self.last_tick = time.monotonic()
+
+    def start(self):
+        if self._monitor and self._monitor.is_alive():
+            return
+        self.last_tick = time.monotonic()
+        self.timer.start()
+        self._stop.clear()
+        self._monitor = threading.Thread(target=self._run, name="StallWatchdog", daemon=True)
+        self._monitor.start()
+
+    def stop(self):
+        self.timer.stop()
+        self._stop.set()
+        if self._monitor:
+            self._monitor.join(timeout=1)
+
+    def _run(self):
+        stall_start = None
+        stall_stacks = Counter()
+        while not self._stop.wait(self.sample_interval):
+            last_tick = self.last_tick
+            lag = time.monotonic() - last_tick - self.tick
+            if lag > self.threshold:
+                if stall_start is None:
+                    stall_start = last_tick + self.tick
+                    stall_stacks = Counter()
+                frame = sys._current_frames().get(self.main_ident)
+                if frame is not None:
+                    self._add_sample(project_frames(frame), stall_stacks)
+                del frame
+            elif stall_start is not None:
+                self._close_stall(stall_start, last_tick - stall_start, stall_stacks)
+                stall_start = None
+
+    def _add_sample(self, frames, stall_stacks):
+        # Le premier frame hors "<module>" est le gestionnaire appelé par la boucle d'événements
+        handlers = [frame for frame in frames if frame[1] != "<module>"]
+        handler = self.format_frame(handlers[0]) if handlers else "(hors application)"
+        innermost = self.format_frame(frames[-1]) if frames else "(hors application)"
+        with self.lock:
+            self.total_samples += 1
+            self.handler_samples[handler] += 1
+            self.function_samples[innermost] += 1
+        stall_stacks[" > ".join(self.format_frame(frame) for frame in handlers) or handler] += 1
+
+    def _close_stall(self, start, duration, stall_stacks):
+        stack = stall_stacks.most_common(1)[0][0] if stall_stacks else "(pile indisponible)"
+        with self.lock:
+            self.stalls.append((time.time() - (time.monotonic() - start), duration, stack))
+
+    @staticmethod
+    def format_frame(frame) -> str:
+        filename, function, lineno = frame
+        return f"{filename}:{function}:{lineno}"
+
+    def reset(self):
+        with self.lock:
+            self.stalls.clear()
+            self.handler_samples.clear()
+            self.function_samples.clear()
+            self.total_samples = 0
+
+    def report(self, limit: int = 20) -> str:
+        """
+        Rapport texte : gestionnaires et fonctions les plus souvent échantillonnés, puis derniers blocages.
+        """
+        with self.lock:
+            stalls = list(self.stalls)
+            handlers = self.handler_samples.most_common(limit)
+            functions = self.function_samples.most_common(limit)
+            total = self.total_samples
+
+        lines = [
+            f"Blocages enregistrés : {len(stalls)} — seuil : {self.threshold * 1000:.0f} ms — "
+            f"échantillons : {total} (toutes les {self.sample_interval * 1000:.0f} ms)",
+            "",
+            "Gestionnaires responsables (temps estimé) :"
+        ]
+        for name, count in handlers:
+            lines.append(f"{count * self.sample_interval * 1000:10.0f} ms  {count / total:6.1%}  {name}")
+        lines += ["", "Fonctions les plus internes :"]
+        for name, count in functions:
+            lines.append(f"{count * self.sample_interval * 1000:10.0f} ms  {count / total:6.1%}  {name}")
+        lines += ["", "Derniers blocages :"]
+        for started, duration, stack in reversed(stalls[-limit:]):
+            moment = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(started))
+            lines.append(f"{moment}  {duration * 1000:8.0f} ms  {stack}")
+        return "\n".join(lines)
+
+    def dump(self, filename: str) -> bool:
+        try:
+            with open(filename, "w", encoding="utf-8") as file:
+                file.write(self.report(limit=self.stalls.maxlen))
+            return True
+        except OSError as e:
+            print(f"Erreur lors de l'écriture du rapport des blocages : {e}")
+            return False
+
+
+def install_watchdog(parent=None) -> StallWatchdog | None:
+    """
+    Démarre la surveillance si elle n'est pas désactivée par CMA_WATCHDOG=0.
+    """
+    if os.environ.get("CMA_WATCHDOG", "1") == "0":
+        return None
+    watchdog = StallWatchdog(threshold_ms=float(os.environ.get("CMA_STALL_MS", 200)), parent=parent)
+    watchdog.start()
+    return watchdog
@@ -0,0 +1,224 @@
+# stock_alerts.py
+"""
+Alertes de rupture de stock prévue, calculées en arrière-plan.
+
+Pour chaque analyte, la date de rupture prévue est :
+    aujourd'hui + stock actuel / consommation moyenne par jour
+(tests pour les analytes comptés en tests, volume restant des lots sinon ; consommation
+moyenne des `window_days` derniers jours de DailyUsage).
+
+Les analytes sont rangés dans un tas (heapq) par date de la prochaine alerte : une alerte
+est due quand la rupture est à moins de 30, 14, 7 puis 0 jours (ALERT_THRESHOLDS). Le
+service ne se réveille qu'à la date de la prochaine alerte (QTimer à usage unique) au lieu
+de tout recalculer périodiquement ; quand des lots ou des tests changent, les onglets le
+signalent (STOCK_EVENTS) et seuls les analytes concernés sont recalculés.
+
+    STOCK_EVENTS.stock_changed.emit(["TSH"])  # Après l'ajout d'un lot de TSH
+"""
+import heapq
+import math
+from datetime import date, datetime, timedelta
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+from database import EPOCH_ORDINAL, get_database_service
+from logic_calc import UNIT_REGISTRY, DIM_COUNT
+
+# Seuils d'alerte (jours avant la rupture prévue), du moins au plus grave
+ALERT_THRESHOLDS = (30, 14, 7, 0)
+ALERT_LEVELS = {30: "Information", 14: "Attention", 7: "Critique", 0: "Rupture"}
+
+# Intervalle maximal d'un QTimer (environ 24 jours) : au-delà, le service se réveille pour reprogrammer
+MAX_TIMER_MS = 2 ** 31 - 1
+
+
+def today_day() -> int:
+    return date.today().toordinal() - EPOCH_ORDINAL
+
+
+def day_to_date(day: int) -> str:
+    return date.fromordinal(day + EPOCH_ORDINAL).isoformat()
+
+
+def projected_stockout(stock: float, daily_rate: float, today: int) -> int | None:
+    """
+    Jour de rupture prévu (numéro de jour), ou None sans consommation récente.
+    """
+    if daily_rate <= 0:
+        return None
+    return today + math.floor(max(stock, 0.0) / daily_rate)
+
+
+def fetch_stock_status(database, analyte_names=None, window_days: int = 90) -> list:
+    """
+    État du stock de tous les analytes (ou de ceux nommés), pour StockoutIndex.update.
+    :return: liste de dictionnaires 'analyte_id', 'nom_analyte', 'unite', 'stock', 'daily_rate'
+    """
+    analyte_ids = None
+    if analyte_names is not None:
+        analyte_ids = [analyte_id for analyte_id in map(database.get_analyte_id, analyte_names) if analyte_id]
+    status = []
+    for analyte_id, name, unit, stock_volume, stock_tests, volume_rate, tests_rate in \
+            database.get_stock_status(window_days, analyte_ids=analyte_ids):
+        counted = UNIT_REGISTRY.dimension(unit) == DIM_COUNT
+        status.append({
+            'analyte_id': analyte_id,
+            'nom_analyte': name,
+            'unite': "test" if counted else unit,
+            'stock': stock_tests if counted else stock_volume,
+            'daily_rate': tests_rate if counted else volume_rate
+        })
+    return status
+
+
+class StockoutIndex:
+    """
+    Tas des analytes ordonné par date de la prochaine alerte.
+    Une mise à jour ajoute une nouvelle entrée ; les anciennes sont ignorées à la lecture
+    (numéro de version), ce qui évite de réorganiser le tas.
+    """
+    def __init__(self, thresholds=ALERT_THRESHOLDS):
+        self.thresholds = sorted(thresholds, reverse=True)
+        self.heap = []  # (jour de la prochaine alerte, jour de rupture, analyte_id, version)
+        self.entries = {}  # analyte_id -> état (dont 'stockout_day', 'alerted', 'version')
+        self.version = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def update(self, status: dict, today: int):
+        """
+        Met à jour un analyte (dictionnaire de fetch_stock_status).
+        Les seuils déjà signalés et toujours franchis ne sont pas signalés à nouveau.
+        """
+        analyte_id = status['analyte_id']
+        previous = self.entries.get(analyte_id, {})
+        stockout_day = projected_stockout(status['stock'], status['daily_rate'], today)
+        alerted = math.inf
+        if stockout_day is not None:
+            crossed = [threshold for threshold in self.thresholds if stockout_day - today <= threshold]
+            if crossed and previous.get('alerted', math.inf) < math.inf:
+                alerted = max(previous['alerted'], min(crossed))
+
+        self.version += 1
+        entry = dict(status, stockout_day=stockout_day, alerted=alerted, version=self.version)
+        self.entries[analyte_id] = entry
+        self.push(entry)
+
+    def push(self, entry: dict):
+        due = self.next_alert_day(entry)
+        if due is not None:
+            heapq.heappush(self.heap, (due, entry['stockout_day'], entry['analyte_id'], entry['version']))
+
+    def next_alert_day(self, entry: dict) -> int | None:
+        if entry['stockout_day'] is None:
+            return None
+        pending = [threshold for threshold in self.thresholds if threshold < entry['alerted']]
+        return entry['stockout_day'] - pending[0] if pending else None
+
+    def is_current(self, item) -> bool:
+        entry = self.entries.get(item[2])
+        return entry is not None and entry['version'] == item[3]
+
+    def next_due(self) -> int | None:
+        """
+        Jour de la prochaine alerte (None si aucune n'est prévue).
+        """
+        while self.heap and not self.is_current(self.heap[0]):
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, today: int) -> list:
+        """
+        Retire les alertes dues au plus tard aujourd'hui et renvoie une alerte par analyte
+        (le seuil le plus grave franchi), triées par date de rupture.
+        """
+        alerts = []
+        while self.next_due() is not None and self.heap[0][0] <= today:
+            _due, stockout_day, analyte_id, _version = heapq.heappop(self.heap)
+            entry = self.entries[analyte_id]
+            days_left = stockout_day - today
+            crossed = [threshold for threshold in self.thresholds
+                       if days_left <= threshold < entry['alerted']]
+            entry['alerted'] = min(crossed)
+            alerts.append(dict(entry, days_left=days_left, level=ALERT_LEVELS.get(entry['alerted'], "")))
+            self.push(entry)  # Seuil suivant
+        return sorted(alerts, key=lambda alert: alert['stockout_day'])
+
+    def upcoming(self, days: int, today: int) -> list:
+        """
+        Analytes dont la rupture est prévue dans les `days` prochains jours, par date de rupture.
+        """
+        return sorted(
+            (entry for entry in self.entries.values()
+             if entry['stockout_day'] is not None and entry['stockout_day'] - today <= days),
+            key=lambda entry: entry['stockout_day']
+        )
+
+
+class StockEvents(QObject):
+    """
+    Signaux partagés entre les onglets et le service d'alertes.
+    stock_changed : noms des analytes modifiés (None = tous).
+    """
+    stock_changed = Signal(object)
+
+
+STOCK_EVENTS = StockEvents()
+
+
+class StockAlertService(QObject):
+    """
+    Tient l'index des ruptures à jour en arrière-plan et émet `alert_raised` quand un seuil est dû.
+    """
+    alert_raised = Signal(dict)
+    index_changed = Signal()
+
+    def __init__(self, db_path: str = "reactifs_database.db", window_days: int = 90, parent=None):
+        super().__init__(parent)
+        self.db_service = get_database_service(db_path)
+        self.window_days = window_days
+        self.index = StockoutIndex()
+        self.today = today_day
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.check_due)
+        STOCK_EVENTS.stock_changed.connect(self.refresh)
+
+    def start(self):
+        self.refresh()
+
+    def refresh(self, analyte_names=None):
+        """
+        Recalcule les analytes nommés (tous par défaut) dans le thread du service de base de données.
+        """
+        self.db_service.submit(fetch_stock_status, analyte_names, self.window_days,
+                               callback=self.on_status_loaded,
+                               error_callback=lambda e: print(f"Erreur lors du calcul des ruptures : {e}"))
+
+    def on_status_loaded(self, status):
+        today = self.today()
+        for entry in status:
+            self.index.update(entry, today)
+        self.index_changed.emit()
+        self.check_due()
+
+    def check_due(self):
+        for alert in self.index.pop_due(self.today()):
+            self.alert_raised.emit(alert)
+        self.schedule()
+
+    def schedule(self):
+        """
+        Programme le prochain réveil à minuit du jour de la prochaine alerte.
+        """
+        self.timer.stop()
+        due = self.index.next_due()
+        if due is None:
+            return
+        wake = datetime.combine(date.fromordinal(due + EPOCH_ORDINAL), datetime.min.time())
+        delay = (wake - datetime.now()) / timedelta(milliseconds=1)
+        self.timer.start(int(min(max(delay, 0), MAX_TIMER_MS)))
+
+    def upcoming(self, days: int = 30) -> list:
+        return self.index.upcoming(days, self.today())
@@ -0,0 +1,214 @@
+# sweep_dialog.py
+"""
+Balayage des paramètres du formulaire "Gestion des Réactifs".
+
+Au lieu de recalculer le formulaire pour chaque combinaison, les plages choisies
+(nombre de tests, pourcentages de pertes et de confirmation, délai de livraison) forment
+une grille cartésienne évaluée en une fois par logic_calc.qac_sweep. Le résultat est
+présenté en tableau de sensibilité (effet de chaque paramètre seul) et en carte de
+chaleur des deux premiers paramètres choisis. Le calcul s'exécute dans le pool partagé
+des calculs en lot (calc_pool.py).
+"""
+import time
+
+import numpy as np
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QColor
+from PySide6.QtWidgets import (
+    QCheckBox, QComboBox, QDialog, QDoubleSpinBox, QGridLayout, QGroupBox, QHBoxLayout,
+    QHeaderView, QLabel, QPushButton, QTableWidget, QTableWidgetItem, QVBoxLayout, QMessageBox
+)
+
+from calc_pool import get_calculation_pool
+from logic_calc import SWEEP_OUTPUTS, SWEEP_PARAMETERS, qac_sweep, sweep_heatmap, sweep_sensitivity, sweep_values
+
+# Nombre maximal de lignes/colonnes affichées dans la carte de chaleur (valeurs réparties sur la plage)
+HEATMAP_MAX_AXIS = 100
+
+SENSITIVITY_HEADERS = ["Paramètre", "De", "À", "Sortie min.", "Sortie max.", "Écart"]
+
+
+def default_range(key, value):
+    """
+    Plage proposée pour un paramètre autour de sa valeur dans le formulaire : (début, fin, pas).
+    """
+    if key == 'nbr_tests':
+        stop = round(value * 1.5) if value > 0 else 100
+        start = round(value * 0.5) if value > 0 else 0
+        return start, stop, max(round((stop - start) / 20), 1)
+    if key == 'livraison':
+        return 1, max(30, round(value * 2)), 1
+    return 0, max(20, round(value * 2)), 1
+
+
+def run_sweep(base, ranges, output):
+    """
+    Grille, sensibilité et carte de chaleur d'un balayage (exécutée dans le pool de calcul).
+    """
+    started = time.perf_counter()
+    result = qac_sweep(base, ranges)
+    result['sensitivity'] = sweep_sensitivity(base, ranges, output)
+    result['heatmap'] = sweep_heatmap(result, output)
+    result['elapsed'] = time.perf_counter() - started
+    result['output'] = output
+    return result
+
+
+class SweepDialog(QDialog):
+    """
+    Boîte de dialogue du balayage : plages des paramètres, tableau de sensibilité et carte de chaleur.
+    """
+    def __init__(self, base, unit, packaging, parent=None):
+        super().__init__(parent)
+        self.base = base
+        self.unit = unit
+        self.packaging = packaging
+        self.pending = None
+        self.setWindowTitle("Balayage des paramètres")
+        self.resize(1000, 750)
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+
+        # === Plages des paramètres ===
+        params_box = QGroupBox("Paramètres à faire varier")
+        grid = QGridLayout(params_box)
+        for col, title in enumerate(["", "Valeur actuelle", "De", "À", "Pas"]):
+            grid.addWidget(QLabel(title), 0, col)
+
+        self.range_widgets = {}
+        for row, (key, label) in enumerate(SWEEP_PARAMETERS.items(), start=1):
+            check = QCheckBox(label)
+            check.setChecked(key in ('nbr_tests', 'livraison'))
+            grid.addWidget(check, row, 0)
+            grid.addWidget(QLabel(f"{self.base[key]:g}"), row, 1)
+            spins = []
+            for col, value in enumerate(default_range(key, self.base[key]), start=2):
+                spin = QDoubleSpinBox()
+                spin.setRange(0, 1e6)
+                spin.setDecimals(0 if key == 'nbr_tests' else 1)
+                spin.setValue(value)
+                grid.addWidget(spin, row, col)
+                spins.append(spin)
+            self.range_widgets[key] = (check, *spins)
+        layout.addWidget(params_box)
+
+        # === Sortie et lancement ===
+        action_layout = QHBoxLayout()
+        action_layout.addWidget(QLabel("Résultat :"))
+        self.output_combo = QComboBox()
+        for key, label in SWEEP_OUTPUTS.items():
+            self.output_combo.addItem(label, key)
+        action_layout.addWidget(self.output_combo)
+        self.status_label = QLabel("")
+        action_layout.addWidget(self.status_label, stretch=1)
+        self.btn_calculate = QPushButton("Calculer")
+        self.btn_calculate.clicked.connect(self.calculate)
+        action_layout.addWidget(self.btn_calculate)
+        layout.addLayout(action_layout)
+
+        # === Résultats ===
+        self.sensitivity_table = QTableWidget(0, len(SENSITIVITY_HEADERS))
+        self.sensitivity_table.setHorizontalHeaderLabels(SENSITIVITY_HEADERS)
+        self.sensitivity_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.sensitivity_table.verticalHeader().setVisible(False)
+        self.sensitivity_table.setMaximumHeight(160)
+        layout.addWidget(QLabel("Sensibilité (chaque paramètre seul, les autres à leur valeur actuelle)"))
+        layout.addWidget(self.sensitivity_table)
+
+        self.heatmap_label = QLabel("Carte de chaleur")
+        layout.addWidget(self.heatmap_label)
+        self.heatmap_table = QTableWidget()
+        self.heatmap_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.heatmap_table, stretch=1)
+
+    def selected_ranges(self):
+        ranges = {}
+        for key, (check, start, stop, step) in self.range_widgets.items():
+            if check.isChecked():
+                ranges[key] = sweep_values(start.value(), stop.value(), step.value())
+        return ranges
+
+    def calculate(self):
+        if self.pending is not None and not self.pending.done():
+            return
+        ranges = self.selected_ranges()
+        if not ranges:
+            QMessageBox.warning(self, "Balayage", "Choisissez au moins un paramètre à faire varier.")
+            return
+        self.btn_calculate.setEnabled(False)
+        self.pending = get_calculation_pool().submit(
+            run_sweep, self.base, ranges, self.output_combo.currentData(),
+            callback=self.display_results, error_callback=self.on_error
+        )
+
+    def on_error(self, message):
+        self.btn_calculate.setEnabled(True)
+        QMessageBox.critical(self, "Erreur", f"Impossible de calculer le balayage : {message}")
+
+    def output_text(self, output, value):
+        if output == 'qac':
+            return f"{value:.0f} {self.packaging}"
+        return f"{value:.2f} {self.unit}"
+
+    def display_results(self, result):
+        self.btn_calculate.setEnabled(True)
+        output = result['output']
+        scenarios = int(np.prod([len(values) for _, values in result['axes']]))
+        self.status_label.setText(f"{scenarios} scénarios calculés en {result['elapsed'] * 1000:.0f} ms")
+
+        self.sensitivity_table.setRowCount(len(result['sensitivity']))
+        for row, (key, first, last, low, high) in enumerate(result['sensitivity']):
+            values = [SWEEP_PARAMETERS[key], f"{first:g}", f"{last:g}",
+                      self.output_text(output, low), self.output_text(output, high),
+                      self.output_text(output, high - low)]
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                item.setTextAlignment(Qt.AlignCenter)
+                self.sensitivity_table.setItem(row, col, item)
+
+        self.display_heatmap(result)
+
+    def display_heatmap(self, result):
+        axes = result['axes']
+        output = result['output']
+        heatmap = result['heatmap']
+        row_key, row_values = axes[0]
+        col_key, col_values = axes[1] if len(axes) > 1 else (None, None)
+
+        # Répartir les lignes/colonnes affichées sur toute la plage
+        rows = np.unique(np.linspace(0, len(row_values) - 1, HEATMAP_MAX_AXIS).round().astype(int))
+        cols = np.unique(np.linspace(0, heatmap.shape[1] - 1, HEATMAP_MAX_AXIS).round().astype(int))
+        heatmap = heatmap[np.ix_(rows, cols)]
+
+        title = f"{SWEEP_OUTPUTS[output]} : {SWEEP_PARAMETERS[row_key]} (lignes)"
+        if col_key:
+            title += f" × {SWEEP_PARAMETERS[col_key]} (colonnes)"
+        if len(axes) > 2:
+            title += " — maximum sur les autres paramètres"
+        self.heatmap_label.setText(title)
+
+        self.heatmap_table.setUpdatesEnabled(False)
+        self.heatmap_table.clear()
+        self.heatmap_table.setRowCount(len(rows))
+        self.heatmap_table.setColumnCount(len(cols))
+        self.heatmap_table.setVerticalHeaderLabels([f"{row_values[i]:g}" for i in rows])
+        self.heatmap_table.setHorizontalHeaderLabels(
+            [f"{col_values[i]:g}" for i in cols] if col_key else [SWEEP_OUTPUTS[output]]
+        )
+
+        finite = heatmap[np.isfinite(heatmap)]
+        low, high = (finite.min(), finite.max()) if finite.size else (0.0, 0.0)
+        span = (high - low) or 1.0
+        decimals = 0 if output == 'qac' else 2
+        for row in range(heatmap.shape[0]):
+            for col in range(heatmap.shape[1]):
+                value = heatmap[row, col]
+                item = QTableWidgetItem(f"{value:.{decimals}f}")
+                item.setTextAlignment(Qt.AlignCenter)
+                if np.isfinite(value):
+                    # Du vert (valeur la plus basse) au rouge (valeur la plus haute)
+                    item.setBackground(QColor.fromHsv(int(120 * (1 - (value - low) / span)), 140, 255))
+                self.heatmap_table.setItem(row, col, item)
+        self.heatmap_table.setUpdatesEnabled(True)
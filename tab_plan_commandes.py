@@ -0,0 +1,197 @@
+from PySide6.QtWidgets import (
+    QTableWidget, QTableWidgetItem, QGroupBox, QHBoxLayout,
+    QLabel, QVBoxLayout, QPushButton, QWidget,
+    QMessageBox, QHeaderView, QSpinBox, QSpacerItem, QSizePolicy
+)
+from PySide6.QtCore import Qt, QThread, Signal
+
+from database import ReactifsDatabase
+from export_dialogs import export_data
+from fefo import FefoAllocator, WASTE_HEADERS, waste_to_rows
+from planning import OrderPlanner, PLAN_HEADERS, plan_to_rows
+
+
+class OrderPlanThread(QThread):
+    """
+    Thread pour calculer (et éventuellement enregistrer) le plan de commande en arrière-plan.
+    """
+    finished = Signal(bool, object)
+
+    def __init__(self, horizon_days, lead_time_days, save=False, db_path="reactifs_database.db"):
+        super().__init__()
+        self.horizon_days = horizon_days
+        self.lead_time_days = lead_time_days
+        self.save = save
+        self.db_path = db_path
+
+    def run(self):
+        database = None
+        try:
+            database = ReactifsDatabase(self.db_path)  # Connexion propre au thread
+            planner = OrderPlanner(database)
+            plan = planner.build_plan(self.horizon_days, self.lead_time_days)
+            if self.save and not planner.save_plan(plan):
+                raise Exception("Impossible d'enregistrer le plan de commande.")
+            self.finished.emit(True, plan)
+        except Exception as e:
+            self.finished.emit(False, str(e))
+        finally:
+            if database:
+                database.close()
+
+
+class WasteReportThread(QThread):
+    """
+    Thread pour projeter la consommation FEFO des lots ouverts et leurs pertes prévues.
+    """
+    finished = Signal(bool, object)
+
+    def __init__(self, db_path="reactifs_database.db"):
+        super().__init__()
+        self.db_path = db_path
+
+    def run(self):
+        database = None
+        try:
+            database = ReactifsDatabase(self.db_path)
+            self.finished.emit(True, FefoAllocator(database).project())
+        except Exception as e:
+            self.finished.emit(False, str(e))
+        finally:
+            if database:
+                database.close()
+
+
+class TabPlanCommandes(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.plan = []
+        self.export_thread = None
+        self.thread = None
+        self.waste_thread = None
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+
+        # === GroupBox pour les paramètres du plan ===
+        params_box = QGroupBox("Paramètres du Plan de Commande")
+        params_layout = QHBoxLayout()
+
+        self.spin_horizon = QSpinBox()
+        self.spin_horizon.setRange(1, 365)
+        self.spin_horizon.setValue(30)
+        self.spin_horizon.setSuffix(" jours")
+
+        self.spin_livraison = QSpinBox()
+        self.spin_livraison.setRange(0, 180)
+        self.spin_livraison.setValue(7)
+        self.spin_livraison.setSuffix(" jours")
+
+        self.btn_calculate = QPushButton("Calculer le plan")
+        self.btn_calculate.clicked.connect(self.calculate_plan)
+
+        params_layout.addWidget(QLabel("Couverture :"))
+        params_layout.addWidget(self.spin_horizon)
+        params_layout.addWidget(QLabel("D.Livraison :"))
+        params_layout.addWidget(self.spin_livraison)
+        params_layout.addWidget(self.btn_calculate)
+        params_box.setLayout(params_layout)
+        layout.addWidget(params_box)
+
+        # Table pour afficher le plan
+        self.table = self.create_table()
+        layout.addWidget(self.table)
+
+        # Boutons d'action avec spacer
+        btn_layout = QHBoxLayout()
+        spacer = QSpacerItem(10, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
+        btn_layout.addSpacerItem(spacer)
+        btn_layout.addStretch(2)
+
+        actions = [
+            ("Enregistrer le plan", self.save_plan),
+            ("Export PDF", self.export_pdf),
+            ("Export Excel", self.export_excel),
+            ("Pertes prévues", self.export_waste)
+        ]
+        for btn_text, slot in actions:
+            btn = QPushButton(btn_text)
+            btn.clicked.connect(slot)
+            btn_layout.addWidget(btn, stretch=1)
+
+        layout.addLayout(btn_layout)
+
+    def create_table(self):
+        table = QTableWidget()
+        table.setColumnCount(len(PLAN_HEADERS))
+        header = table.horizontalHeader()
+        header.setFixedHeight(50)
+        table.verticalHeader().setDefaultSectionSize(45)
+        table.setHorizontalHeaderLabels(PLAN_HEADERS)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        table.verticalHeader().setVisible(False)
+        table.setAlternatingRowColors(True)
+        return table
+
+    def start_plan_thread(self, save):
+        if self.thread and self.thread.isRunning():
+            QMessageBox.warning(self, "Calcul en cours", "Un calcul du plan est déjà en cours.")
+            return
+        self.btn_calculate.setEnabled(False)
+        self.thread = OrderPlanThread(self.spin_horizon.value(), self.spin_livraison.value(), save=save)
+        self.thread.finished.connect(lambda success, result: self.on_plan_finished(success, result, save))
+        self.thread.start()
+
+    def calculate_plan(self):
+        self.start_plan_thread(save=False)
+
+    def save_plan(self):
+        self.start_plan_thread(save=True)
+
+    def on_plan_finished(self, success, result, saved):
+        self.btn_calculate.setEnabled(True)
+        if not success:
+            QMessageBox.critical(self, "Erreur", f"Impossible de calculer le plan de commande : {result}")
+            return
+
+        self.plan = result
+        self.table.setUpdatesEnabled(False)
+        self.table.clearContents()
+        self.table.setRowCount(len(self.plan))
+        for row, values in enumerate(plan_to_rows(self.plan)):
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                item.setTextAlignment(Qt.AlignCenter)
+                self.table.setItem(row, col, item)
+        self.table.setUpdatesEnabled(True)
+
+        if saved:
+            QMessageBox.information(self, "Succès", "Le plan de commande a été enregistré avec succès.")
+
+    def export_pdf(self):
+        export_data(self, "pdf", PLAN_HEADERS, plan_to_rows(self.plan))
+
+    def export_excel(self):
+        export_data(self, "excel", PLAN_HEADERS, plan_to_rows(self.plan))
+
+    def export_waste(self):
+        if self.waste_thread and self.waste_thread.isRunning():
+            QMessageBox.warning(self, "Calcul en cours", "Le calcul des pertes prévues est déjà en cours.")
+            return
+        self.waste_thread = WasteReportThread()
+        self.waste_thread.finished.connect(self.on_waste_finished)
+        self.waste_thread.start()
+
+    def on_waste_finished(self, success, result):
+        if not success:
+            QMessageBox.critical(self, "Erreur", f"Impossible de calculer les pertes prévues : {result}")
+            return
+        export_data(self, "excel", WASTE_HEADERS, waste_to_rows(result))
+
+    def on_export_finished(self, success, message):
+        if success:
+            QMessageBox.information(self, "Exportation réussie", message)
+        else:
+            QMessageBox.critical(self, "Erreur", message)
+        self.export_thread = None
@@ -4,13 +4,19 @@ from PySide6.QtCore import QCoreApplication, QThread, Signal
 from PySide6.QtGui import QDoubleValidator
 from PySide6.QtWidgets import (
 QRadioButton, QDialog, QComboBox, QGroupBox, QHBoxLayout, QLabel, QLineEdit, 
- QPushButton, QSpinBox, QVBoxLayout, QWidget, QSizePolicy, QSpacerItem, QMessageBox, QScrollArea
+ QPushButton, QSpinBox, QVBoxLayout, QWidget, QSizePolicy, QSpacerItem, QMessageBox, QScrollArea, QInputDialog
 )
-from logic_calc import ConsumptionCalculator, VOLUME_UNITS, MASS_UNITS, COUNT_UNITS
-from database import ReactifsDatabase, DatabaseWorkerThread
-import math
+import calc_core
+from control_schedule import CONTROL_KINDS, analyte_schedule
+from logic_calc import ConsumptionCalculator, UNIT_REGISTRY, normalize_fields
+from periods import CALENDAR, period_unit
+from database import ReactifsDatabase, DatabaseWorkerThread, get_database_service
+from query_scheduler import QueryScheduler
 import re
 from report_generator import generate_explanation_report
+from scenarios import fetch_scenarios, recompute_scenarios, store_scenario
+from stock_alerts import STOCK_EVENTS
+from sweep_dialog import SweepDialog
 
 # Listes des unités
 UNITS = [
@@ -25,7 +31,58 @@ UNITS_CAL_CONT_CONFIRM = [
 TIME_UNITS = [
     "Jours", "Semaine", "Mois"
 ]
-VOLUME_UNITS = ["µl", "ml", "l", "pl"]  # Unités de volume compatibles
+# Champs du formulaire (rapport explicatif et scénarios) : clé -> nom du widget
+FORM_FIELDS = {
+    'nbr_tests': "lineEdit_nbrs_test_firstRow",
+    'qty_per_test': "lineEdit_qte_par_unite_de_test_firstRow",
+    'time_value': "number_time_spinBox_firstRow",
+    'time_unit': "comboBox_periode_temps_firstRow",
+    'unit': "comboBox_unite_physique_firstRow",
+    'consumption_unit': "comboBox_unite_consommation_par_unite_de_temps",
+    'qty_per_unit': "lineEdit_qte_par_unite_secondRow",
+    'total_qty': "lineEdit_qte_totale_par_conditionnment_secondRow",
+    'dead_volume': "lineEdit_qte_volume_mor_secondRow",
+    'unit_qty': "comboBox_qte_par_unite_secondRow",
+    'unit_total': "comboBox_unite_qte_totale_par_conditionnement",
+    'unit_dead': "comboBox_unite_volume_mort_secondRow",
+    'calibration_volume': "lineEdit_qte_calibration_thirdRow",
+    'calibration_frequency': "spinBox_frequence_calibration_thirdRow",
+    'calibration_period': "comboBox_fois_par_periode_temp_thirdRow",
+    'cal_unit': "comboBox_unite_qte_calibration_thirdRow",
+    'cal_total_unit': "comboBox_qte_totale_calibration_unite",
+    'total_qty_loss': "lineEdit_total_qty",
+    'total_qty_loss_unit': "comboBox_total_qty_unit",
+    'manipulation_loss': "spinBox_manipulation_loss",
+    'contamination_loss': "spinBox_contamination_loss",
+    'degradation_loss': "spinBox_degradation_loss",
+    'loss_unit': "comboBox_loss_unit",
+    'confirmation_qty': "lineEdit_qte_test_refais_confirmation_fiveRow",
+    'confirmation_percent': "spinBox_percent_confirmation_test_repete",
+    'conf_unit': "comboBox_unite_qte_test_refais_confirmation_fiveRow",
+    'conf_total_unit': "comboBox_unite_qte_totale_confirmation_fiveRow",
+    'conditionnement': "lineEdit_qte_totale_conditionnement_sixRow",
+    'cond_unit': "comboBox_qte_totale_conditionnement_unit_sixRow",
+    'packaging': "comboBox_qte_a_commander_unit_sixRow",
+    'stock_actuel': "lineEdit_nbr_test_stock_actuel_sixRow",
+    'stock_unit': "comboBox_unite_stoc_test_sixRow",
+    'livraison': "lineEdit_jours_livraison_sixRow",
+    'livraison_unit': "comboBox_unite_date_livraison_sixRow"
+}
+
+def fetch_usage_history(database, analyte_name, days):
+    """
+    Tests réalisés par jour pour un analyte sur les `days` derniers jours (table DailyUsage).
+    Exécutée dans le thread du planificateur.
+    :return: (tests par jour, volume par jour, unité) ou None si l'analyte est inconnu
+    """
+    analyte_id = database.get_analyte_id(analyte_name)
+    if analyte_id is None:
+        return None
+    averages = database.get_daily_usage_averages([days], analyte_ids=[analyte_id])
+    if not averages:
+        return 0.0, 0.0, None
+    _analyte_id, _name, unit, [(volume_per_day, tests_per_day)] = averages[0]
+    return tests_per_day, volume_per_day, unit
 
 
 class PackagingWorker(QThread):
@@ -59,84 +116,13 @@ class PackagingWorker(QThread):
             result = f"Erreur de calcul : {e}"
         self.calculation_finished.emit(result)
         
-class QACCalculator(QThread):
-    calculation_finished = Signal(dict)
-    error_occurred = Signal(str)
-
-    def __init__(self, fields, calculator):
-        super().__init__()
-        self.fields = fields
-        self.calculator = calculator
-
-    def run(self):
-        try:
-            # Étape 1 : Validation initiale
-            required_fields = [
-                "consommation", "calibration", "pertes", "confirmation",
-                "stock_actuel", "conditionnement", "livraison"
-            ]
-            
-            for field in required_fields:
-                if field not in self.fields:
-                    raise ValueError(f"Le champ requis '{field}' est manquant")
-                    
-            # Étape 2 : Normalisation des unités
-            target_unit = self.fields['conditionnement']['unit']
-            converted_values = {}
-            
-            for key, data in self.fields.items():
-                if key in ["conditionnement", "livraison"] :
-                    continue  # Déjà dans l'unité cible
-                
-                value = data['value']
-                unit = data['unit']
-                
-                if unit != target_unit:
-                    if self.calculator.are_units_compatible(unit, target_unit):
-                        converted_values[key] = self.calculator.convert_value(value, unit, target_unit)
-                    else:
-                        raise ValueError(f"Conversion impossible entre {unit} et {target_unit} pour le champ {key}")
-                else:
-                    converted_values[key] = value
-            
-            # Étape 3 : Calculs principaux
-            consommation = converted_values['consommation']
-            calibration = converted_values['calibration']
-            pertes = converted_values['pertes']
-            confirmation = converted_values['confirmation']
-            stock_actuel = converted_values['stock_actuel']
-            conditionnement = self.fields['conditionnement']['value']
-            time_period = self.fields['consommation']['period']
-            
-            # Calcul CMA
-            total_consommation = consommation + calibration + pertes + confirmation
-            cmj = total_consommation / time_period
-            
-            # Calcul ROP
-            stock_securite = cmj * self.fields['livraison']['value']  # Exemple de calcul de stock de sécurité
-            rop = total_consommation + stock_securite - stock_actuel
-            
-            # Calcul QAC
-            qac = max(0, math.ceil(rop / conditionnement))
-            
-            # Étape 4 : Résultats
-            results = {
-                'cma': f"{total_consommation:.2f} {target_unit}",
-                'cmj': f"{cmj:.2f} {target_unit} / jour",
-                'rop': f"{rop:.2f} {target_unit}",
-                'qac': f"{qac} {self.fields['conditionnement']['packaging']} / {time_period} jours"
-            }
-            
-            self.calculation_finished.emit(results)
-            
-        except Exception as e:
-            self.error_occurred.emit(str(e))
-
 class GestionReactifs(QWidget):
     def __init__(self):
         super().__init__()
         self.calculator = ConsumptionCalculator()
         self.database = ReactifsDatabase()
+        self.scheduler = QueryScheduler(parent=self)  # Historique de consommation de l'analyte choisi
+        self.history_prefill = None  # Dernière valeur de "Nbr Tests" proposée depuis l'historique
         self.setupUi()
         self.setup_connections()
 
@@ -192,9 +178,19 @@ class GestionReactifs(QWidget):
         self.horizontalSpacer = QSpacerItem(310, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
         self.buttons_layout.addItem(self.horizontalSpacer)
 
+        self.load_scenario_button = QPushButton("Charger un scénario", self)
+        self.buttons_layout.addWidget(self.load_scenario_button)
+
+        self.save_scenario_button = QPushButton("Enregistrer le scénario", self)
+        self.buttons_layout.addWidget(self.save_scenario_button)
+
         self.print_button_result = QPushButton("Imprimer le résultat", self)
         self.buttons_layout.addWidget(self.print_button_result)
 
+        self.sweep_button = QPushButton("Balayage", self)
+        self.sweep_button.setToolTip("Calculer la QAC sur une grille de valeurs des paramètres")
+        self.buttons_layout.addWidget(self.sweep_button)
+
         self.calculate_button = QPushButton("Calculer", self)
         self.buttons_layout.addWidget(self.calculate_button)
 
@@ -331,6 +327,11 @@ class GestionReactifs(QWidget):
         # Connexions des boutons
         self.cancel_button.clicked.connect(self.close)
         self.calculate_button.clicked.connect(self.calculate_all)
+        self.sweep_button.clicked.connect(self.open_sweep_dialog)
+        self.save_scenario_button.clicked.connect(self.save_scenario)
+        self.load_scenario_button.clicked.connect(self.load_scenario)
+        # Stock ou consommation modifiés dans les onglets : les scénarios concernés sont recalculés
+        STOCK_EVENTS.stock_changed.connect(self.recompute_scenarios)
 
         # Connexions pour la deuxième ligne
         self.comboBox_qte_par_unite_secondRow.currentTextChanged.connect(self.on_qty_per_unit_changed)
@@ -362,6 +363,11 @@ class GestionReactifs(QWidget):
         self.spinBox_percent_confirmation_test_repete.valueChanged.connect(self.update_confirmation)
         self.comboBox_unite_qte_totale_confirmation_fiveRow.currentTextChanged.connect(self.update_confirmation)
         
+        # Pré-remplissage du nombre de tests depuis l'historique de l'analyte
+        self.comboBox_analyse_sixRow.currentTextChanged.connect(self.prefill_from_history)
+        self.number_time_spinBox_firstRow.valueChanged.connect(self.prefill_from_history)
+        self.comboBox_periode_temps_firstRow.currentTextChanged.connect(self.prefill_from_history)
+
         # Connexion pour les radios buttons 
         self.radio_by_time.toggled.connect(self.on_radio_button_changed)
         self.radio_by_packaging.toggled.connect(self.on_radio_button_changed)
@@ -385,7 +391,7 @@ class GestionReactifs(QWidget):
         qty_text = self.lineEdit_qte_par_unite_secondRow.text()
         if qty_text and qty_text.replace('.', '').isdigit():
             qty = float(qty_text)
-            if old_unit in VOLUME_UNITS + MASS_UNITS and new_unit in VOLUME_UNITS + MASS_UNITS:
+            if UNIT_REGISTRY.is_physical(old_unit) and UNIT_REGISTRY.is_physical(new_unit):
                 try:
                     converted_qty = self.calculator.convert_value(qty, old_unit, new_unit)
                     self.lineEdit_qte_par_unite_secondRow.setText(f"{converted_qty:.2f}")
@@ -401,7 +407,7 @@ class GestionReactifs(QWidget):
         volume_text = self.lineEdit_qte_volume_mor_secondRow.text()
         if volume_text and volume_text.replace('.', '').isdigit():
             volume = float(volume_text)
-            if old_unit in VOLUME_UNITS + MASS_UNITS and new_unit in VOLUME_UNITS + MASS_UNITS:
+            if UNIT_REGISTRY.is_physical(old_unit) and UNIT_REGISTRY.is_physical(new_unit):
                 try:
                     converted_volume = self.calculator.convert_value(volume, old_unit, new_unit)
                     self.lineEdit_qte_volume_mor_secondRow.setText(f"{converted_volume:.2f}")
@@ -417,7 +423,7 @@ class GestionReactifs(QWidget):
         total_qty_text = self.lineEdit_qte_totale_par_conditionnment_secondRow.text()
         if total_qty_text and total_qty_text.replace('.', '').isdigit():
             total_qty = float(total_qty_text)
-            if old_unit in VOLUME_UNITS + MASS_UNITS and new_unit in VOLUME_UNITS + MASS_UNITS:
+            if UNIT_REGISTRY.is_physical(old_unit) and UNIT_REGISTRY.is_physical(new_unit):
                 try:
                     converted_total_qty = self.calculator.convert_value(total_qty, old_unit, new_unit)
                     self.lineEdit_qte_totale_par_conditionnment_secondRow.setText(f"{converted_total_qty:.2f}")
@@ -546,8 +552,7 @@ class GestionReactifs(QWidget):
                 return
 
             # Vérification des unités et conversions comme avant...
-            all_units = set(VOLUME_UNITS + MASS_UNITS)
-            if qty_unit not in all_units or total_qty_unit not in all_units or dead_volume_unit not in all_units:
+            if not all(UNIT_REGISTRY.is_physical(unit) for unit in (qty_unit, total_qty_unit, dead_volume_unit)):
                 self.lineEdit_tests_par_conditionnment_secondRow.setStyleSheet("color: blue;")
                 self.lineEdit_tests_par_conditionnment_secondRow.setText("Erreur : unités non valides")
                 return
@@ -729,6 +734,11 @@ class GestionReactifs(QWidget):
         self.comboBox_qte_totale_calibration_unite.addItems(UNITS_CAL_CONT_CONFIRM)
         h_layout2.addWidget(self.comboBox_qte_totale_calibration_unite)
 
+        self.btn_control_schedule = QPushButton("Planning des contrôles", groupbox)
+        self.btn_control_schedule.setToolTip("Calibrations et contrôles planifiés de l'analyte sur la période")
+        self.btn_control_schedule.clicked.connect(self.apply_control_schedule)
+        h_layout2.addWidget(self.btn_control_schedule)
+
         h_layout2.setStretch(1, 2)
         h_layout2.setStretch(3, 2)
         h_layout2.setStretch(4, 1)	
@@ -1018,6 +1028,35 @@ class GestionReactifs(QWidget):
         except Exception as e:
             QMessageBox.critical(self, "Erreur", f"Impossible de charger les analytes : {e}") 
                
+    def prefill_from_history(self):
+        analyte_name = self.comboBox_analyse_sixRow.currentText().strip()
+        days = CALENDAR.days_before(None, self.number_time_spinBox_firstRow.value(),
+                                    self.comboBox_periode_temps_firstRow.currentText())
+        if not analyte_name or days <= 0:
+            return
+        self.scheduler.request(
+            "history", fetch_usage_history, analyte_name, days,
+            callback=lambda result: self.on_history_loaded(result, days)
+        )
+
+    def on_history_loaded(self, result, days):
+        if not result:
+            return
+        tests_per_day, volume_per_day, unit = result
+        # Analyte suivi par lots seulement : DailyUsage n'a que du volume, pas de nombre de tests à proposer
+        if tests_per_day <= 0:
+            return
+        # Une valeur saisie par l'utilisateur n'est jamais remplacée
+        current = self.lineEdit_nbrs_test_firstRow.text()
+        if current and current != self.history_prefill:
+            return
+        self.history_prefill = f"{tests_per_day * days:.0f}"
+        self.lineEdit_nbrs_test_firstRow.setText(self.history_prefill)
+        self.lineEdit_nbrs_test_firstRow.setToolTip(
+            f"Historique des {days} derniers jours : {tests_per_day:.2f} tests/jour"
+            + (f", {volume_per_day:.2f} {unit}/jour" if unit else "")
+        )
+
     def calculate_total_loss(self):
         """
         Calcule la quantité perdue en fonction des pourcentages des facteurs critiques.
@@ -1033,23 +1072,17 @@ class GestionReactifs(QWidget):
             total_qty = float(total_qty_text)
             total_qty_unit = self.comboBox_total_qty_unit.currentText()
 
-            # Récupérer les pourcentages des facteurs critiques
-            manipulation_loss_percent = self.spinBox_manipulation_loss.value() / 100
-            contamination_loss_percent = self.spinBox_contamination_loss.value() / 100
-            degradation_loss_percent = self.spinBox_degradation_loss.value() / 100
-
-            # Calculer la quantité totale perdue
-            total_loss_percent = manipulation_loss_percent + contamination_loss_percent + degradation_loss_percent
-            total_loss_value = total_qty * total_loss_percent
+            # Somme des pourcentages des facteurs critiques
+            total_loss_percent = (self.spinBox_manipulation_loss.value() + self.spinBox_contamination_loss.value()
+                                  + self.spinBox_degradation_loss.value())
 
-            # Convertir dans l'unité choisie
+            # Quantité totale perdue, dans l'unité choisie
             target_unit = self.comboBox_loss_unit.currentText()
-            if total_qty_unit != target_unit:
-                try:
-                    total_loss_value = self.calculator.convert_value(total_loss_value, total_qty_unit, target_unit)
-                except ValueError:
-                    self.show_error_message(f"Conversion impossible entre {total_qty_unit} et {target_unit}")
-                    return
+            try:
+                total_loss_value = calc_core.loss(total_qty, total_loss_percent, total_qty_unit, target_unit)
+            except ValueError:
+                self.show_error_message(f"Conversion impossible entre {total_qty_unit} et {target_unit}")
+                return
 
             # Afficher la quantité totale perdue
             self.lineEdit_total_loss.setText(f"{total_loss_value:.2f} {target_unit}")
@@ -1081,7 +1114,7 @@ class GestionReactifs(QWidget):
                 try:
                     current_value = float(current_value_text)
                     # Convertir la valeur si l'ancienne unité était aussi massique/volumique
-                    if old_unit in VOLUME_UNITS + MASS_UNITS:
+                    if UNIT_REGISTRY.is_physical(old_unit):
                         try:
                             converted_value = self.calculator.convert_value(current_value, old_unit, unit)
                             self.lineEdit_qte_par_unite_de_test_firstRow.setText(f"{converted_value:.2f}")
@@ -1226,32 +1259,21 @@ class GestionReactifs(QWidget):
             time_value = self.number_time_spinBox_firstRow.value()
             time_unit = self.comboBox_periode_temps_firstRow.currentText()
             qty_unit = self.comboBox_unite_physique_firstRow.currentText()
+            target_unit = self.comboBox_unite_consommation_par_unite_de_temps.currentText()
 
-            if qty_unit in ["test", "pcs"]:
-                consumption = nbr_tests
-                result = f"{consumption:.2f} {qty_unit}/{time_value} {time_unit}"
-            elif qty_unit in ["boîte", "kit", "sachet", "flacon", "tube", "coffret"]:
-                qty_per_unit_text = self.lineEdit_qte_par_unite_de_test_firstRow.text()
-                if qty_per_unit_text.startswith("Nombre de tests"):
-                    self.lineEdit_consommation_par_unite_de_temps_firstRow.clear()
-                    return
-                qty_per_unit = float(qty_per_unit_text or "0")
-                consumption = nbr_tests / qty_per_unit
-                result = f"{consumption:.2f} {qty_unit}/{time_value} {time_unit}"
-            else:
-                qty_per_test = float(self.lineEdit_qte_par_unite_de_test_firstRow.text() or "0")
-                total_qty = nbr_tests * qty_per_test
-                consumption = total_qty 
-
-                target_unit = self.comboBox_unite_consommation_par_unite_de_temps.currentText()
-                if target_unit != qty_unit and target_unit in VOLUME_UNITS + MASS_UNITS and qty_unit in VOLUME_UNITS + MASS_UNITS:
-                    try:
-                        consumption = self.calculator.convert_value(consumption, qty_unit, target_unit)
-                        qty_unit = target_unit
-                    except ValueError:
-                        self.show_error_message("Erreur de conversion")
-                        return
-                result = f"{consumption:.2f} {qty_unit}/{time_value} {time_unit}"
+            qty_per_test_text = self.lineEdit_qte_par_unite_de_test_firstRow.text()
+            if qty_unit in calc_core.PACKAGING_UNITS and qty_per_test_text.startswith("Nombre de tests"):
+                self.lineEdit_consommation_par_unite_de_temps_firstRow.clear()
+                return
+            qty_per_test = 1.0 if qty_unit in ["test", "pcs"] else float(qty_per_test_text or "0")
+            try:
+                consumption, converted = calc_core.consumption(nbr_tests, qty_per_test, qty_unit, target_unit)
+            except ValueError:
+                self.show_error_message("Erreur de conversion")
+                return
+            if converted:
+                qty_unit = target_unit
+            result = f"{consumption:.2f} {qty_unit}/{time_value} {time_unit}"
 
             self.lineEdit_consommation_par_unite_de_temps_firstRow.setText(result)
         except ValueError:
@@ -1476,33 +1498,16 @@ class GestionReactifs(QWidget):
             time_value = self.number_time_spinBox_firstRow.value()
             time_unit = self.comboBox_periode_temps_firstRow.currentText()
 
-            # Convertir la période de temps en jours
-            time_factors = {
-                'Jours': 1,
-                'Semaine': 7,
-                'Mois': 30
-            }
-            total_days = time_value * time_factors.get(time_unit, 1)
-            calibration_days_per_period = time_factors.get(calibration_period, 1)
-
-            # Calculer le nombre total de calibrations
-            if calibration_period == 'Jours':
-                total_calibrations = (total_days // calibration_frequency) if calibration_frequency > 0 else 0
-            else:
-                periods = total_days / calibration_days_per_period
-                total_calibrations = periods * calibration_frequency
-
-            # Calculer le volume total de calibration dans l'unité originale
-            total_volume = total_calibrations * calibration_volume
-
-            # Convertir dans l'unité d'affichage si nécessaire
+            # Nombre de calibrations sur la période et volume total dans l'unité d'affichage
             display_unit = self.comboBox_qte_totale_calibration_unite.currentText()
-            if calibration_unit != display_unit:
-                try:
-                    total_volume = self.calculator.convert_value(total_volume, calibration_unit, display_unit)
-                except ValueError:
-                    self.show_error_message(f"Erreur de conversion de {calibration_unit} vers {display_unit}")
-                    return
+            try:
+                total_calibrations, total_volume = calc_core.calibration(
+                    time_value, time_unit, calibration_frequency, calibration_period,
+                    calibration_volume, calibration_unit, display_unit
+                )
+            except ValueError:
+                self.show_error_message(f"Erreur de conversion de {calibration_unit} vers {display_unit}")
+                return
 
             # Afficher les résultats
             self.lineEdit_total_calibrations.setText(f"{int(total_calibrations)}")
@@ -1513,6 +1518,42 @@ class GestionReactifs(QWidget):
             self.lineEdit_total_calibrations.clear()
             self.lineEdit_total_calibration_volume.clear()
 
+    def apply_control_schedule(self):
+        """
+        Remplace le nombre et le volume de calibrations par ceux des règles de l'analyte
+        (calibrations et contrôles qualité, voir control_schedule.py) sur la période du formulaire.
+        """
+        analyte_name = self.comboBox_analyse_sixRow.currentText().strip()
+        if not analyte_name:
+            self.show_error_message("Choisissez un analyte pour utiliser ses règles de calibration.")
+            return
+        get_database_service().submit(
+            analyte_schedule, analyte_name, self.number_time_spinBox_firstRow.value(),
+            self.comboBox_periode_temps_firstRow.currentText(),
+            callback=self.on_control_schedule_loaded,
+            error_callback=lambda error: self.show_error_message(f"Impossible de calculer le planning : {error}")
+        )
+
+    def on_control_schedule_loaded(self, schedule):
+        entries = [entry for entry in schedule if 'erreur' not in entry]
+        if not entries:
+            self.show_error_message("Aucune règle de calibration ou de contrôle utilisable pour cet analyte.")
+            return
+        unit = entries[0]['unite']
+        display_unit = self.comboBox_qte_totale_calibration_unite.currentText()
+        try:
+            total_volume = self.calculator.convert_value(sum(entry['quantity'] for entry in entries), unit, display_unit)
+        except ValueError:
+            self.show_error_message(f"Conversion impossible entre {unit} et {display_unit}")
+            return
+        self.lineEdit_total_calibrations.setText(f"{sum(entry['events'] for entry in entries):.0f}")
+        self.lineEdit_total_calibration_volume.setText(f"{total_volume:.2f} {display_unit}")
+        self.lineEdit_total_calibration_volume.setToolTip("\n".join(
+            f"{CONTROL_KINDS[entry['kind']]} ({entry['rule']}) : {entry['events']:.1f} × → "
+            f"{entry['quantity']:.2f} {unit}"
+            for entry in entries
+        ))
+
     def on_calibration_unit_changed(self, new_unit):
         """Gère le changement d'unité dans le combobox de calibration"""
         # Récupérer la valeur initiale et son unité
@@ -1527,7 +1568,7 @@ class GestionReactifs(QWidget):
             initial_unit = initial_text.split()[1]
 
             # Si les unités sont compatibles, faire la conversion
-            if initial_unit in VOLUME_UNITS + MASS_UNITS and new_unit in VOLUME_UNITS + MASS_UNITS:
+            if UNIT_REGISTRY.is_physical(initial_unit) and UNIT_REGISTRY.is_physical(new_unit):
                 # Convertir la valeur
                 converted_value = self.calculator.convert_value(initial_value, initial_unit, new_unit)
                 # Mettre à jour l'affichage
@@ -1550,7 +1591,7 @@ class GestionReactifs(QWidget):
                 total_calibration_volume = float(total_calibration_volume_text.split()[0])
 
                 # Convertir la valeur dans la nouvelle unité si nécessaire
-                if old_unit in VOLUME_UNITS + MASS_UNITS and new_unit in VOLUME_UNITS + MASS_UNITS:
+                if UNIT_REGISTRY.is_physical(old_unit) and UNIT_REGISTRY.is_physical(new_unit):
                     try:
                         # Convertir la valeur en utilisant la méthode du calculateur
                         converted_volume = self.calculator.convert_value(total_calibration_volume, old_unit, new_unit)
@@ -1579,8 +1620,6 @@ class GestionReactifs(QWidget):
         try:
             # Récupérer les paramètres de la confirmation
             nbr_tests_text = self.lineEdit_nbrs_test_firstRow.text()
-            time_value = self.number_time_spinBox_firstRow.value()
-            time_unit = self.comboBox_periode_temps_firstRow.currentText()
             confirmation_percentage = self.spinBox_percent_confirmation_test_repete.value()
             qty_per_test_text = self.lineEdit_qte_test_refais_confirmation_fiveRow.text()
             qty_unit = self.comboBox_unite_qte_test_refais_confirmation_fiveRow.currentText()
@@ -1595,24 +1634,13 @@ class GestionReactifs(QWidget):
             nbr_tests = float(nbr_tests_text)
             qty_per_test = float(qty_per_test_text)
 
-            # Convertir la période de temps en jours
-            time_factors = {
-                'Jours': 1,
-                'Semaine': 7,
-                'Mois': 30
-            }
-            total_days = time_value * time_factors.get(time_unit, 1)
-
-            # Calculer la quantité totale perdue
-            total_lost_volume = (nbr_tests * (confirmation_percentage / 100)) * qty_per_test
-
-            # Convertir dans l'unité d'affichage si nécessaire
-            if qty_unit != display_unit:
-                if self.calculator.are_units_compatible(qty_unit, display_unit):
-                    total_lost_volume = self.calculator.convert_value(total_lost_volume, qty_unit, display_unit)
-                else:
-                    self.show_error_message(f"Conversion impossible entre {qty_unit} et {display_unit}")
-                    return
+            # Calculer la quantité totale perdue, dans l'unité d'affichage
+            try:
+                total_lost_volume = calc_core.confirmation(nbr_tests, confirmation_percentage, qty_per_test,
+                                                           qty_unit, display_unit)
+            except ValueError:
+                self.show_error_message(f"Conversion impossible entre {qty_unit} et {display_unit}")
+                return
 
             # Afficher le résultat
             self.lineEdit_qte_total_confirmation_fiveRow.setText(f"{total_lost_volume:.2f} {display_unit}")
@@ -1622,65 +1650,134 @@ class GestionReactifs(QWidget):
             self.lineEdit_qte_total_confirmation_fiveRow.clear()
 
         
+    def collect_fields(self):
+        """
+        Champs du formulaire nécessaires au calcul de la QAC (valeur et unité de chacun).
+        """
+        # Extraction des données à partir de lineEdit_consommation_par_unite_de_temps_firstRow
+        consommation_text = self.lineEdit_consommation_par_unite_de_temps_firstRow.text()
+        
+        # Utiliser une regex pour extraire la valeur, l'unité et la période
+        match = re.match(r"([\d.]+)\s*([a-zA-Z]+)\/(\d+)\s*([a-zA-Z]+)", consommation_text)
+        if not match:
+            raise ValueError("Format incorrect pour la consommation. Le format attendu est '100.00 ml/20 Jours'")
+        
+        consommation_value = float(match.group(1))  # Ex: 100.00
+        consommation_unit = match.group(2)          # Ex: ml
+        time_value = int(match.group(3))            # Ex: 20
+        time_unit = match.group(4)                  # Ex: Jours
+
+        # Période et délai de livraison en jours du calendrier, à partir d'aujourd'hui
+        delivery_value = float(self.lineEdit_jours_livraison_sixRow.text())
+        delivery_unit = self.comboBox_unite_date_livraison_sixRow.currentText()
+        if period_unit(delivery_unit) != "jours":
+            delivery_value = CALENDAR.days(None, round(delivery_value), delivery_unit)
+
+        # Collecter tous les champs nécessaires
+        return {
+            "consommation": {
+                "value": consommation_value,
+                "unit": consommation_unit,
+                'period': CALENDAR.days(None, time_value, time_unit)
+            },
+            "calibration": {
+                "value": float(self.lineEdit_total_calibration_volume.text().split()[0]),
+                "unit": self.lineEdit_total_calibration_volume.text().split()[1]
+            },
+            "pertes": {
+                "value": float(self.lineEdit_total_loss.text().split()[0]),
+                "unit": self.lineEdit_total_loss.text().split()[1]
+            },
+            "confirmation": {
+                "value": float(self.lineEdit_qte_total_confirmation_fiveRow.text().split()[0]),
+                "unit": self.lineEdit_qte_total_confirmation_fiveRow.text().split()[1]
+            },
+            "stock_actuel": {
+                "value": float(self.lineEdit_nbr_test_stock_actuel_sixRow.text()),
+                "unit": self.comboBox_unite_stoc_test_sixRow.currentText()
+            },
+            "conditionnement": {
+                "value": float(self.lineEdit_qte_totale_conditionnement_sixRow.text()),
+                "unit": self.comboBox_qte_totale_conditionnement_unit_sixRow.currentText(),
+                "packaging": self.comboBox_qte_a_commander_unit_sixRow.currentText()
+            },
+            "livraison": {
+                "value": delivery_value,  # Délai de livraison en jours
+                "unit": "Jours"
+            }
+        }
+        
     def calculate_all(self):
         try:
-            # Extraction des données à partir de lineEdit_consommation_par_unite_de_temps_firstRow
-            consommation_text = self.lineEdit_consommation_par_unite_de_temps_firstRow.text()
-            
-            # Utiliser une regex pour extraire la valeur, l'unité et la période
-            match = re.match(r"([\d.]+)\s*([a-zA-Z]+)\/(\d+)\s*([a-zA-Z]+)", consommation_text)
-            if not match:
-                raise ValueError("Format incorrect pour la consommation. Le format attendu est '100.00 ml/20 Jours'")
-            
-            consommation_value = float(match.group(1))  # Ex: 100.00
-            consommation_unit = match.group(2)          # Ex: ml
-            time_value = int(match.group(3))            # Ex: 20
-            time_unit = match.group(4)                  # Ex: Jours
-            
-            # Collecter tous les champs nécessaires
-            fields = {
-                "consommation": {
-                    "value": consommation_value,
-                    "unit": consommation_unit,
-                    'period': time_value
-                },
-                "calibration": {
-                    "value": float(self.lineEdit_total_calibration_volume.text().split()[0]),
-                    "unit": self.lineEdit_total_calibration_volume.text().split()[1]
-                },
-                "pertes": {
-                    "value": float(self.lineEdit_total_loss.text().split()[0]),
-                    "unit": self.lineEdit_total_loss.text().split()[1]
-                },
-                "confirmation": {
-                    "value": float(self.lineEdit_qte_total_confirmation_fiveRow.text().split()[0]),
-                    "unit": self.lineEdit_qte_total_confirmation_fiveRow.text().split()[1]
-                },
-                "stock_actuel": {
-                    "value": float(self.lineEdit_nbr_test_stock_actuel_sixRow.text()),
-                    "unit": self.comboBox_unite_stoc_test_sixRow.currentText()
-                },
-                "conditionnement": {
-                    "value": float(self.lineEdit_qte_totale_conditionnement_sixRow.text()),
-                    "unit": self.comboBox_qte_totale_conditionnement_unit_sixRow.currentText(),
-                    "packaging": self.comboBox_qte_a_commander_unit_sixRow.currentText()
-                },
-                "livraison": {
-                     "value": float(self.lineEdit_jours_livraison_sixRow.text()),  # Valeur saisie pour le délai de livraison
-                    "unit": self.comboBox_unite_date_livraison_sixRow.currentText()  # Unité sélectionnée pour le délai de livraison
-                }
+            fields = self.collect_fields()
+        except (ValueError, IndexError) as e:
+            self.show_error_message(f"Erreur de saisie : {e}")
+            return
+        try:
+            # Calcul direct (quelques microsecondes, mémorisé par calc_core)
+            chain = calc_core.qac(fields)
+            target_unit = fields['conditionnement']['unit']
+            time_period = fields['consommation']['period']
+            results = {
+                'cma': f"{chain['cma']:.2f} {target_unit}",
+                'cmj': f"{chain['cmj']:.2f} {target_unit} / jour",
+                'rop': f"{chain['rop']:.2f} {target_unit}",
+                'qac': f"{int(chain['qac'])} {fields['conditionnement']['packaging']} / {time_period} jours"
             }
-            
-            # Lancer le calcul dans un thread
-            self.qac_calculator = QACCalculator(fields, self.calculator)
-            self.qac_calculator.calculation_finished.connect(self.display_qac_results)
-            self.qac_calculator.error_occurred.connect(self.show_error_message)
-            self.qac_calculator.start()
-            
         except ValueError as e:
-            self.show_error_message(f"Erreur de saisie : {e}")
+            self.show_error_message(str(e))
+            return
         except Exception as e:
             self.show_error_message(f"Erreur inattendue : {e}")
+            return
+        self.display_qac_results(results)
+
+    def sweep_base(self):
+        """
+        Valeurs de référence du balayage, dans l'unité du conditionnement : quantités par test
+        et par conditionnement plutôt que totaux, pour pouvoir faire varier le nombre de tests
+        et les pourcentages.
+        """
+        fields = self.collect_fields()
+        converted = normalize_fields(fields, self.calculator)
+        nbr_tests = float(self.lineEdit_nbrs_test_firstRow.text() or "0")
+        quantities = normalize_fields({
+            "pertes": {
+                "value": float(self.lineEdit_total_qty.text() or "0"),
+                "unit": self.comboBox_total_qty_unit.currentText()
+            },
+            "confirmation": {
+                "value": float(self.lineEdit_qte_test_refais_confirmation_fiveRow.text() or "0"),
+                "unit": self.comboBox_unite_qte_test_refais_confirmation_fiveRow.currentText()
+            },
+            "conditionnement": fields['conditionnement']
+        }, self.calculator)
+        if not fields['consommation']['period'] or not fields['conditionnement']['value']:
+            raise ValueError("La période et le conditionnement doivent être supérieurs à zéro")
+        base = {
+            'nbr_tests': nbr_tests,
+            'qte_par_test': converted['consommation'] / nbr_tests if nbr_tests else 0.0,
+            'calibration': converted['calibration'],
+            'qte_pertes': quantities['pertes'],
+            'pertes_pct': (self.spinBox_manipulation_loss.value() + self.spinBox_contamination_loss.value()
+                           + self.spinBox_degradation_loss.value()),
+            'qte_confirmation': quantities['confirmation'],
+            'confirmation_pct': self.spinBox_percent_confirmation_test_repete.value(),
+            'stock_actuel': converted['stock_actuel'],
+            'conditionnement': fields['conditionnement']['value'],
+            'livraison': fields['livraison']['value'],
+            'period': fields['consommation']['period']
+        }
+        return base, fields['conditionnement']
+
+    def open_sweep_dialog(self):
+        try:
+            base, conditionnement = self.sweep_base()
+        except (ValueError, IndexError) as e:
+            self.show_error_message(f"Erreur de saisie : {e}")
+            return
+        dialog = SweepDialog(base, conditionnement['unit'], conditionnement['packaging'], self)
+        dialog.exec_()
 
     def display_qac_results(self, results):
         try:
@@ -1698,38 +1795,102 @@ class GestionReactifs(QWidget):
         except Exception as e:
             self.show_error_message(f"Erreur lors de l'affichage des résultats : {e}")
             
+    def form_data(self):
+        """
+        Valeurs typées des champs du formulaire (voir FORM_FIELDS).
+        """
+        data = {}
+        for key, name in FORM_FIELDS.items():
+            widget = getattr(self, name)
+            if isinstance(widget, QLineEdit):
+                data[key] = float(widget.text() or "0")
+            elif isinstance(widget, QSpinBox):
+                data[key] = widget.value()
+            else:
+                data[key] = widget.currentText()
+        return data
+
+    def apply_form_data(self, data):
+        """
+        Recharge les champs du formulaire puis recalcule les valeurs qui en dépendent.
+        Les signaux sont bloqués pendant le chargement : les conversions d'unités ne doivent
+        pas s'appliquer aux valeurs enregistrées.
+        """
+        widgets = {key: getattr(self, name) for key, name in FORM_FIELDS.items() if key in data}
+        for widget in widgets.values():
+            widget.blockSignals(True)
+        try:
+            for key, widget in widgets.items():
+                value = data[key]
+                if isinstance(widget, QLineEdit):
+                    widget.setText(f"{value:g}" if value else "")
+                elif isinstance(widget, QSpinBox):
+                    widget.setValue(int(value))
+                else:
+                    widget.setCurrentText(value)
+        finally:
+            for widget in widgets.values():
+                widget.blockSignals(False)
+        self.update_consumption()
+        self.calculate_tests_per_container()
+        self.update_calibration()
+        self.calculate_total_loss()
+        self.update_confirmation()
+
+    def save_scenario(self):
+        analyte_name = self.comboBox_analyse_sixRow.currentText().strip()
+        if not analyte_name:
+            self.show_error_message("Choisissez un analyte avant d'enregistrer le scénario.")
+            return
+        try:
+            inputs = {'form': self.form_data(), 'fields': self.collect_fields()}
+        except (ValueError, IndexError) as e:
+            self.show_error_message(f"Erreur de saisie : {e}")
+            return
+        name, ok = QInputDialog.getText(self, "Enregistrer le scénario", f"Nom du scénario ({analyte_name}) :")
+        if not ok or not name.strip():
+            return
+        get_database_service().submit(
+            store_scenario, analyte_name, name.strip(), inputs,
+            callback=lambda _summary: QMessageBox.information(
+                self, "Succès", f"Le scénario « {name.strip()} » a été enregistré."),
+            error_callback=lambda e: self.show_error_message(f"Impossible d'enregistrer le scénario : {e}")
+        )
+
+    def load_scenario(self):
+        analyte_name = self.comboBox_analyse_sixRow.currentText().strip()
+        get_database_service().submit(
+            fetch_scenarios, analyte_name,
+            callback=self.choose_scenario,
+            error_callback=lambda e: self.show_error_message(f"Impossible de charger les scénarios : {e}")
+        )
+
+    def choose_scenario(self, scenarios):
+        if not scenarios:
+            QMessageBox.information(self, "Scénarios", "Aucun scénario enregistré.")
+            return
+        labels = [f"{scenario[2]} — {scenario[3]}" for scenario in scenarios]
+        label, ok = QInputDialog.getItem(self, "Charger un scénario", "Scénario :", labels, 0, False)
+        if not ok:
+            return
+        scenario = scenarios[labels.index(label)]
+        self.comboBox_analyse_sixRow.setCurrentText(scenario[2])
+        self.apply_form_data(scenario[4]['form'])
+
+    def recompute_scenarios(self, analyte_names=None):
+        """
+        Recalcule en arrière-plan les scénarios dont le stock ou la consommation ont changé.
+        """
+        get_database_service().submit(
+            recompute_scenarios, analyte_names,
+            error_callback=lambda e: print(f"Erreur lors du recalcul des scénarios : {e}")
+        )
+
     def generate_explanation_report(self):
             """
             Génère un rapport PDF explicatif en collectant les données actuelles de l'interface.
             """
-            data = {
-                'nbr_tests': float(self.lineEdit_nbrs_test_firstRow.text() or "0"),
-                'qty_per_test': float(self.lineEdit_qte_par_unite_de_test_firstRow.text() or "0"),
-                'time_value': self.number_time_spinBox_firstRow.value(),
-                'time_unit': self.comboBox_periode_temps_firstRow.currentText(),
-                'unit': self.comboBox_unite_physique_firstRow.currentText(),
-                'qty_per_unit': float(self.lineEdit_qte_par_unite_secondRow.text() or "0"),
-                'total_qty': float(self.lineEdit_qte_totale_par_conditionnment_secondRow.text() or "0"),
-                'dead_volume': float(self.lineEdit_qte_volume_mor_secondRow.text() or "0"),
-                'unit_qty': self.comboBox_qte_par_unite_secondRow.currentText(),
-                'unit_total': self.comboBox_unite_qte_totale_par_conditionnement.currentText(),
-                'unit_dead': self.comboBox_unite_volume_mort_secondRow.currentText(),
-                'calibration_volume': float(self.lineEdit_qte_calibration_thirdRow.text() or "0"),
-                'calibration_frequency': self.spinBox_frequence_calibration_thirdRow.value(),
-                'calibration_period': self.comboBox_fois_par_periode_temp_thirdRow.currentText(),
-                'cal_unit': self.comboBox_unite_qte_calibration_thirdRow.currentText(),
-                'total_qty_loss': float(self.lineEdit_total_qty.text() or "0"),
-                'manipulation_loss': self.spinBox_manipulation_loss.value(),
-                'contamination_loss': self.spinBox_contamination_loss.value(),
-                'degradation_loss': self.spinBox_degradation_loss.value(),
-                'loss_unit': self.comboBox_loss_unit.currentText(),
-                'confirmation_qty': float(self.lineEdit_qte_test_refais_confirmation_fiveRow.text() or "0"),
-                'confirmation_percent': self.spinBox_percent_confirmation_test_repete.value(),
-                'conf_unit': self.comboBox_unite_qte_test_refais_confirmation_fiveRow.currentText(),
-                'stock_actuel': float(self.lineEdit_nbr_test_stock_actuel_sixRow.text() or "0"),
-                'livraison': float(self.lineEdit_jours_livraison_sixRow.text() or "0"),
-                'cond_unit': self.comboBox_qte_totale_conditionnement_unit_sixRow.currentText()
-            }
+            data = self.form_data()
 
             try:
                 generate_explanation_report(data)
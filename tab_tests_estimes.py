@@ -6,8 +6,11 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import QDate, Qt, QThread, Signal
 from PySide6.QtGui import QIcon, QAction
-from database import ReactifsDatabase, DatabaseWorkerThread
-from export import export_data
+from database import ReactifsDatabase, DatabaseWorkerThread, get_database_service
+from export_dialogs import export_data
+from query_scheduler import QueryScheduler
+from row_store import TESTS_HEADERS, TestStore
+from stock_alerts import STOCK_EVENTS
 
 
 class AddEditTestDialog(QDialog):
@@ -166,14 +169,50 @@ class AddEditTestDialog(QDialog):
         }
 
 
+TESTS_QUERY = """
+    SELECT Tests.id, Analytes.name, Tests.lot_number, Tests.start_date, Tests.end_date,
+           Tests.estimated_tests, Tests.performed_tests, Tests.usage_factor, Tests.loss_percentage, Tests.operator,
+           Tests.duration_days, Tests.loss_tests
+    FROM Tests
+    JOIN Analytes ON Tests.analyte_id = Analytes.id
+"""
+LOAD_CHUNK_SIZE = 200  # Lignes ajoutées à la table par tour de boucle d'événements
+
+
+def fetch_test_averages(database, analyte_name):
+    """
+    Moyennes des tests d'un analyte (exécutée dans le thread du planificateur).
+    """
+    database.cursor.execute("""
+        SELECT AVG(estimated_tests), AVG(performed_tests), AVG(usage_factor), AVG(loss_percentage)
+        FROM Tests
+        JOIN Analytes ON Tests.analyte_id = Analytes.id
+        WHERE Analytes.name = ?
+    """, (analyte_name,))
+    return database.cursor.fetchall()
+
+
+def test_row(test_id, data):
+    """
+    Valeurs d'un test saisi dans AddEditTestDialog, dans l'ordre des colonnes de TestStore.
+    """
+    return (
+        test_id, data['nom_analyte'], data['lot_number'], data['start_date'], data['end_date'],
+        data['estimated_tests'], data['performed_tests'], data['usage_factor'], data['loss_percentage'],
+        data['operator']
+    )
+
+
 class TabTests(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.database = ReactifsDatabase()
+        self.db_service = get_database_service()  # Accès asynchrone (thread dédié)
         self.current_row = -1
-        self.data_model = []
+        self.data_model = TestStore()  # Lignes de la table, partagées avec la recherche et l'exportation
         self.export_thread = None  # Stocker le thread ici
-        self.thread = None
+        self.save_thread = None
+        self.scheduler = QueryScheduler(parent=self)  # Chargement et statistiques : seul le dernier résultat compte
         self.setup_ui()
         self.load_data_from_database()
 
@@ -262,12 +301,18 @@ class TabTests(QWidget):
         self.table.customContextMenuRequested.connect(self.show_context_menu)
 
     def populate_analytes_combo(self):
-        try:
-            analytes = self.database.get_all_analytes()
-            self.cmb_analytes.clear()
-            self.cmb_analytes.addItems([analyte for analyte in analytes])
-        except Exception as e:
-            QMessageBox.critical(self, "Erreur", f"Impossible de charger les analytes : {e}")
+        self.db_service.call(
+            "get_all_analytes",
+            callback=self.on_analytes_loaded,
+            error_callback=lambda e: QMessageBox.critical(self, "Erreur", f"Impossible de charger les analytes : {e}")
+        )
+
+    def on_analytes_loaded(self, analytes):
+        # Remplissage initial : pas de calcul des statistiques tant que l'utilisateur n'a rien choisi
+        self.cmb_analytes.blockSignals(True)
+        self.cmb_analytes.clear()
+        self.cmb_analytes.addItems(analytes)
+        self.cmb_analytes.blockSignals(False)
 
     def update_analyte_stats(self):
         """
@@ -278,25 +323,12 @@ class TabTests(QWidget):
             self.clear_stat_fields()
             return
 
-        # Annuler le thread précédent s'il est encore en cours
-        if self.thread and self.thread.isRunning():
-            self.thread.requestInterruption()
-            self.thread.wait()  # Attendre que le thread se termine
-
-        # Démarrer un nouveau thread pour charger les tests associés à l'analyte
-        self.thread = DatabaseWorkerThread(
-            query="""
-            SELECT AVG(estimated_tests), AVG(performed_tests), AVG(usage_factor), AVG(loss_percentage)
-            FROM Tests
-            JOIN Analytes ON Tests.analyte_id = Analytes.id
-            WHERE Analytes.name = ?
-            """,
-            params=(analyte_name,),
-            fetch=True,
-            db_path="reactifs_database.db"
+        # Une nouvelle sélection remplace (et interrompt) la précédente
+        self.scheduler.request(
+            "stats", fetch_test_averages, analyte_name,
+            callback=lambda results: self.update_average_stats(True, results),
+            error_callback=lambda e: self.update_average_stats(False, e)
         )
-        self.thread.finished.connect(lambda success, results: self.update_average_stats(success, results))
-        self.thread.start()
 
     def update_average_stats(self, success, results):
         """
@@ -334,46 +366,30 @@ class TabTests(QWidget):
 
 
     def load_data_from_database(self):
-        self.thread = DatabaseWorkerThread(
-            query="""
-            SELECT Tests.id, Analytes.name, Tests.lot_number, Tests.start_date, Tests.end_date,
-                   Tests.estimated_tests, Tests.performed_tests, Tests.usage_factor, Tests.loss_percentage, Tests.operator
-            FROM Tests
-            JOIN Analytes ON Tests.analyte_id = Analytes.id
-            """,
-            db_path="reactifs_database.db",
-            fetch=True
+        # Les tests arrivent par blocs : le premier écran s'affiche sans attendre la fin de la lecture
+        self.table.clearContents()
+        self.table.setRowCount(0)
+        self.data_model.clear()
+        self.scheduler.request(
+            "load", "stream_query", TESTS_QUERY, chunk_size=LOAD_CHUNK_SIZE, debounce_ms=0,
+            chunk_callback=self.on_load_chunk,
+            callback=lambda count: self.on_load_data_finished(True, count),
+            error_callback=lambda e: self.on_load_data_finished(False, [e])
         )
-        self.thread.finished.connect(self.on_load_data_finished)
-        self.thread.start()
 
-    def on_load_data_finished(self, success, tests):
+    def on_load_chunk(self, tests):
+        self.table.setUpdatesEnabled(False)
+        try:
+            self.append_rows(tests)
+        finally:
+            self.table.setUpdatesEnabled(True)
+
+    def on_load_data_finished(self, success, result):
         if not success:
-            QMessageBox.critical(self, "Erreur", f"Impossible de charger les données : {tests[0]}")
+            QMessageBox.critical(self, "Erreur", f"Impossible de charger les données : {result[0]}")
             return
 
-        try:
-            self.table.clearContents()
-            self.table.setRowCount(0)
-            self.data_model = []
-            for test in tests:
-                data = {
-                    'id': test[0],
-                    'nom_analyte': test[1],
-                    'lot_number': test[2],
-                    'start_date': test[3],
-                    'end_date': test[4],
-                    'estimated_tests': str(test[5]),
-                    'performed_tests': str(test[6]),
-                    'usage_factor': str(test[7]),
-                    'loss_percentage': str(test[8]),
-                    'operator': test[9] if len(test) > 9 else ''
-                }
-                self.add_to_table(data)
-                self.data_model.append(data)
-            QMessageBox.information(self, "Succès", "Les données ont été chargées avec succès.")
-        except Exception as e:
-            QMessageBox.critical(self, "Erreur", f"Impossible de charger les données : {e}")
+        QMessageBox.information(self, "Succès", "Les données ont été chargées avec succès.")
 
     def create_table(self):
         table = QTableWidget()
@@ -393,41 +409,24 @@ class TabTests(QWidget):
         return table
 
     def add_to_table(self, data):
-        row_count = self.table.rowCount()
-        self.table.insertRow(row_count)
-        headers = [
-            "ID", "Nom analyte", "Numéro de lot", "Date Ouverture", "Date Fin", "Durée",
-            "Tests Estimés", "Tests Réalisés", "Perte (Tests)", "Facteur Utilisation", "Perte (%)", "Opérateur"
-        ]
-        for col, header in enumerate(headers):
-            value = ""
-            if header == "ID":
-                value = str(data.get('id', ""))
-            elif header == "Nom analyte":
-                value = data.get('nom_analyte', "")
-            elif header == "Numéro de lot":
-                value = data.get('lot_number', "")
-            elif header == "Date Ouverture":
-                value = data.get('start_date', "")
-            elif header == "Date Fin":
-                value = data.get('end_date', "")
-            elif header == "Durée":
-                value = self.calculate_duration(data.get('start_date', ""), data.get('end_date', ""))
-            elif header == "Tests Estimés":
-                value = data.get('estimated_tests', "")
-            elif header == "Tests Réalisés":
-                value = data.get('performed_tests', "")
-            elif header == "Perte (Tests)":
-                value = str(int(data.get('estimated_tests', 0)) - int(data.get('performed_tests', 0)))
-            elif header == "Facteur Utilisation":
-                value = data.get('usage_factor', "")
-            elif header == "Perte (%)":
-                value = data.get('loss_percentage', "")
-            elif header == "Opérateur":
-                value = data.get('operator', "")
+        self.append_rows([test_row(data.get('id', 0), data)])
+
+    def append_rows(self, tests):
+        """
+        Ajoute des tests (tuples de TESTS_QUERY ou test_row) au modèle puis à la table.
+        """
+        start = len(self.data_model)
+        self.data_model.extend(tests)
+        for position in range(start, len(self.data_model)):
+            row_count = self.table.rowCount()
+            self.table.insertRow(row_count)
+            self.set_table_row(row_count, self.data_model.display_row(position))
+
+    def set_table_row(self, row, values):
+        for col, value in enumerate(values):
             item = QTableWidgetItem(value)
             item.setTextAlignment(Qt.AlignCenter)
-            self.table.setItem(row_count, col, item)
+            self.table.setItem(row, col, item)
 
     def calculate_duration(self, start_date, end_date):
         try:
@@ -460,6 +459,7 @@ class TabTests(QWidget):
                 if test_id is not None:
                     data['id'] = test_id
                     self.add_to_table(data)
+                    STOCK_EVENTS.stock_changed.emit([data['nom_analyte']])
                     QMessageBox.information(self, "Succès", "Le test a été ajouté avec succès.")
                 else:
                     QMessageBox.critical(self, "Erreur", "Impossible d'ajouter le test.")
@@ -564,50 +564,22 @@ class TabTests(QWidget):
                 operator=data['operator']
             )
             if success:
-                QMessageBox.information(self, "Succès", "Le test a été mis à jour avec succès.")
+                position = self.data_model.position_of(test_id)
+                previous = self.data_model.value(position, "analyte") if position != -1 else data['nom_analyte']
                 self.update_table_row(test_id, data)
+                STOCK_EVENTS.stock_changed.emit(sorted({previous, data['nom_analyte']}))
+                QMessageBox.information(self, "Succès", "Le test a été mis à jour avec succès.")
             else:
                 QMessageBox.critical(self, "Erreur", "Impossible de mettre à jour le test.")
         except Exception as e:
             QMessageBox.critical(self, "Erreur", f"Erreur lors de la mise à jour : {e}")
 
     def update_table_row(self, test_id, data):
-        for row in range(self.table.rowCount()):
-            if self.table.item(row, 0).text() == str(test_id):
-                headers = [
-                    "ID", "Nom analyte", "Numéro de lot", "Date Ouverture", "Date Fin", "Durée",
-                    "Tests Estimés", "Tests Réalisés", "Perte (Tests)", "Facteur Utilisation", "Perte (%)", "Opérateur"
-                ]
-                for col, header in enumerate(headers):
-                    value = ""
-                    if header == "ID":
-                        value = str(test_id)
-                    elif header == "Nom analyte":
-                        value = data.get('nom_analyte', "")
-                    elif header == "Numéro de lot":
-                        value = data.get('lot_number', "")
-                    elif header == "Date Ouverture":
-                        value = data.get('start_date', "")
-                    elif header == "Date Fin":
-                        value = data.get('end_date', "")
-                    elif header == "Durée":
-                        value = self.calculate_duration(data.get('start_date', ""), data.get('end_date', ""))
-                    elif header == "Tests Estimés":
-                        value = data.get('estimated_tests', "")
-                    elif header == "Tests Réalisés":
-                        value = data.get('performed_tests', "")
-                    elif header == "Perte (Tests)":
-                        value = str(int(data.get('estimated_tests', 0)) - int(data.get('performed_tests', 0)))
-                    elif header == "Facteur Utilisation":
-                        value = data.get('usage_factor', "")
-                    elif header == "Perte (%)":
-                        value = data.get('loss_percentage', "")
-                    elif header == "Opérateur":
-                        value = data.get('operator', "")
-                    item = QTableWidgetItem(value)
-                    item.setTextAlignment(Qt.AlignCenter)
-                    self.table.setItem(row, col, item)
-                break
+        position = self.data_model.position_of(test_id)
+        if position == -1:
+            return
+        self.data_model.set_row(position, test_row(test_id, data))
+        self.set_table_row(position, self.data_model.display_row(position))
 
     def delete(self, row=None):
         if row is None:
@@ -626,19 +598,34 @@ class TabTests(QWidget):
 
         try:
             test_id = int(self.table.item(row, 0).text())
-            success = self.database.delete_test(test_id)
-            if success:
-                self.table.removeRow(row)
-                QMessageBox.information(self, "Succès", "Le test a été supprimé avec succès.")
-            else:
-                QMessageBox.critical(self, "Erreur", "Impossible de supprimer le test.")
         except Exception as e:
             QMessageBox.critical(self, "Erreur", f"Erreur lors de la suppression : {e}")
+            return
+
+        self.db_service.call(
+            "delete_test", test_id,
+            callback=lambda success: self.on_delete_finished(success, test_id),
+            error_callback=lambda e: QMessageBox.critical(self, "Erreur", f"Erreur lors de la suppression : {e}")
+        )
+
+    def on_delete_finished(self, success, test_id):
+        if not success:
+            QMessageBox.critical(self, "Erreur", "Impossible de supprimer le test.")
+            return
+
+        # La ligne a pu changer de position pendant la suppression : on la retrouve par son ID
+        row = self.data_model.position_of(test_id)
+        if row != -1:
+            STOCK_EVENTS.stock_changed.emit([self.data_model.value(row, "analyte")])
+            self.table.removeRow(row)
+            self.data_model.remove(row)
+        QMessageBox.information(self, "Succès", "Le test a été supprimé avec succès.")
 
     def save_all(self):
         try:
             queries = []
             params_list = []
+            rows = []  # Valeurs modifiées dans la table, reportées dans le modèle après l'enregistrement
             for row in range(self.table.rowCount()):
                 data = self.get_row_data(row)
                 analyte_id = self.database.get_analyte_id(data['Nom analyte'])
@@ -666,36 +653,36 @@ class TabTests(QWidget):
                 )
                 queries.append(query)
                 params_list.append(params)
-            self.thread = DatabaseWorkerThread(query=queries, params=params_list, transaction=True)
-            self.thread.finished.connect(self.on_save_all_finished)
-            self.thread.start()
+                rows.append((test_id, data['Nom analyte'], params[1], params[6], params[7]) + params[2:6] + (params[8],))
+            self.save_thread = DatabaseWorkerThread(query=queries, params=params_list, transaction=True)
+            self.save_thread.finished.connect(lambda success, result: self.on_save_all_finished(success, result, rows))
+            self.save_thread.start()
         except Exception as e:
             QMessageBox.critical(self, "Erreur", f"Erreur lors de l'enregistrement : {e}")
 
-    def on_save_all_finished(self, success, result):
+    def on_save_all_finished(self, success, result, rows=()):
         if success:
+            for test in rows:
+                position = self.data_model.position_of(test[0])
+                if position != -1:
+                    self.data_model.set_row(position, test)
+            STOCK_EVENTS.stock_changed.emit(None)  # Un analyte a pu être renommé : tout est recalculé
             QMessageBox.information(self, "Succès", "Toutes les données ont été enregistrées avec succès.")
         else:
             QMessageBox.critical(self, "Erreur", f"Erreur lors de l'enregistrement : {result}")
             
+    def visible_positions(self):
+        """
+        Positions du modèle des lignes affichées (les lignes de la table suivent l'ordre du modèle),
+        pour que les exportations respectent le filtre de recherche.
+        """
+        return [row for row in range(self.table.rowCount()) if not self.table.isRowHidden(row)]
+
     def export_pdf(self):
-        headers = [self.table.horizontalHeaderItem(i).text() for i in range(self.table.columnCount())]
-        data = [[self.table.item(row, col).text() if self.table.item(row, col) else "" for col in range(self.table.columnCount())] for row in range(self.table.rowCount())]
-        export_data(self, "pdf", headers, data)
+        export_data(self, "pdf", TESTS_HEADERS, self.data_model.display_rows(self.visible_positions()))
 
     def export_excel(self):
-        headers = [self.table.horizontalHeaderItem(i).text() for i in range(self.table.columnCount())]
-        data = []
-
-        for row in range(self.table.rowCount()):
-            row_data = []
-            for col in range(self.table.columnCount()):
-                item = self.table.item(row, col)
-                value = item.text() if item else ""
-                row_data.append(value)
-            data.append(row_data)
-
-        export_data(self, "excel", headers, data)
+        export_data(self, "excel", TESTS_HEADERS, self.data_model.display_rows(self.visible_positions()))
 
     def on_export_finished(self, success, message):
         if success:
@@ -729,7 +716,7 @@ class TabTests(QWidget):
             try:
                 estimated_tests = int(self.table.item(row, 6).text() or 0)
                 performed_tests = int(self.table.item(row, 7).text() or 0)
-                loss_tests = estimated_tests - performed_tests
+                loss_tests = self.data_model.value(row, "loss_tests")  # Calculée par la base
                 usage_factor = performed_tests / estimated_tests if estimated_tests > 0 else 0
                 loss_percentage = (loss_tests / estimated_tests) * 100 if estimated_tests > 0 else 0
                 self.txt_estimated_tests.setText(str(estimated_tests))
@@ -741,7 +728,7 @@ class TabTests(QWidget):
                 QMessageBox.warning(self, "Erreur", f"Une erreur s'est produite lors de la conversion des données : {e}")
 
     def dynamic_search(self):
-        search_text = self.txt_search.text().strip().lower()
-        for row in range(self.table.rowCount()):
-            item = self.table.item(row, 1)  # Colonne du nom d'analyte
-            self.table.setRowHidden(row, search_text not in item.text().lower() if item else True)
\ No newline at end of file
+        search_text = self.txt_search.text().strip()
+        matches = self.data_model.matching("analyte", search_text)  # Colonne du nom d'analyte
+        for row, found in enumerate(matches):
+            self.table.setRowHidden(row, not found)
\ No newline at end of file
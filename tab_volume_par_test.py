@@ -1,3 +1,5 @@
+import math
+
 from PySide6.QtWidgets import (
     QTableWidget, QTableWidgetItem, QGroupBox, QHBoxLayout,
     QLabel, QLineEdit, QVBoxLayout, QPushButton, QWidget,
@@ -7,8 +9,20 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import QDate, Qt, QThread, Signal
 from PySide6.QtGui import QIntValidator, QDoubleValidator, QIcon, QAction
 
-from database import ReactifsDatabase, DatabaseWorkerThread
-from export import export_data
+from database import LEDGER_ADJUSTMENT_SQL, ReactifsDatabase, DatabaseWorkerThread, get_database_service
+from export_dialogs import export_data
+from query_scheduler import QueryScheduler
+from row_store import LOTS_HEADERS, LotStore, format_duration
+from stock_alerts import STOCK_EVENTS
+
+LOTS_QUERY = """
+    SELECT Lots.id, Analytes.name, Analytes.unit, Lots.lot_number, Lots.start_date, Lots.end_date, Lots.total_volume, Lots.remaining_volume, Lots.tests_performed, Lots.loss_percentage, Lots.operator,
+           Lots.duration_days, Lots.volume_per_test
+    FROM Lots
+    JOIN Analytes ON Lots.analyte_id = Analytes.id
+"""
+LOAD_CHUNK_SIZE = 200  # Lignes ajoutées à la table par tour de boucle d'événements
+
 
 class SearchThread(QThread):
     results_ready = Signal(list)
@@ -19,8 +33,8 @@ class SearchThread(QThread):
         self.search_text = search_text.lower()
 
     def run(self):
-        filtered_results = [data for data in self.data_model if self.search_text in data['nom_analyte'].lower()]
-        self.results_ready.emit(filtered_results)
+        matches = self.data_model.matching("analyte", self.search_text)
+        self.results_ready.emit([position for position, found in enumerate(matches) if found])
 
 class DatabaseUpdateThread(QThread):
     finished = Signal(bool, str)
@@ -283,14 +297,52 @@ class AddEditDialog(QDialog):
             'perte': self.fields['perte'].text(),
             'operator': self.fields['operator'].text()
         }
+
+
+def insert_lot(database, data):
+    """
+    Ajoute un lot (et son analyte si nécessaire). Exécutée dans le thread du DatabaseService.
+    :return: ID du lot créé ou None
+    """
+    analyte_id = database.get_analyte_id(data['nom_analyte'])
+    if not analyte_id:
+        database.add_analyte(data['nom_analyte'], data['unite'])
+        analyte_id = database.get_analyte_id(data['nom_analyte'])
+
+    return database.add_lot(
+        analyte_id=analyte_id,
+        lot_number=data['lot'],
+        start_date=data['debut'],
+        end_date=data['fin'],
+        total_volume=float(data['volume_total']),
+        remaining_volume=float(data['volume_restant']),
+        tests_performed=int(data['tests']),
+        loss_percentage=float(data['perte']),
+        operator=data['operator']
+    )
+
+
+def lot_row(lot_id, data):
+    """
+    Valeurs d'un lot saisi dans AddEditDialog, dans l'ordre des colonnes de LotStore.
+    """
+    return (
+        lot_id, data['nom_analyte'], data['unite'], data['lot'], data['debut'], data['fin'],
+        data['volume_total'], data['volume_restant'], data['tests'], data['perte'], data['operator']
+    )
+
+
 class TabVolumeParTest(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.database = ReactifsDatabase()
+        self.db_service = get_database_service()  # Accès asynchrone (thread dédié)
         self.current_row = -1
-        self.data_model = []
+        self.data_model = LotStore()  # Lignes de la table, partagées avec la recherche et l'exportation
         self.export_thread = None  # Ajout d'un attribut pour stocker le thread
-        self.thread = None
+        self.save_thread = None
+        self.delete_thread = None
+        self.scheduler = QueryScheduler(parent=self)  # Chargement et statistiques : seul le dernier résultat compte
         self.setup_ui()
         self.load_data_from_database()
 
@@ -384,12 +436,18 @@ class TabVolumeParTest(QWidget):
         self.table.customContextMenuRequested.connect(self.show_context_menu)
 
     def populate_analytes_combo(self):
-        try:
-            analytes = self.database.get_all_analytes()
-            self.cmb_analytes.clear()
-            self.cmb_analytes.addItems([analyte for analyte in analytes])
-        except Exception as e:
-            QMessageBox.critical(self, "Erreur", f"Impossible de charger les analytes : {e}")
+        self.db_service.call(
+            "get_all_analytes",
+            callback=self.on_analytes_loaded,
+            error_callback=lambda e: QMessageBox.critical(self, "Erreur", f"Impossible de charger les analytes : {e}")
+        )
+
+    def on_analytes_loaded(self, analytes):
+        # Remplissage initial : pas de calcul des statistiques tant que l'utilisateur n'a rien choisi
+        self.cmb_analytes.blockSignals(True)
+        self.cmb_analytes.clear()
+        self.cmb_analytes.addItems(analytes)
+        self.cmb_analytes.blockSignals(False)
 
     def show_context_menu(self, position):
         menu = QMenu(self.table)
@@ -436,47 +494,30 @@ class TabVolumeParTest(QWidget):
         menu.exec_(self.table.viewport().mapToGlobal(position))
 
     def load_data_from_database(self):
-        query_lots = """
-            SELECT Lots.id, Analytes.name, Analytes.unit, Lots.lot_number, Lots.start_date, Lots.end_date, Lots.total_volume, Lots.remaining_volume, Lots.tests_performed, Lots.loss_percentage, Lots.operator
-            FROM Lots
-            JOIN Analytes ON Lots.analyte_id = Analytes.id
-        """
-        self.thread = DatabaseWorkerThread(query=query_lots, db_path="reactifs_database.db", fetch=True)
-        self.thread.finished.connect(self.on_load_data_finished)
-        self.thread.start()
-
-    def on_load_data_finished(self, success, lots):
-        if not success:
-            QMessageBox.critical(self, "Erreur", f"Impossible de charger les données : {lots[0]}")
-            return
+        # Les lots arrivent par blocs : le premier écran s'affiche sans attendre la fin de la lecture
+        self.table.clearContents()
+        self.table.setRowCount(0)
+        self.data_model.clear()
+        self.scheduler.request(
+            "load", "stream_query", LOTS_QUERY, chunk_size=LOAD_CHUNK_SIZE, debounce_ms=0,
+            chunk_callback=self.on_load_chunk,
+            callback=lambda count: self.on_load_data_finished(True, count),
+            error_callback=lambda e: self.on_load_data_finished(False, [e])
+        )
 
+    def on_load_chunk(self, lots):
+        self.table.setUpdatesEnabled(False)
         try:
-            self.table.clearContents()
-            self.table.setRowCount(0)
-            self.data_model = []
-
-            for lot in lots:
-                data = {
-                    'id': lot[0],
-                    'nom_analyte': lot[1],
-                    'unite': lot[2],
-                    'lot': lot[3],
-                    'debut': lot[4],
-                    'fin': lot[5],
-                    'volume_total': str(lot[6]),
-                    'volume_restant': str(lot[7]),
-                    'tests': str(lot[8]),
-                    'perte': str(lot[9]),
-                    'operator': lot[10] if len(lot) > 10 else ''
-                }
-                self.add_to_table(data)
-                self.data_model.append(data)
-
+            self.append_rows(lots)
+        finally:
             self.table.setUpdatesEnabled(True)
-            QMessageBox.information(self, "Succès", "Les données ont été chargées avec succès.")
 
-        except Exception as e:
-            QMessageBox.critical(self, "Erreur", f"Impossible de charger les données : {lots if isinstance(lots, str) else 'Erreur inconnue'}")
+    def on_load_data_finished(self, success, result):
+        if not success:
+            QMessageBox.critical(self, "Erreur", f"Impossible de charger les données : {result[0]}")
+            return
+
+        QMessageBox.information(self, "Succès", "Les données ont été chargées avec succès.")
 
     def create_table(self):
         table = QTableWidget()
@@ -498,47 +539,24 @@ class TabVolumeParTest(QWidget):
         return table
 
     def add_to_table(self, data):
-        row_count = self.table.rowCount()
-        self.table.insertRow(row_count)
-        self.data_model.append(data)
-
-        headers = [
-            "ID", "Nom analyte", "Unité", "Numéro lot", "Début", "Fin", "Durée",
-            "Volume Total (ml)", "Volume Restant (ml)", "Tests Réalisés", "Volume/Test (ml)", "Perte %", "Opérateur"
-        ]
-
-        for col, header in enumerate(headers):
-            value = ""
-            if header == "ID":
-                value = str(data.get('id', ""))
-            elif header == "Nom analyte":
-                value = data.get('nom_analyte', "")
-            elif header == "Unité":
-                value = data.get('unite', "")
-            elif header == "Numéro lot":
-                value = data.get('lot', "")
-            elif header == "Début":
-                value = data.get('debut', "")
-            elif header == "Fin":
-                value = data.get('fin', "")
-            elif header == "Durée":
-                value = self.calculate_duration(data.get('debut', ""), data.get('fin', ""))
-            elif header == "Volume Total (ml)":
-                value = data.get('volume_total', "")
-            elif header == "Volume Restant (ml)":
-                value = data.get('volume_restant', "")
-            elif header == "Tests Réalisés":
-                value = data.get('tests', "")
-            elif header == "Volume/Test (ml)":
-                value = self.calculate_volume_per_test(data)
-            elif header == "Perte %":
-                value = data.get('perte', "")
-            elif header == "Opérateur":
-                value = data.get('operator', "")
+        self.append_rows([lot_row(data.get('id', 0), data)])
 
+    def append_rows(self, lots):
+        """
+        Ajoute des lots (tuples de LOTS_QUERY ou lot_row) au modèle puis à la table.
+        """
+        start = len(self.data_model)
+        self.data_model.extend(lots)
+        for position in range(start, len(self.data_model)):
+            row_count = self.table.rowCount()
+            self.table.insertRow(row_count)
+            self.set_table_row(row_count, self.data_model.display_row(position))
+
+    def set_table_row(self, row, values):
+        for col, value in enumerate(values):
             item = QTableWidgetItem(value)
             item.setTextAlignment(Qt.AlignCenter)
-            self.table.setItem(row_count, col, item)
+            self.table.setItem(row, col, item)
 
     def calculate_duration(self, start_date, end_date):
         try:
@@ -562,33 +580,12 @@ class TabVolumeParTest(QWidget):
         dialog = AddEditDialog(self)
         if dialog.exec_() == QDialog.Accepted:
             data = dialog.get_data()
-            try:
-                analyte_id = self.database.get_analyte_id(data['nom_analyte'])
-                if not analyte_id:
-                    self.database.add_analyte(data['nom_analyte'], data['unite'])
-                    analyte_id = self.database.get_analyte_id(data['nom_analyte'])
-
-                lot_id = self.database.add_lot(
-                    analyte_id=analyte_id,
-                    lot_number=data['lot'],
-                    start_date=data['debut'],
-                    end_date=data['fin'],
-                    total_volume=float(data['volume_total']),
-                    remaining_volume=float(data['volume_restant']),
-                    tests_performed=int(data['tests']),
-                    loss_percentage=float(data['perte']),
-                    operator=data['operator']
-                )
-
-                if lot_id is not None:
-                    data['id'] = lot_id
-                    self.add_to_table(data)
-                    self.update_analysis()
-                    QMessageBox.information(self, "Succès", "Le lot a été ajouté avec succès.")
-                else:
-                    QMessageBox.critical(self, "Erreur", "Impossible d'ajouter le lot.")
-            except Exception as e:
-                QMessageBox.critical(self, "Erreur", f"Impossible d'ajouter le lot : {e}")
+            self.db_service.submit(
+                insert_lot, data,
+                callback=lambda lot_id: self.on_add_finished(
+                    lot_id is not None, lot_id if lot_id is not None else "erreur de la base de données", data),
+                error_callback=lambda e: self.on_add_finished(False, e, data)
+            )
 
     def on_add_finished(self, success, result, data):
         if success:
@@ -600,6 +597,7 @@ class TabVolumeParTest(QWidget):
 
             self.add_to_table(data)
             self.update_analysis()
+            STOCK_EVENTS.stock_changed.emit([data['nom_analyte']])
             QMessageBox.information(self, "Succès", "Le lot a été ajouté avec succès.")
         else:
             QMessageBox.critical(self, "Erreur", f"Impossible d'ajouter le lot : {result}")
@@ -701,7 +699,10 @@ class TabVolumeParTest(QWidget):
             )
             
             if success:
+                position = self.data_model.position_of(lot_id)
+                previous = self.data_model.value(position, "analyte") if position != -1 else data['nom_analyte']
                 self.update_table_row(lot_id, data)
+                STOCK_EVENTS.stock_changed.emit(sorted({previous, data['nom_analyte']}))
             else:
                 QMessageBox.critical(self, "Erreur", "Échec de la mise à jour du lot.")
                 
@@ -710,46 +711,11 @@ class TabVolumeParTest(QWidget):
 
 
     def update_table_row(self, lot_id, data):
-        for row in range(self.table.rowCount()):
-            if self.table.item(row, 0).text() == str(lot_id):
-                headers = [
-                    "ID", "Nom analyte", "Unité", "Numéro lot", "Début", "Fin", "Durée",
-                    "Volume Total (ml)", "Volume Restant (ml)", "Tests Réalisés", "Volume/Test (ml)", "Perte %", "Opérateur"
-                ]
-
-                for col, header in enumerate(headers):
-                    value = ""
-                    if header == "ID":
-                        value = str(lot_id)
-                    elif header == "Nom analyte":
-                        value = data.get('nom_analyte', "")
-                    elif header == "Unité":
-                        value = data.get('unite', "")
-                    elif header == "Numéro lot":
-                        value = data.get('lot', "")
-                    elif header == "Début":
-                        value = data.get('debut', "")
-                    elif header == "Fin":
-                        value = data.get('fin', "")
-                    elif header == "Durée":
-                        value = self.calculate_duration(data.get('debut', ""), data.get('fin', ""))
-                    elif header == "Volume Total (ml)":
-                        value = data.get('volume_total', "")
-                    elif header == "Volume Restant (ml)":
-                        value = data.get('volume_restant', "")
-                    elif header == "Tests Réalisés":
-                        value = data.get('tests', "")
-                    elif header == "Volume/Test (ml)":
-                        value = self.calculate_volume_per_test(data)
-                    elif header == "Perte %":
-                        value = data.get('perte', "")
-                    elif header == "Opérateur":
-                        value = data.get('operator', "")
-
-                    item = QTableWidgetItem(value)
-                    item.setTextAlignment(Qt.AlignCenter)
-                    self.table.setItem(row, col, item)
-                break
+        position = self.data_model.position_of(lot_id)
+        if position == -1:
+            return
+        self.data_model.set_row(position, lot_row(lot_id, data))
+        self.set_table_row(position, self.data_model.display_row(position))
 
     def delete(self, row=None):
         if row is None:
@@ -771,17 +737,21 @@ class TabVolumeParTest(QWidget):
             lot_id = int(self.table.item(row, 0).text())
 
             # Démarrer le thread pour exécuter la suppression
-            self.thread = DatabaseDeleteThread(db_name="reactifs_database.db", lot_id=lot_id)
-            self.thread.finished.connect(lambda success, error: self.on_delete_finished(success, error, row))
-            self.thread.start()
+            self.delete_thread = DatabaseDeleteThread(db_name="reactifs_database.db", lot_id=lot_id)
+            self.delete_thread.finished.connect(lambda success, error: self.on_delete_finished(success, error, lot_id))
+            self.delete_thread.start()
 
         except Exception as e:
             QMessageBox.critical(self, "Erreur", f"Impossible de préparer la suppression : {e}")
 
-    def on_delete_finished(self, success, error, row):
+    def on_delete_finished(self, success, error, lot_id):
         if success:
-            self.table.removeRow(row)  # Supprimer la ligne de la table UI
-            del self.data_model[row]  # Supprimer la donnée du modèle interne
+            # La table et le modèle ont les mêmes positions : on retrouve la ligne par son ID
+            row = self.data_model.position_of(lot_id)
+            if row != -1:
+                STOCK_EVENTS.stock_changed.emit([self.data_model.value(row, "analyte")])
+                self.table.removeRow(row)  # Supprimer la ligne de la table UI
+                self.data_model.remove(row)  # Supprimer la donnée du modèle interne
             # self.update_analysis()  # Retirer cet appel pour ne pas mettre à jour l'analyse
             QMessageBox.information(self, "Succès", "Le lot a été supprimé avec succès.")
         else:
@@ -791,11 +761,11 @@ class TabVolumeParTest(QWidget):
         if not self.data_model:
             return
 
-        last_data = self.data_model[-1]
+        last_data = self.data_model.record(-1)
         try:
-            total = self.safe_convert_to_float(last_data.get('volume_total', 0), 0)
-            restant = self.safe_convert_to_float(last_data.get('volume_restant', 0), 0)
-            tests = self.safe_convert_to_float(last_data.get('tests', 0), 0)
+            total = self.safe_convert_to_float(last_data['total_volume'], 0)
+            restant = self.safe_convert_to_float(last_data['remaining_volume'], 0)
+            tests = self.safe_convert_to_float(last_data['tests_performed'], 0)
             
             # Calcul du volume utilisé
             used_volume = total - restant
@@ -816,10 +786,7 @@ class TabVolumeParTest(QWidget):
             self.txt_lost_vol.setText(f"{loss_volume:.2f} ml ({loss_percentage:.1f}%)")
             self.txt_vol_per_test.setText(f"{vol_per_test:.2f} ml/test")
 
-            start = QDate.fromString(last_data.get('debut', ""), "yyyy-MM-dd")
-            end = QDate.fromString(last_data.get('fin', ""), "yyyy-MM-dd")
-            days = start.daysTo(end)
-            self.txt_days.setText(f"{abs(days)} jours")
+            self.txt_days.setText(format_duration(last_data['duration_days']))
 
             # Aligner les données existantes dans la table au centre
             self.align_table_data()
@@ -851,6 +818,7 @@ class TabVolumeParTest(QWidget):
         try:
             queries = []
             params_list = []
+            rows = []  # Valeurs modifiées dans la table, reportées dans le modèle après l'enregistrement
 
             for row in range(self.table.rowCount()):
                 data = self.get_row_data(row)
@@ -881,40 +849,44 @@ class TabVolumeParTest(QWidget):
                     lot_id
                 )
 
+                # L'écart de consommation est d'abord enregistré dans le registre
+                remaining_volume, tests_performed = params[5], params[6]
+                queries.append(LEDGER_ADJUSTMENT_SQL)
+                params_list.append((remaining_volume, tests_performed, lot_id, remaining_volume, tests_performed))
                 queries.append(query)
                 params_list.append(params)
+                rows.append((lot_id, data['Nom analyte'], data['Unité']) + params[1:-1])
 
-            self.thread = DatabaseWorkerThread(query=queries, params=params_list, transaction=True)
-            self.thread.finished.connect(self.on_save_all_finished)
-            self.thread.start()
+            self.save_thread = DatabaseWorkerThread(query=queries, params=params_list, transaction=True)
+            self.save_thread.finished.connect(lambda success, result: self.on_save_all_finished(success, result, rows))
+            self.save_thread.start()
         except Exception as e:
             QMessageBox.critical(self, "Erreur", f"Erreur lors de l'enregistrement : {e}")
 
-    def on_save_all_finished(self, success, result):
+    def on_save_all_finished(self, success, result, rows=()):
         if success:
+            for lot in rows:
+                position = self.data_model.position_of(lot[0])
+                if position != -1:
+                    self.data_model.set_row(position, lot)
+            STOCK_EVENTS.stock_changed.emit(None)  # Un analyte a pu être renommé : tout est recalculé
             QMessageBox.information(self, "Succès", "Toutes les données ont été enregistrées avec succès.")
         else:
             QMessageBox.critical(self, "Erreur", f"Erreur lors de l'enregistrement : {result}")
 
 
+    def visible_positions(self):
+        """
+        Positions du modèle des lignes affichées (les lignes de la table suivent l'ordre du modèle),
+        pour que les exportations respectent le filtre de recherche.
+        """
+        return [row for row in range(self.table.rowCount()) if not self.table.isRowHidden(row)]
+
     def export_pdf(self):
-        headers = [self.table.horizontalHeaderItem(i).text() for i in range(self.table.columnCount())]
-        data = [[self.table.item(row, col).text() if self.table.item(row, col) else "" for col in range(self.table.columnCount())] for row in range(self.table.rowCount())]
-        export_data(self, "pdf", headers, data)
+        export_data(self, "pdf", LOTS_HEADERS, self.data_model.display_rows(self.visible_positions()))
 
     def export_excel(self):
-        headers = [self.table.horizontalHeaderItem(i).text() for i in range(self.table.columnCount())]
-        data = []
-
-        for row in range(self.table.rowCount()):
-            row_data = []
-            for col in range(self.table.columnCount()):
-                item = self.table.item(row, col)
-                value = item.text() if item else ""
-                row_data.append(value)
-            data.append(row_data)
-
-        export_data(self, "excel", headers, data)
+        export_data(self, "excel", LOTS_HEADERS, self.data_model.display_rows(self.visible_positions()))
 
     def on_export_finished(self, success, message):
         if success:
@@ -992,11 +964,8 @@ class TabVolumeParTest(QWidget):
                 volume_consomme = total_float - restant_float
                 perte_ml = restant_float
                 perte_pct = (perte_ml / total_float) * 100 if total_float > 0 else 0
-                date_debut_str = self.table.item(row, 4).text() if self.table.item(row, 4) else ""
-                date_fin_str = self.table.item(row, 5).text() if self.table.item(row, 5) else ""
-                date_debut = QDate.fromString(date_debut_str, "yyyy-MM-dd")
-                date_fin = QDate.fromString(date_fin_str, "yyyy-MM-dd")
-                days = date_debut.daysTo(date_fin) if date_debut.isValid() and date_fin.isValid() else 0
+                days = self.data_model.value(row, "duration_days")  # Calculée par la base
+                days = 0 if math.isnan(days) else int(days)
                 self.txt_tests.setText(f"{tests}")
                 self.txt_total_vol.setText(f"{total_float:.2f} ml")
                 self.txt_consumed_vol.setText(f"{volume_consomme:.2f} ml")
@@ -1027,16 +996,15 @@ class TabVolumeParTest(QWidget):
             self.table.setRowHidden(row, not match_found)
 
     def dynamic_search(self):
-        search_text = self.txt_search.text().strip().lower()
-        for row in range(self.table.rowCount()):
-            item = self.table.item(row, 1)
-            self.table.setRowHidden(row, search_text not in item.text().lower() if item else True)
+        search_text = self.txt_search.text().strip()
+        matches = self.data_model.matching("analyte", search_text)
+        for row, found in enumerate(matches):
+            self.table.setRowHidden(row, not found)
 
     def update_search_results(self, results):
-        self.table.clearContents()
-        self.table.setRowCount(0)
-        for data in results:
-            self.add_to_table(data)
+        visible = set(results)
+        for row in range(self.table.rowCount()):
+            self.table.setRowHidden(row, row not in visible)
 
     def update_analyte_stats(self):
         analyte_name = self.cmb_analytes.currentText().strip()
@@ -1044,22 +1012,26 @@ class TabVolumeParTest(QWidget):
             self.clear_stat_fields()
             return
 
+        # Une nouvelle sélection remplace (et interrompt) la précédente
+        self.scheduler.request(
+            "stats", "get_lots_by_analyte", analyte_name,
+            callback=self.on_analyte_lots_loaded,
+            error_callback=self.on_analyte_stats_error
+        )
+
+    def on_analyte_lots_loaded(self, lots):
         try:
-            lots = self.database.get_lots_by_analyte(analyte_name)
             if not lots:
                 self.clear_stat_fields()
                 return
 
             total_tests = sum(lot['tests_performed'] for lot in lots) / len(lots) if lots else 0
-            total_days = sum(self.calculate_duration_days(lot['start_date'], lot['end_date']) for lot in lots) / len(lots) if lots else 0
+            total_days = sum(lot['duration_days'] for lot in lots) / len(lots) if lots else 0
             total_vol = sum(lot['total_volume'] for lot in lots) / len(lots) if lots else 0
             consumed_vol = sum(lot['total_volume'] - lot['remaining_volume'] for lot in lots) / len(lots) if lots else 0
             loss_percentage = sum(lot['loss_percentage'] for lot in lots) / len(lots) if lots else 0
-            vol_per_test = (
-                sum((lot['total_volume'] - lot['remaining_volume']) / lot['tests_performed']
-                for lot in lots if lot['tests_performed'] > 0) /
-                len([lot for lot in lots if lot['tests_performed'] > 0])
-            ) if any(lot['tests_performed'] > 0 for lot in lots) else 0
+            volumes_per_test = [lot['volume_per_test'] for lot in lots if lot['volume_per_test'] is not None]
+            vol_per_test = sum(volumes_per_test) / len(volumes_per_test) if volumes_per_test else 0
 
             self.txt_tests.setText(f"{total_tests:.2f}")
             self.txt_days.setText(f"{total_days:.2f}")
@@ -1069,18 +1041,11 @@ class TabVolumeParTest(QWidget):
             self.txt_vol_per_test.setText(f"{vol_per_test:.2f} ml/test")
 
         except Exception as e:
-            QMessageBox.critical(self, "Erreur", f"Impossible de charger les statistiques : {e}")
-            self.clear_stat_fields()
+            self.on_analyte_stats_error(e)
 
-    def calculate_duration_days(self, start_date: str, end_date: str) -> int:
-        try:
-            if not start_date or not end_date:
-                return 0
-            start = QDate.fromString(start_date, "yyyy-MM-dd")
-            end = QDate.fromString(end_date, "yyyy-MM-dd")
-            return abs(start.daysTo(end))
-        except Exception:
-            return 0
+    def on_analyte_stats_error(self, error):
+        QMessageBox.critical(self, "Erreur", f"Impossible de charger les statistiques : {error}")
+        self.clear_stat_fields()
 
     def update_average_stats(self, success, results):
         if not success or not results:
@@ -1,11 +1,21 @@
+import math
 import sys
 import os
-from PySide6.QtWidgets import QApplication, QMainWindow, QTabWidget, QWidget, QVBoxLayout
-from PySide6.QtGui import QIcon  # Importez QIcon pour gérer les icônes
+from PySide6.QtWidgets import (
+    QApplication, QMainWindow, QTabWidget, QWidget, QVBoxLayout, QHBoxLayout,
+    QDialog, QPlainTextEdit, QPushButton, QFileDialog, QMessageBox, QFrame, QLabel, QListWidget
+)
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QIcon, QAction, QColor, QFontDatabase  # Importez QIcon pour gérer les icônes
 from tab_reactifs import GestionReactifs  # Classe correcte pour le premier onglet
 from tab_volume_par_test import TabVolumeParTest  # Deuxième onglet
 from tab_tests_estimes import TabTests  # Troisième onglet
-from database import ReactifsDatabase  # Importer la classe ReactifsDatabase
+from tab_plan_commandes import TabPlanCommandes  # Quatrième onglet
+from database import ReactifsDatabase, shutdown_database_services  # Importer la classe ReactifsDatabase
+from calc_pool import shutdown_calculation_pool
+from sql_trace import TRACER, GUARD
+from stall_watchdog import install_watchdog
+from stock_alerts import StockAlertService, day_to_date
 
 
 def load_stylesheet(app):
@@ -20,6 +30,126 @@ def load_stylesheet(app):
         print("⚠️ Avertissement : fichier 'style.qss' introuvable.")
 
 
+class DiagnosticDialog(QDialog):
+    """
+    Affiche un rapport de diagnostic (requêtes SQL, blocages) et permet de l'enregistrer.
+    :param source: objet fournissant report(), dump(filename) et reset()
+    """
+    def __init__(self, title, source, default_filename, parent=None):
+        super().__init__(parent)
+        self.source = source
+        self.default_filename = default_filename
+        self.setWindowTitle(title)
+        self.resize(1000, 600)
+        layout = QVBoxLayout(self)
+
+        self.txt_report = QPlainTextEdit()
+        self.txt_report.setReadOnly(True)
+        self.txt_report.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.txt_report.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        layout.addWidget(self.txt_report)
+
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch()
+        for btn_text, slot in [
+            ("Actualiser", self.refresh),
+            ("Enregistrer...", self.save),
+            ("Réinitialiser", self.reset),
+            ("Fermer", self.accept)
+        ]:
+            btn = QPushButton(btn_text)
+            btn.clicked.connect(slot)
+            btn_layout.addWidget(btn)
+        layout.addLayout(btn_layout)
+
+        self.refresh()
+
+    def refresh(self):
+        self.txt_report.setPlainText(self.source.report())
+
+    def save(self):
+        filename, _ = QFileDialog.getSaveFileName(self, "Enregistrer le rapport", self.default_filename,
+                                                  "Fichiers texte (*.txt)")
+        if not filename:
+            return
+        if self.source.dump(filename):
+            QMessageBox.information(self, "Succès", f"Rapport enregistré dans '{filename}'.")
+        else:
+            QMessageBox.critical(self, "Erreur", "Impossible d'enregistrer le rapport.")
+
+    def reset(self):
+        self.source.reset()
+        self.refresh()
+
+
+class StockAlertPanel(QFrame):
+    """
+    Zone de notification des ruptures prévues, sous les onglets (n'interrompt pas la saisie).
+    Masquée tant qu'il n'y a aucune alerte ; double-clic sur une alerte pour la retirer.
+    """
+    COLORS = {"Information": "#1F5F99", "Attention": "#B36B00", "Critique": "#C0392B", "Rupture": "#8E1B10"}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFrameShape(QFrame.StyledPanel)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(8, 4, 8, 4)
+
+        header = QHBoxLayout()
+        self.lbl_title = QLabel()
+        header.addWidget(self.lbl_title)
+        header.addStretch()
+        btn_clear = QPushButton("Tout effacer")
+        btn_clear.clicked.connect(self.clear_alerts)
+        header.addWidget(btn_clear)
+        layout.addLayout(header)
+
+        self.list_alerts = QListWidget()
+        self.list_alerts.setMaximumHeight(90)
+        self.list_alerts.itemDoubleClicked.connect(self.dismiss)
+        layout.addWidget(self.list_alerts)
+
+        self.alerts = {}  # analyte_id -> alerte affichée
+        self.hide()
+
+    def add_alert(self, alert: dict):
+        self.alerts[alert['analyte_id']] = alert
+        self.refresh()
+
+    def refresh(self):
+        self.list_alerts.clear()
+        for alert in sorted(self.alerts.values(), key=lambda alert: alert['stockout_day']):
+            days = alert['days_left']
+            delay = "aujourd'hui" if days <= 0 else f"dans {days} jour{'s' if days > 1 else ''}"
+            self.list_alerts.addItem(
+                f"{alert['level']} — {alert['nom_analyte']} : rupture prévue le {day_to_date(alert['stockout_day'])} "
+                f"({delay}, stock {alert['stock']:.2f} {alert['unite']}, {alert['daily_rate']:.2f} {alert['unite']}/jour)"
+            )
+            item = self.list_alerts.item(self.list_alerts.count() - 1)
+            item.setForeground(QColor(self.COLORS.get(alert['level'], "#2E2E2E")))
+            item.setData(Qt.UserRole, alert['analyte_id'])
+        self.lbl_title.setText(f"Ruptures de stock prévues ({len(self.alerts)})")
+        self.setVisible(bool(self.alerts))
+
+    def prune(self, service):
+        """
+        Retire les alertes des analytes qui ne sont plus proches de la rupture (stock réapprovisionné).
+        """
+        for analyte_id in list(self.alerts):
+            entry = service.index.entries.get(analyte_id)
+            if entry is None or entry['alerted'] == math.inf:
+                del self.alerts[analyte_id]
+        self.refresh()
+
+    def dismiss(self, item):
+        self.alerts.pop(item.data(Qt.UserRole), None)
+        self.refresh()
+
+    def clear_alerts(self):
+        self.alerts.clear()
+        self.refresh()
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -47,15 +177,18 @@ class MainWindow(QMainWindow):
         tab1 = GestionReactifs()
         tab2 = TabVolumeParTest()
         tab3 = TabTests()
+        tab4 = TabPlanCommandes()
 
         # Définir les icônes pour chaque onglet
         tab1_icon = QIcon(os.path.join(os.path.dirname(__file__), "icons", "reactifs.png"))
         tab2_icon = QIcon(os.path.join(os.path.dirname(__file__), "icons", "volume.png"))
         tab3_icon = QIcon(os.path.join(os.path.dirname(__file__), "icons", "tests.png"))
+        tab4_icon = QIcon(os.path.join(os.path.dirname(__file__), "icons", "shopping-cart-svgrepo-com.svg"))
 
         self.tabs.addTab(tab1, tab1_icon, "Gestion Réactifs")
         self.tabs.addTab(tab2, tab2_icon, "Calcul Volume Test")
         self.tabs.addTab(tab3, tab3_icon, "Calcul Test")
+        self.tabs.addTab(tab4, tab4_icon, "Plan de Commande")
 
         # Ajouter les styles personnalisés aux onglets (si non inclus dans style.qss)
         self.tabs.setStyleSheet("""
@@ -89,14 +222,52 @@ class MainWindow(QMainWindow):
         # Ajouter le widget des onglets au layout principal
         main_layout.addWidget(self.tabs)
 
+        # Zone de notification des ruptures prévues, alimentée en arrière-plan
+        self.alert_panel = StockAlertPanel()
+        main_layout.addWidget(self.alert_panel)
+        self.stock_alerts = StockAlertService(parent=self)
+        self.stock_alerts.alert_raised.connect(self.alert_panel.add_alert)
+        self.stock_alerts.index_changed.connect(lambda: self.alert_panel.prune(self.stock_alerts))
+        self.stock_alerts.start()
+
         # Encapsuler le layout dans un widget central
         container = QWidget()
         container.setLayout(main_layout)
         self.setCentralWidget(container)
 
+        # Menu Outils : diagnostic des performances
+        tools_menu = self.menuBar().addMenu("Outils")
+        sql_action = QAction("Statistiques SQL...", self)
+        sql_action.setShortcut("Ctrl+Shift+S")
+        sql_action.triggered.connect(self.show_sql_statistics)
+        tools_menu.addAction(sql_action)
+
+        guard_action = QAction("SQL sur le thread principal...", self)
+        guard_action.triggered.connect(self.show_main_thread_sql)
+        tools_menu.addAction(guard_action)
+
+        # Surveillance des blocages du thread principal
+        self.watchdog = install_watchdog(self)
+        stall_action = QAction("Blocages de l'interface...", self)
+        stall_action.setShortcut("Ctrl+Shift+B")
+        stall_action.setEnabled(self.watchdog is not None)
+        stall_action.triggered.connect(self.show_stall_report)
+        tools_menu.addAction(stall_action)
+
+    def show_sql_statistics(self):
+        DiagnosticDialog("Statistiques SQL", TRACER, "rapport_sql.txt", self).exec()
+
+    def show_main_thread_sql(self):
+        DiagnosticDialog("SQL sur le thread principal", GUARD, "rapport_sql_thread_principal.txt", self).exec()
+
+    def show_stall_report(self):
+        DiagnosticDialog("Blocages de l'interface", self.watchdog, "rapport_blocages.txt", self).exec()
+
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(shutdown_database_services)  # Termine les requêtes asynchrones en cours
+    app.aboutToQuit.connect(shutdown_calculation_pool)  # Arrête les calculs en lot
 
     # Charger le style global depuis style.qss
     load_stylesheet(app)